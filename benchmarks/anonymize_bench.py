@@ -0,0 +1,119 @@
+# benchmarks/anonymize_bench.py
+"""
+labeling.cleaning.anonymize_text için fuzz regresyon + benchmark.
+
+Eski (EMAIL_RE, PHONE_RE, PNR_RE ile sırayla üç re.sub) versiyonla
+çıktıların birebir aynı olduğunu kontrol eder; reversible Anonymizer'ın
+placeholder'ları sabit maskeye çevrilince aynı sonucu verdiğini ve
+anonymize_texts'in (batch) tek tek çağrıyla aynı olduğunu doğrular.
+Sentetik mail corpus'u üzerinde hızlanmayı raporlar.
+
+Çalıştırma (proje kökünden):
+    python benchmarks/anonymize_bench.py --fuzz 200000
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from labeling.cleaning import (  # noqa: E402
+    EMAIL_RE,
+    PHONE_RE,
+    PNR_RE,
+    Anonymizer,
+    anonymize_text,
+    anonymize_texts,
+    choose_best_segment,
+    html_to_text,
+)
+from cleaning_bench import synthetic_mail  # noqa: E402
+
+
+def legacy_anonymize(text: str) -> str:
+    """Değiştirilmeden önceki anonymize_text (referans)."""
+    if not text:
+        return ""
+    text = EMAIL_RE.sub("EMAIL_MASKED", text)
+    text = PHONE_RE.sub("PHONE_MASKED", text)
+    text = PNR_RE.sub("PNR_MASKED", text)
+    return text
+
+
+# Desenlerin sınırlarını zorlayan parçalar (lookbehind / lookahead, Unicode rakam, \w sınırı)
+_FUZZ_TOKENS = [
+    "a", "B", "Z", "ABC12", "AB12C3D", "0", "5", "1234", "+", "+90", " ", "-", "_", ".", "@", "%",
+    "x@y.com", "ş", "İ", "٣", "\n", "0532 123 45 67", "12345678901", "TK1234", "a.b", "-@", "@-",
+    "ÇAB12", "١٢٣٤٥٦٧٨٩", "booking@julesverne.com.tr", "\t",
+]
+
+_VARIANT_RE = re.compile(r"(EMAIL|PHONE|PNR)\d+_MASKED")
+
+
+def fuzz_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_FUZZ_TOKENS) for _ in range(rng.randint(0, 30)))
+
+
+def check(texts: List[str]) -> int:
+    mismatches = 0
+    for text in texts:
+        expected = legacy_anonymize(text)
+        reversible = Anonymizer(reversible=True).anonymize(text)
+        if anonymize_text(text) != expected or _VARIANT_RE.sub(r"\1_MASKED", reversible) != expected:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH\n  text:   {text!r}\n  legacy: {expected!r}\n  new:    {anonymize_text(text)!r}")
+    if anonymize_texts(texts) != [legacy_anonymize(text) for text in texts]:
+        print("MISMATCH in anonymize_texts")
+        mismatches += 1
+    return mismatches
+
+
+def timed(fn, docs: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="anonymize_text regression check and benchmark")
+    parser.add_argument("--fuzz", type=int, default=50000)
+    parser.add_argument("--mails", type=int, default=200, help="sentetik mail sayısı")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    plain = [html_to_text(synthetic_mail(rng, rng.choice([2, 8, 32]))) for _ in range(args.mails)]
+    segments = [choose_best_segment(text) for text in plain]
+    fuzz = [fuzz_text(rng) for _ in range(args.fuzz)]
+
+    mismatches = check(fuzz + plain + segments)
+    total = len(fuzz) + len(plain) + len(segments)
+    print(f"regression: {total - mismatches}/{total} identical (fuzz={len(fuzz)} mails={len(plain)})")
+
+    for name, docs in (("full body", plain), ("best segment", segments)):
+        size_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+        legacy_s = timed(legacy_anonymize, docs, args.repeat)
+        new_s = timed(anonymize_text, docs, args.repeat)
+        print(
+            f"{name}: {len(docs)} docs, {size_mb:.1f} MB | 3x re.sub {legacy_s:.3f}s | "
+            f"single pass {new_s:.3f}s | speedup x{legacy_s / new_s:.2f}"
+        )
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/batching_bench.py
+"""
+inference.batcher.MicroBatcher için throughput / latency benchmark'ı.
+
+Eş zamanlı --clients kadar istemci (closed loop: cevap gelince sıradaki
+mail) sentetik Türkçe seyahat maillerini batcher'a gönderir. Her
+(max_batch, max_wait_ms) kombinasyonu için mails/s, istek başına
+p50 / p95 / p99 latency, ortalama batch boyu ve padding verimi raporlanır.
+max_batch=1 satırı eski davranış (her mail için ayrı generate).
+
+Varsayılan backend fine-tune edilmiş model (torch + transformers gerekir).
+--simulate ile modelin yerine, batch başına sabit maliyet + padding'li
+token sayısıyla alt-lineer büyüyen süre harcayan sahte bir extractor
+kullanılır; bu sadece scheduler'ın davranışını görmek içindir, gerçek
+model sayıları yerine geçmez.
+
+Çalıştırma (proje kökünden):
+    python benchmarks/batching_bench.py --model models/flan-t5-json-extractor-v1 --threads 4
+    python benchmarks/batching_bench.py --simulate
+"""
+
+import sys
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from inference.batcher import INFER_BUCKET_RATIO, MicroBatcher  # noqa: E402
+from inference.extractor import INFER_THREADS, MODEL_DIR, Extraction, parse_output  # noqa: E402
+from inference.metrics import percentile  # noqa: E402
+from labeling.cleaning import choose_best_segment, html_to_text  # noqa: E402
+from cleaning_bench import synthetic_mail  # noqa: E402
+
+
+class SimulatedExtractor:
+    """
+    Model yerine süre harcayan extractor: call_ms + token_ms * max_len * n ** alpha.
+    alpha < 1, CPU'da matris çarpımlarının batch ile daha verimli olmasını taklit eder.
+    """
+
+    name = "simulated"
+
+    def __init__(self, call_ms: float = 40.0, token_ms: float = 0.5, alpha: float = 0.5) -> None:
+        self.call_ms = call_ms
+        self.token_ms = token_ms
+        self.alpha = alpha
+
+    def token_lengths(self, bodies: Sequence[str]) -> List[int]:
+        return [min(len(body.split()) * 2, 512) for body in bodies]
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        max_len = max(self.token_lengths(bodies))
+        time.sleep((self.call_ms + self.token_ms * max_len * len(bodies) ** self.alpha) / 1000)
+        return [parse_output('{"requests": []}') for _ in bodies]
+
+
+def build_corpus(rng: random.Random, count: int) -> List[str]:
+    return [choose_best_segment(html_to_text(synthetic_mail(rng, rng.choice([2, 8, 32])))) for _ in range(count)]
+
+
+def run_config(
+    extractor: object,
+    corpus: List[str],
+    clients: int,
+    requests: int,
+    max_batch: int,
+    max_wait_ms: float,
+    bucket_ratio: float,
+) -> Dict[str, float]:
+    batcher = MicroBatcher(extractor, max_batch=max_batch, max_wait_ms=max_wait_ms, bucket_ratio=bucket_ratio)
+    latencies: List[float] = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client() -> None:
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            started = time.perf_counter()
+            batcher.submit(corpus[i % len(corpus)]).result()
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stats = batcher.stats()
+    batcher.close()
+
+    latencies.sort()
+    return {
+        "mails_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_batch": stats["mean_batch_size"],
+        "padding_eff": stats["padding_efficiency"],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Micro-batching throughput vs latency benchmark")
+    parser.add_argument("--simulate", action="store_true", help="model yerine sahte maliyet modeli")
+    parser.add_argument("--model", default=MODEL_DIR)
+    parser.add_argument("--threads", type=int, default=INFER_THREADS)
+    parser.add_argument("--clients", type=int, default=16, help="eş zamanlı istemci sayısı")
+    parser.add_argument("--requests", type=int, default=128, help="konfigürasyon başına mail sayısı")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--waits-ms", type=float, nargs="+", default=[0, 10, 50])
+    parser.add_argument("--bucket-ratio", type=float, default=INFER_BUCKET_RATIO)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        extractor = SimulatedExtractor()
+    else:
+        from inference.extractor import Seq2SeqExtractor
+
+        extractor = Seq2SeqExtractor(model_dir=args.model, threads=args.threads)
+    corpus = build_corpus(random.Random(args.seed), min(args.requests, 256))
+
+    print(f"backend={extractor.name} clients={args.clients} requests={args.requests} bucket_ratio={args.bucket_ratio}")
+    print(f"{'batch':>5} {'wait_ms':>7} {'mails/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'mean_batch':>10} {'pad_eff':>7}")
+    for max_batch in args.batch_sizes:
+        # max_batch=1'de bekleme anlamsız, tek satır yeter
+        for wait_ms in (args.waits_ms[:1] if max_batch == 1 else args.waits_ms):
+            r = run_config(extractor, corpus, args.clients, args.requests, max_batch, wait_ms, args.bucket_ratio)
+            print(
+                f"{max_batch:>5} {wait_ms:>7.0f} {r['mails_per_s']:>8.2f} {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} "
+                f"{r['p99_ms']:>8.0f} {r['mean_batch']:>10.2f} {r['padding_eff']:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
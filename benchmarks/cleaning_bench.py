@@ -0,0 +1,320 @@
+# benchmarks/cleaning_bench.py
+"""
+labeling/cleaning.py için benchmark: sentetik Türkçe seyahat mailleri üzerinde
+html_to_text, split_segments, score_segment, choose_best_segment ve
+anonymize_text'i farklı gövde boyutlarında ölçer.
+
+Corpus (seed'e göre deterministik):
+  - Outlook / Word tarzı HTML (inline style, <o:p>, mso yorumları),
+  - iç içe yanıt / iletme zinciri: "Gönderen:", "From:", "-----Original Message-----",
+  - her mesajın altında uzun KVKK / legal disclaimer,
+  - isim, telefon, e-posta, PNR gibi maskelenecek alanlar.
+
+Her fonksiyon için mails/s, MB/s (girdi boyutu) ve tracemalloc ile peak
+bellek raporlanır. Sonuçlar --save-baseline ile JSON'a yazılır, --baseline
+ile karşılaştırılır; --tolerance'tan fazla yavaşlama varsa exit code 1.
+
+Çalıştırma (proje kökünden):
+    python benchmarks/cleaning_bench.py --save-baseline data/bench/cleaning_baseline.json
+    python benchmarks/cleaning_bench.py --baseline data/bench/cleaning_baseline.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from labeling.cleaning import (  # noqa: E402
+    anonymize_text,
+    choose_best_segment,
+    html_to_text,
+    score_segment,
+    split_segments,
+)
+
+# Yaklaşık HTML gövde boyutları (KB)
+DEFAULT_SIZES_KB = [2, 8, 32, 128]
+
+_FIRST_NAMES = ["Ayşe", "Mehmet", "Zeynep", "Emre", "Elif", "Burak", "Gülşen", "İsmail", "Şule", "Çağrı", "Öykü", "Ümit"]
+_LAST_NAMES = ["Yılmaz", "Kaya", "Demir", "Şahin", "Çelik", "Öztürk", "Aydın", "Arslan", "Doğan", "Güneş"]
+_COMPANIES = ["denizbank.com.tr", "karadenizholding.com", "ornekfirma.com.tr", "acme-lojistik.com"]
+_CITIES = ["İstanbul", "Ankara", "İzmir", "Antalya", "Trabzon", "Berlin", "Londra", "Dubai", "Bakü", "Erzurum"]
+_HOTELS = ["Hilton Garden Inn", "Divan", "Radisson Blu", "Wyndham Grand", "Sheraton", "Ramada Plaza"]
+
+_REQUEST_LINES = [
+    "{date} tarihinde {src} - {dst} gidiş-dönüş uçuş bileti rica ederiz, dönüş {date2}.",
+    "{src} çıkışlı {dst} varışlı tek yön THY uçuşu için rezervasyon yapabilir misiniz?",
+    "{name} için {dst}'da {hotel} otelinde {date} - {date2} arası tek kişilik oda, kahvaltı dahil.",
+    "Havalimanı - otel transfer talebimiz var, uçuş TK{flight} ile {date} saat {hour} iniş.",
+    "Yolcu: {name}, Tel: {phone}, e-posta: {email}",
+    "Mevcut PNR {pnr} için check-in ve bagaj hakkını kontrol eder misiniz?",
+    "Pegasus PC{flight} seferinde 2 kişi, biri çocuk, koltuk seçimi yan yana olacak şekilde.",
+    "Fatura bilgileri ektedir, voucher'ı {email} adresine iletebilirsiniz.",
+]
+
+_CHATTER = [
+    "Merhaba,", "Merhabalar,", "Sayın yetkili,", "İyi çalışmalar dileriz.", "Teşekkürler,",
+    "Konuyla ilgili bilginize sunarım.", "Aşağıdaki talebi iletiyorum.", "Dönüşünüzü rica ederim.",
+    "Hi team, please see below.", "Kind regards,", "Acil dönüş rica ederiz.",
+]
+
+_DISCLAIMERS = [
+    "Bu e-posta ve ekleri gönderilen kişilere özel olup gizlidir. Yetkili alıcı değilseniz, bu mesajın "
+    "içeriğini kullanmanız, kopyalamanız veya dağıtmanız hukuken yasaktır. Mesajı yanlışlıkla aldıysanız "
+    "lütfen gönderene bildirip siliniz. Şirketimiz bu mesajın içeriğinden ve eklerinden sorumlu değildir.",
+    "KVKK Aydınlatma Metni: 6698 sayılı Kişisel Verilerin Korunması Kanunu kapsamında kişisel verileriniz "
+    "veri sorumlusu sıfatıyla şirketimiz tarafından, hizmetin ifası amacıyla işlenmekte ve yasal saklama "
+    "süreleri boyunca muhafaza edilmektedir. Haklarınıza ilişkin başvurularınızı kvkk@julesverne.com.tr "
+    "adresine iletebilirsiniz. İşbu e-posta, sadece göndericisi tarafından alması amaçlanan yetkili "
+    "gerçek ya da tüzel kişinin kullanımı içindir.",
+    "CONFIDENTIALITY NOTICE: This e-mail and any attachments are confidential and may be legally "
+    "privileged. If you are not the intended recipient, please delete this e-mail and notify the sender. "
+    "Any unauthorised use or disclosure is prohibited. Please consider the environment before printing "
+    "this email. E-posta sorumluluk reddi: www.ornekfirma.com.tr/disclaimer",
+]
+
+_STYLE = (
+    "<style><!-- /* Font Definitions */ @font-face {font-family:\"Cambria Math\"; panose-1:2 4 5 3 5 4 6 3 2 4;} "
+    + " ".join(f"p.MsoNormal{i}, li.MsoNormal{i} {{margin:0cm; font-size:11.0pt; "
+               f"font-family:\"Calibri\",sans-serif; mso-fareast-language:EN-US;}}" for i in range(20))
+    + " --></style>"
+)
+
+
+def _person(rng: random.Random) -> Dict[str, str]:
+    first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+    ascii_name = f"{first}.{last}".lower().translate(str.maketrans("çğıöşüİ", "cgiosui"))
+    return {
+        "name": f"{first} {last}",
+        "email": f"{ascii_name}@{rng.choice(_COMPANIES)}",
+        "phone": f"0{rng.randint(530, 559)} {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+    }
+
+
+def _date(rng: random.Random) -> str:
+    return f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2025"
+
+
+def _request_line(rng: random.Random, person: Dict[str, str]) -> str:
+    src, dst = rng.sample(_CITIES, 2)
+    return rng.choice(_REQUEST_LINES).format(
+        date=_date(rng), date2=_date(rng), src=src, dst=dst, hotel=rng.choice(_HOTELS),
+        flight=rng.randint(100, 2999), hour=f"{rng.randint(0, 23):02d}:{rng.choice(['00', '15', '30', '45'])}",
+        pnr="".join(rng.choice("ABCDEFGHJKLMNPRSTUVYZ23456789") for _ in range(6)), **person,
+    )
+
+
+def _p(text: str) -> str:
+    return f'<p class="MsoNormal"><span style="font-size:11.0pt;color:#1F497D">{text}</span><o:p></o:p></p>'
+
+
+def _message_html(rng: random.Random) -> str:
+    """Tek mesaj: selamlama, talep satırları, imza, disclaimer."""
+    sender = _person(rng)
+    parts = [_p(rng.choice(_CHATTER))]
+    for _ in range(rng.randint(1, 6)):
+        parts.append(_p(_request_line(rng, _person(rng))))
+        if rng.random() < 0.3:
+            parts.append('<p class="MsoNormal"><o:p>&nbsp;</o:p></p>')
+    if rng.random() < 0.3:
+        rows = "".join(
+            f"<tr><td><p class=MsoNormal>{rng.choice(_CITIES)}</p></td><td>{_date(rng)}</td>"
+            f"<td>{_person(rng)['name']}</td></tr>"
+            for _ in range(rng.randint(2, 6))
+        )
+        parts.append(f'<table class="MsoNormalTable" border="0">{rows}</table>')
+    parts.append(_p(f"{rng.choice(_CHATTER)}<br>{sender['name']}<br>Tel: {sender['phone']}<br>{sender['email']}"))
+    parts.append(
+        '<p class="MsoNormal"><span style="font-size:7.5pt;color:gray">'
+        + " ".join(rng.sample(_DISCLAIMERS, rng.randint(1, len(_DISCLAIMERS))))
+        + "</span></p>"
+    )
+    return "\r\n".join(parts)
+
+
+def _quote_header(rng: random.Random) -> str:
+    """Önceki mesajın başlığı: Outlook TR / EN ayraç bloğu ya da düz metin Original Message."""
+    sender, to = _person(rng), _person(rng)
+    kind = rng.random()
+    if kind < 0.45:
+        labels = ("Gönderen", "Gönderildi", "Kime", "Konu")
+    elif kind < 0.85:
+        labels = ("From", "Sent", "To", "Subject")
+    else:
+        return (
+            "<p class=MsoNormal>-----Original Message-----<br>"
+            f"From: {sender['name']} &lt;{sender['email']}&gt;<br>Sent: {_date(rng)}<br>"
+            f"To: booking@julesverne.com.tr<br>Subject: RE: Seyahat talebi</p>"
+        )
+    return (
+        '<div style="border:none;border-top:solid #E1E1E1 1.0pt;padding:3.0pt 0cm 0cm 0cm">'
+        f"<p class=MsoNormal><b>{labels[0]}:</b> {sender['name']} &lt;{sender['email']}&gt;<br>"
+        f"<b>{labels[1]}:</b> {_date(rng)} 10:{rng.randint(10, 59)}<br>"
+        f"<b>{labels[2]}:</b> {to['name']} &lt;booking@julesverne.com.tr&gt;<br>"
+        f"<b>{labels[3]}:</b> RE: Seyahat talebi</p></div>"
+    )
+
+
+def synthetic_mail(rng: random.Random, size_kb: float) -> str:
+    """Yaklaşık size_kb büyüklüğünde, iç içe iletilmiş Outlook HTML thread'i."""
+    parts = [
+        '<html xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office">',
+        '<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">',
+        _STYLE,
+        "<!--[if gte mso 9]><xml><o:shapedefaults v:ext=\"edit\" spidmax=\"1026\" /></xml><![endif]-->",
+        '</head><body lang="TR" link="#0563C1" style="word-wrap:break-word"><div class="WordSection1">',
+        _message_html(rng),
+    ]
+    target = size_kb * 1024
+    size = sum(len(p) for p in parts)
+    while size < target:
+        for piece in (_quote_header(rng), _message_html(rng)):
+            parts.append(piece)
+            size += len(piece)
+    parts.append("</div></body></html>")
+    return "\r\n".join(parts)
+
+
+def build_corpus(sizes_kb: List[float], mails_per_size: int, seed: int) -> Dict[float, List[str]]:
+    rng = random.Random(seed)
+    return {size: [synthetic_mail(rng, size) for _ in range(mails_per_size)] for size in sizes_kb}
+
+
+def _stages(html_docs: List[str]) -> Dict[str, tuple]:
+    """
+    Ölçülecek fonksiyonlar ve girdileri. Her aşama pipeline'daki gerçek girdisini
+    alır: html_to_text HTML'i, diğerleri düz metni, score_segment segmentleri.
+    """
+    plain = [html_to_text(doc) for doc in html_docs]
+    segments = [split_segments(text) for text in plain]
+    return {
+        "html_to_text": (html_to_text, html_docs),
+        "split_segments": (split_segments, plain),
+        "score_segment": (lambda segs: [score_segment(s) for s in segs], segments),
+        "choose_best_segment": (choose_best_segment, plain),
+        "anonymize_text": (anonymize_text, plain),
+    }
+
+
+def _input_bytes(docs: list) -> int:
+    return sum(
+        sum(len(s.encode("utf-8")) for s in doc) if isinstance(doc, list) else len(doc.encode("utf-8"))
+        for doc in docs
+    )
+
+
+def timed(fn: Callable, docs: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_memory(fn: Callable, docs: list) -> int:
+    """Tek mail işlenirken ayrılan en yüksek ek bellek (byte, tracemalloc)."""
+    tracemalloc.start()
+    peak = 0
+    try:
+        for doc in docs:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(doc)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(sizes_kb: List[float], mails_per_size: int, repeat: int, seed: int) -> List[Dict[str, float]]:
+    results = []
+    for size, docs in build_corpus(sizes_kb, mails_per_size, seed).items():
+        for name, (fn, inputs) in _stages(docs).items():
+            nbytes = _input_bytes(inputs)
+            seconds = timed(fn, inputs, repeat)
+            results.append({
+                "function": name,
+                "size_kb": size,
+                "mails": len(inputs),
+                "mails_per_s": len(inputs) / seconds,
+                "mb_per_s": nbytes / 1e6 / seconds,
+                "peak_kb": peak_memory(fn, inputs) / 1024,
+            })
+    return results
+
+
+def _key(row: Dict) -> str:
+    return f"{row['function']}@{row['size_kb']:g}KB"
+
+
+def print_results(results: List[Dict], baseline: Optional[Dict[str, Dict]] = None) -> Dict[str, float]:
+    """Tabloyu basar; baseline verilirse mails/s oranlarını ekler ve döner."""
+    header = f"{'function':<20} {'size':>7} {'mails/s':>10} {'MB/s':>8} {'peak KB':>9}"
+    print(header + ("  vs baseline" if baseline else ""))
+    ratios = {}
+    for row in results:
+        line = (
+            f"{row['function']:<20} {row['size_kb']:>5g}KB {row['mails_per_s']:>10.1f} "
+            f"{row['mb_per_s']:>8.2f} {row['peak_kb']:>9.0f}"
+        )
+        old = (baseline or {}).get(_key(row))
+        if old:
+            ratios[_key(row)] = row["mails_per_s"] / old["mails_per_s"]
+            line += f"  x{ratios[_key(row)]:.2f}"
+        print(line)
+    return ratios
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="labeling/cleaning.py benchmark on a synthetic Turkish mail corpus")
+    parser.add_argument("--sizes", type=float, nargs="+", default=DEFAULT_SIZES_KB, help="gövde boyutları (KB)")
+    parser.add_argument("--mails", type=int, default=50, help="boyut başına mail sayısı")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=None, help="karşılaştırılacak baseline JSON")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="sonuçları baseline olarak yaz")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="izin verilen yavaşlama oranı (ölçüm gürültüsü ~%%10-20)")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.mails, args.repeat, args.seed)
+
+    baseline = None
+    if args.baseline:
+        with args.baseline.open("r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if (saved.get("seed"), saved.get("mails")) != (args.seed, args.mails):
+            print(f"warning: baseline was recorded with seed={saved.get('seed')} mails={saved.get('mails')}")
+        baseline = {_key(row): row for row in saved["results"]}
+
+    ratios = print_results(results, baseline)
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        with args.save_baseline.open("w", encoding="utf-8") as f:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "mails": args.mails,
+                "results": results,
+            }, f, indent=2)
+        print(f"baseline saved to {args.save_baseline}")
+
+    slower = sorted(key for key, ratio in ratios.items() if ratio < 1 - args.tolerance)
+    if slower:
+        print(f"REGRESSION (> {args.tolerance:.0%} slower than baseline): {', '.join(slower)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
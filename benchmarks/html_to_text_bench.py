@@ -0,0 +1,192 @@
+# benchmarks/html_to_text_bench.py
+"""
+labeling.cleaning.html_to_text için regresyon + hız karşılaştırması.
+
+Eski BeautifulSoup tabanlı versiyonla (legacy_html_to_text) aynı girdiler
+üzerinde çıktıların birebir aynı olduğunu kontrol eder ve hızlanmayı raporlar.
+
+Corpus:
+  - Outlook / Word tarzı sentetik HTML (dev inline style, <o:p>, mso yorumları),
+  - rastgele bozuk HTML parçaları (fuzz),
+  - --db verilirse raw store'daki gerçek HTML gövdeler.
+
+Çalıştırma (proje kökünden):
+    python benchmarks/html_to_text_bench.py --fuzz 3000 --db data/train/raw_emails.sqlite
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import warnings
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning  # noqa: E402
+
+from labeling.cleaning import html_to_text, normalize_whitespace_and_invisible  # noqa: E402
+
+
+# Outlook gövdelerindeki xmlns / <?xml ...?> yüzünden her dokümanda uyarı basıyor
+warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+
+
+def legacy_html_to_text(html: str) -> str:
+    """Değiştirilmeden önceki html_to_text (referans)."""
+    if not html:
+        return ""
+    soup = BeautifulSoup(html, "html.parser")
+    text = soup.get_text(separator="\n")
+    text = re.sub(r"\r\n", "\n", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = normalize_whitespace_and_invisible(text)
+    return text.strip()
+
+
+_WORDS = [
+    "Merhaba", "Sayın", "yetkili", "İstanbul", "Antalya", "Berlin", "uçuş", "bilet", "rezervasyon",
+    "otel", "2", "kişi", "tarihleri", "arasında", "rica", "ederiz", "THY", "PNR", "ABC123", "check-in",
+    "Teşekkürler", "İyi", "çalışmalar", "gizlidir", "confidential", "12.11.2025", "TK1234", "ığüşöçİĞÜŞÖÇ",
+]
+
+_STYLE = (
+    "<style><!-- /* Font Definitions */ @font-face {font-family:\"Cambria Math\"; panose-1:2 4 5 3 5 4 6 3 2 4;} "
+    + " ".join(f"p.MsoNormal{i}, li.MsoNormal{i}, div.MsoNormal{i} {{margin:0cm; font-size:11.0pt; "
+               f"font-family:\"Calibri\",sans-serif; mso-fareast-language:EN-US;}}" for i in range(60))
+    + " --></style>"
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 14)))
+
+
+def outlook_html(rng: random.Random) -> str:
+    """Outlook / Word'ün ürettiğine benzeyen mail gövdesi."""
+    parts = [
+        '<html xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office">',
+        '<head><meta http-equiv="Content-Type" content="text/html; charset=utf-8">',
+        '<meta name="Generator" content="Microsoft Word 15 (filtered medium)">',
+        _STYLE,
+        "<!--[if gte mso 9]><xml><o:shapedefaults v:ext=\"edit\" spidmax=\"1026\" /></xml><![endif]-->",
+        "<title>Talep</title></head>",
+        '<body lang="TR" link="#0563C1" style="word-wrap:break-word"><div class="WordSection1">',
+    ]
+    for _ in range(rng.randint(3, 25)):
+        kind = rng.random()
+        if kind < 0.5:
+            parts.append(
+                f'<p class="MsoNormal"><span style="font-size:11.0pt;color:#1F497D">{_sentence(rng)}'
+                f"{rng.choice(['', '&nbsp;', '&#8211;', '&amp;', ' &lt;x&gt; ', '&#150;', '&zwnj;'])}</span><o:p></o:p></p>"
+            )
+        elif kind < 0.65:
+            parts.append('<p class="MsoNormal"><o:p>&nbsp;</o:p></p>')
+        elif kind < 0.8:
+            rows = "".join(
+                f"<tr><td style=\"padding:0cm\"><p class=MsoNormal>{_sentence(rng)}</p></td>"
+                f"<td>{rng.randint(1, 999)}</td></tr>"
+                for _ in range(rng.randint(1, 5))
+            )
+            parts.append(f'<table class="MsoNormalTable" border="0">{rows}</table>')
+        elif kind < 0.9:
+            parts.append(
+                '<div style="border:none;border-top:solid #E1E1E1 1.0pt;padding:3.0pt 0cm 0cm 0cm">'
+                f"<p class=MsoNormal><b>From:</b> {_sentence(rng)}<br><b>Sent:</b> {_sentence(rng)}<br>"
+                f"<b>To:</b> booking@julesverne.com.tr<br><b>Subject:</b> {_sentence(rng)}</p></div>"
+            )
+        else:
+            parts.append(f"<pre>  {_sentence(rng)}\n\n   {_sentence(rng)}  </pre>")
+    parts.append("</div></body></html>")
+    return "\r\n".join(parts)
+
+
+_FUZZ_TOKENS = [
+    "<p>", "</p>", "<div>", "</div>", "<br>", "<br/>", "</br>", "<hr>", "<img src=x>", "<span>", "</span>",
+    "<b>", "</b>", "<pre>", "</pre>", "<textarea>", "</textarea>", "<style>", "</style>", "<script>", "</script>",
+    "<template>", "</template>", "<ruby>", "<rt>", "</rt>", "<rp>", "</rp>", "<title>", "</title>",
+    "<head>", "</head>", "<o:p>", "</o:p>", "<table><tr><td>", "</td></tr></table>", "<td>", "</td>",
+    "<!-- yorum -->", "<!---->", "<!DOCTYPE html>", "<![CDATA[cdata metni]]>", "<![CDATA[]]>", "<?xml x?>",
+    "<!ELEMENT x>", "&nbsp;", "&amp;", "&lt;", "&gt", "&copy", "&bogus;", "&#65;", "&#x41;", "&#0;", "&#150;",
+    "&#12ab", "&#x1F600;", "&#xD800;", "&#99999999;", "&", "<", ">", "< p>", "</>", "<a href='x'>", "</a>",
+    " ", "  ", "\t", "\n", "\r\n", "\n\n\n", " ", "​", "‍", "﻿", "\x0c",
+    "metin", "Uçuş", "İade", "a b", "x\ty",
+]
+
+
+def fuzz_html(rng: random.Random) -> str:
+    return "".join(rng.choice(_FUZZ_TOKENS) for _ in range(rng.randint(1, 60)))
+
+
+def db_bodies(path: Path, limit: int) -> List[str]:
+    from email_ingestion.raw_store import RawStore
+
+    store = RawStore(path)
+    bodies: List[str] = []
+    try:
+        for msg in store.iter_messages():
+            body = msg.get("body") or {}
+            if body.get("contentType", "html").lower() == "html" and body.get("content"):
+                bodies.append(body["content"])
+                if len(bodies) >= limit:
+                    break
+    finally:
+        store.close()
+    return bodies
+
+
+def timed(fn, docs: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="html_to_text regression check and benchmark")
+    parser.add_argument("--outlook", type=int, default=300, help="sentetik Outlook HTML sayısı")
+    parser.add_argument("--fuzz", type=int, default=3000, help="rastgele HTML parçası sayısı")
+    parser.add_argument("--db", type=Path, default=None, help="gerçek gövdeler için raw store yolu")
+    parser.add_argument("--db-limit", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    outlook = [outlook_html(rng) for _ in range(args.outlook)]
+    fuzz = [fuzz_html(rng) for _ in range(args.fuzz)]
+    real = db_bodies(args.db, args.db_limit) if args.db else []
+
+    mismatches = 0
+    for doc in outlook + fuzz + real:
+        expected, actual = legacy_html_to_text(doc), html_to_text(doc)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH\n  html:     {doc[:300]!r}\n  legacy:   {expected[:300]!r}\n  new:      {actual[:300]!r}")
+    total = len(outlook) + len(fuzz) + len(real)
+    print(f"regression: {total - mismatches}/{total} identical (outlook={len(outlook)} fuzz={len(fuzz)} db={len(real)})")
+
+    for name, docs in (("outlook", outlook), ("db", real)):
+        if not docs:
+            continue
+        size_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+        legacy_s = timed(legacy_html_to_text, docs, args.repeat)
+        new_s = timed(html_to_text, docs, args.repeat)
+        print(
+            f"{name}: {len(docs)} docs, {size_mb:.1f} MB | "
+            f"bs4 {legacy_s:.2f}s ({size_mb / legacy_s:.1f} MB/s) | "
+            f"single-pass {new_s:.2f}s ({size_mb / new_s:.1f} MB/s) | speedup x{legacy_s / new_s:.2f}"
+        )
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/normalize_bench.py
+"""
+labeling.cleaning.normalize_whitespace_and_invisible için fuzz regresyon +
+micro-benchmark. Eski (unicodedata.category'yi karakter karakter çağıran)
+versiyonla çıktıların birebir aynı olduğunu kontrol eder, hızlanmayı raporlar.
+
+Çalıştırma (proje kökünden):
+    python benchmarks/normalize_bench.py --fuzz 20000 --size-kb 100
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import unicodedata
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from labeling.cleaning import normalize_whitespace_and_invisible  # noqa: E402
+
+
+def legacy_normalize(text: str) -> str:
+    """Değiştirilmeden önceki normalize_whitespace_and_invisible (referans)."""
+    if not text:
+        return ""
+    text = text.replace("\u00A0", " ")
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Cf")
+    text = text.replace("\r\n", "\n")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    return text.strip()
+
+
+# Boşluk / satır sonu / görünmez karakter ağırlıklı alfabe
+_FUZZ_CHARS = (
+    [" ", " ", "\t", "\n", "\n", "\r", "\r\n", "\x0b", "\x0c", "\u00A0", "\u2003", "\u3000", "\u2028", "\x1c"]
+    + ["\u200B", "\u200C", "\u200D", "\u2060", "\uFEFF", "\u00AD", "\u061C", "\U000e0001", "\U0001d173"]
+    + ["a", "b", "ç", "ğ", "İ", "ı", "ş", "1", ".", "x"]
+)
+
+_WORDS = ["Merhaba", "uçuş", "bilet", "otel", "İstanbul", "Antalya", "rezervasyon", "2", "kişi", "rica", "ederiz"]
+
+
+def fuzz_text(rng: random.Random) -> str:
+    return "".join(rng.choice(_FUZZ_CHARS) for _ in range(rng.randint(0, 80)))
+
+
+def mail_like_text(rng: random.Random, size: int) -> str:
+    """html_to_text çıktısına benzeyen: kelimeler, çift boşluklar, nbsp, zero-width, boş satırlar."""
+    parts: List[str] = []
+    length = 0
+    while length < size:
+        piece = rng.choice(_WORDS) + rng.choice([" ", " ", " ", "  ", "\u00A0", "\n", "\n \n\n", "\u200B ", "\t"])
+        parts.append(piece)
+        length += len(piece)
+    return "".join(parts)
+
+
+def timed(fn, docs: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for doc in docs:
+            fn(doc)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="normalize_whitespace_and_invisible regression check and benchmark")
+    parser.add_argument("--fuzz", type=int, default=20000)
+    parser.add_argument("--docs", type=int, default=50, help="benchmark doküman sayısı")
+    parser.add_argument("--size-kb", type=int, default=100, help="benchmark doküman boyutu")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    # Tüm Cf karakterleri bir kez geçsin
+    all_cf = "".join(chr(c) for c in range(sys.maxunicode + 1) if unicodedata.category(chr(c)) == "Cf")
+    fuzz = [fuzz_text(rng) for _ in range(args.fuzz)] + [all_cf, f"a {all_cf} \n{all_cf}\n b"]
+
+    mismatches = 0
+    for doc in fuzz:
+        expected, actual = legacy_normalize(doc), normalize_whitespace_and_invisible(doc)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH\n  text:   {doc!r}\n  legacy: {expected!r}\n  new:    {actual!r}")
+    print(f"regression: {len(fuzz) - mismatches}/{len(fuzz)} identical")
+
+    docs = [mail_like_text(rng, args.size_kb * 1000) for _ in range(args.docs)]
+    normalize_whitespace_and_invisible("x")  # Cf regex'i kurulsun, ölçüme girmesin
+    size_mb = sum(len(d.encode("utf-8")) for d in docs) / 1e6
+    legacy_s = timed(legacy_normalize, docs, args.repeat)
+    new_s = timed(normalize_whitespace_and_invisible, docs, args.repeat)
+    print(
+        f"{len(docs)} docs x {args.size_kb} KB ({size_mb:.1f} MB) | "
+        f"legacy {legacy_s * 1000 / len(docs):.2f} ms/doc | new {new_s * 1000 / len(docs):.2f} ms/doc | "
+        f"speedup x{legacy_s / new_s:.1f}"
+    )
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 
 import os
 from dataclasses import dataclass
+from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,3 +17,42 @@ class GraphConfig:
 
     # Eğitim için kaç mail çekelim
     max_training_emails: int = int(os.getenv("TRAIN_MAX_EMAILS", "500"))
+
+    # Paralel ingestion: "mailbox:Klasör1,Klasör2;mailbox2:Klasör" (boşsa user_id + mail_folder_display_name)
+    sources: str = os.getenv("MS_SOURCES", "")
+    # Aynı anda kaç kaynak (mailbox/klasör) çekilsin
+    ingest_workers: int = int(os.getenv("MS_INGEST_WORKERS", "4"))
+    # Önce başlıkları listele, filtreden geçenlerin gövdesini $batch ile çek
+    selective_fetch: bool = os.getenv("MS_SELECTIVE_FETCH", "0") == "1"
+
+    def mail_sources(self) -> List["MailSource"]:
+        if not self.sources.strip():
+            return [MailSource(self.user_id, self.mail_folder_display_name)]
+        return parse_sources(self.sources, default_folder=self.mail_folder_display_name)
+
+@dataclass(frozen=True)
+class MailSource:
+    user_id: str
+    folder: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.user_id}/{self.folder}"
+
+def parse_sources(spec: str, default_folder: str = "TrainMails") -> List[MailSource]:
+    """
+    "a@x.com:TrainMails,Inbox;b@x.com" -> [a/TrainMails, a/Inbox, b/<default_folder>]
+    Aynı mailbox/klasör iki kez yazıldıysa bir kez alınır.
+    """
+    sources: List[MailSource] = []
+    for part in spec.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        user_id, _, folders = part.partition(":")
+        names = [f.strip() for f in folders.split(",") if f.strip()] or [default_folder]
+        for name in names:
+            source = MailSource(user_id.strip(), name)
+            if source not in sources:
+                sources.append(source)
+    return sources
@@ -1,15 +1,26 @@
-
+import os
 import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import logging
 
-from .config import GraphConfig
-from .graph_client import GraphEmailClient
+from labeling.filters import header_skip_reason
+
+from .config import GraphConfig, MailSource, parse_sources
+from .graph_client import HEADER_SELECT, MESSAGE_SELECT, GraphEmailClient
+from .raw_store import RAW_DB_PATH, RawStore, migrate_legacy_jsonl
 
 logger = logging.getLogger(__name__)
 
-OUT_PATH = Path("data/train/raw_emails.jsonl")
+# mailbox/klasör -> Graph deltaLink (bir sonraki delta sync buradan devam eder)
+DELTA_STATE_PATH = Path("data/train/graph_delta_state.json")
+# mailbox/klasör -> yarıda kalan sayfalamanın @odata.nextLink'i (crash sonrası resume)
+CHECKPOINT_PATH = Path("data/train/graph_fetch_checkpoint.json")
 
 def simplify_message(msg: Dict[str, Any]) -> Dict[str, Any]:
     body = msg.get("body", {}) or {}
@@ -18,6 +29,7 @@ def simplify_message(msg: Dict[str, Any]) -> Dict[str, Any]:
 
     return {
         "id": msg.get("id"),
+        "internetMessageId": msg.get("internetMessageId"),
         "subject": msg.get("subject"),
         "from": (msg.get("from") or {}).get("emailAddress", {}),
         "to": [r.get("emailAddress", {}) for r in msg.get("toRecipients", [])],
@@ -30,31 +42,348 @@ def simplify_message(msg: Dict[str, Any]) -> Dict[str, Any]:
         "bodyPreview": msg.get("bodyPreview"),
     }
 
-def main():
+def load_delta_state() -> Dict[str, str]:
+    if not DELTA_STATE_PATH.exists():
+        return {}
+    with DELTA_STATE_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_delta_state(state: Dict[str, str]) -> None:
+    _write_json_atomic(DELTA_STATE_PATH, state)
+
+def load_checkpoint() -> Dict[str, Dict[str, Any]]:
+    if not CHECKPOINT_PATH.exists():
+        return {}
+    with CHECKPOINT_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(state: Dict[str, Dict[str, Any]]) -> None:
+    _write_json_atomic(CHECKPOINT_PATH, state)
+
+def _write_json_atomic(path: Path, obj: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp_path, path)
+
+@dataclass
+class SourceStats:
+    source: MailSource
+    pages: int = 0
+    fetched: int = 0
+    new: int = 0
+    updated: int = 0
+    skipped: int = 0
+    duplicates: int = 0
+    removed: int = 0
+    filtered: int = 0
+    bodies: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def add(self, counts: Dict[str, int]) -> None:
+        for name, value in counts.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def summary(self) -> str:
+        rate = self.fetched / self.seconds if self.seconds else 0.0
+        text = (
+            f"{self.source.key}: fetched={self.fetched} pages={self.pages} new={self.new} "
+            f"updated={self.updated} skipped(existing)={self.skipped} duplicates={self.duplicates} "
+            f"removed={self.removed} filtered={self.filtered} bodies={self.bodies} "
+            f"in {self.seconds:.1f}s ({rate:.1f} msg/s)"
+        )
+        if self.error:
+            text += f" FAILED: {self.error}"
+        return text
+
+class RawWriter:
+    """
+    Paralel kaynaklardan gelen sayfaları raw store'a yazan tek writer.
+    id / internetMessageId kümesi aynı lock altında güncellenir.
+    """
+
+    def __init__(self, store: RawStore) -> None:
+        self.store = store
+        self.seen = store.known_ids()
+        self._lock = threading.Lock()
+
+    def will_skip(self, msg: Dict[str, Any], allow_updates: bool) -> bool:
+        """write_page bu mesajı yazmadan atlayacak mı (gövdesini indirmeye gerek var mı)."""
+        with self._lock:
+            if msg.get("id") in self.seen:
+                return not allow_updates
+            internet_id = msg.get("internetMessageId")
+            return bool(internet_id and internet_id in self.seen)
+
+    def write_page(self, msgs: Iterable[Dict[str, Any]], allow_updates: bool) -> Dict[str, int]:
+        """
+        Bir sayfadaki mesajları tek transaction'da store'a yazar.
+        Zaten olan id'ler atlanır; allow_updates=True ise (delta'dan gelen
+        değişmiş mesajlar) eski kayıt yeni haliyle değiştirilir.
+        Başka bir mailbox'tan zaten gelmiş mail (aynı internetMessageId) atlanır.
+        """
+        counts = {"new": 0, "updated": 0, "skipped": 0, "duplicates": 0, "removed": 0}
+        rows: List[Dict[str, Any]] = []
+        with self._lock:
+            for msg in msgs:
+                if "@removed" in msg:
+                    counts["removed"] += 1
+                    continue
+                msg_id = msg.get("id")
+                internet_id = msg.get("internetMessageId")
+                if msg_id in self.seen:
+                    if not allow_updates:
+                        counts["skipped"] += 1
+                        continue
+                    counts["updated"] += 1
+                elif internet_id and internet_id in self.seen:
+                    counts["duplicates"] += 1
+                    continue
+                else:
+                    counts["new"] += 1
+                    self.seen.add(msg_id)
+                    if internet_id:
+                        self.seen.add(internet_id)
+                rows.append(simplify_message(msg))
+            # Checkpoint ancak sayfa commit edildikten sonra ilerletilmeli
+            self.store.upsert(rows)
+        return counts
+
+class FetchState:
+    """Kaynaklar arasında paylaşılan checkpoint + delta state (thread-safe kayıt)."""
+
+    def __init__(self, restart: bool) -> None:
+        self.checkpoints = {} if restart else load_checkpoint()
+        self.delta = load_delta_state()
+        self._lock = threading.Lock()
+
+    def checkpoint_for(self, key: str, mode: str) -> Optional[Dict[str, Any]]:
+        checkpoint = self.checkpoints.get(key)
+        if checkpoint and checkpoint.get("mode") != mode:
+            logger.info("Ignoring %s checkpoint for %s (running in %s mode)", checkpoint.get("mode"), key, mode)
+            return None
+        return checkpoint
+
+    def save_page(self, key: str, mode: str, next_link: str, fetched: int) -> None:
+        with self._lock:
+            self.checkpoints[key] = {"mode": mode, "next_link": next_link, "fetched": fetched}
+            save_checkpoint(self.checkpoints)
+
+    def finish(self, key: str, delta_link: Optional[str] = None) -> None:
+        with self._lock:
+            if delta_link:
+                # Round bitti: deltaLink bir sonraki çalıştırmanın başlangıcı
+                self.delta[key] = delta_link
+                save_delta_state(self.delta)
+            if self.checkpoints.pop(key, None) is not None:
+                save_checkpoint(self.checkpoints)
+
+def filter_headers(msgs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Gövde indirilmeden önce etiketlemede zaten atlanacak mailleri ayıklar."""
+    kept = []
+    for msg in msgs:
+        if "@removed" in msg:
+            kept.append(msg)
+            continue
+        to_addrs = [(r.get("emailAddress") or {}).get("address") or "" for r in msg.get("toRecipients") or []]
+        reason = header_skip_reason(msg.get("subject"), to_addrs)
+        if reason:
+            logger.debug("Not downloading body of %s: %s", msg.get("id"), reason)
+            continue
+        kept.append(msg)
+    return kept
+
+def attach_bodies(
+    client: GraphEmailClient,
+    source: MailSource,
+    msgs: List[Dict[str, Any]],
+    writer: RawWriter,
+    allow_updates: bool,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Gövdesiz gelen (başlık listesi / header-only delta link) mesajların
+    gövdelerini $batch ile çeker. Writer'ın zaten atlayacağı mesajlar için
+    istek atılmaz. Graph'ta artık olmayan mesajlar sayfadan düşer.
+    Dönüş: (yazılacak mesajlar, gövdesi çekilen mesaj sayısı)
+    """
+    need = [
+        msg["id"] for msg in msgs
+        if "@removed" not in msg and "body" not in msg and not writer.will_skip(msg, allow_updates)
+    ]
+    if not need:
+        return msgs, 0
+
+    bodies = client.fetch_message_bodies(need, user_id=source.user_id)
+    wanted = set(need)
+    out = []
+    for msg in msgs:
+        if msg.get("id") in wanted:
+            if msg["id"] not in bodies:
+                continue
+            msg = {**msg, **bodies[msg["id"]]}
+        out.append(msg)
+    return out, len(bodies)
+
+def ingest_source(
+    client: GraphEmailClient,
+    source: MailSource,
+    writer: RawWriter,
+    state: FetchState,
+    delta: bool,
+    max_count: int,
+    selective: bool = False,
+) -> SourceStats:
+    stats = SourceStats(source)
+    mode = "delta" if delta else "full"
+    checkpoint = state.checkpoint_for(source.key, mode)
+    fetched = checkpoint.get("fetched", 0) if checkpoint else 0
+    start_url = checkpoint.get("next_link") if checkpoint else None
+    if checkpoint:
+        logger.info("Resuming %s fetch for %s after %d messages", mode, source.key, fetched)
+    select = HEADER_SELECT if selective else MESSAGE_SELECT
+
+    def process(page: List[Dict[str, Any]]) -> None:
+        nonlocal fetched
+        stats.pages += 1
+        stats.fetched += len(page)
+        fetched += len(page)
+        if selective:
+            kept = filter_headers(page)
+            stats.filtered += len(page) - len(kept)
+            page = kept
+        page, downloaded = attach_bodies(client, source, page, writer, allow_updates=delta)
+        stats.bodies += downloaded
+        stats.add(writer.write_page(page, allow_updates=delta))
+
+    started = time.perf_counter()
+    if delta:
+        pages = client.iter_delta_pages(
+            state.delta.get(source.key), start_url=start_url, user_id=source.user_id, folder=source.folder,
+            select=select,
+        )
+        for page, next_link, delta_link in pages:
+            process(page)
+            if next_link:
+                state.save_page(source.key, mode, next_link, fetched)
+            else:
+                state.finish(source.key, delta_link)
+    else:
+        remaining = max(max_count - fetched, 0)
+        if remaining:
+            pages = client.iter_message_pages(
+                max_count=remaining, start_url=start_url, user_id=source.user_id, folder=source.folder,
+                select=select,
+            )
+            for page, next_link in pages:
+                process(page)
+                if next_link:
+                    state.save_page(source.key, mode, next_link, fetched)
+        state.finish(source.key)
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fetch training emails from Microsoft Graph")
+    parser.add_argument("--delta", action="store_true",
+                        help="Graph delta query ile sadece yeni / değişen mesajları çek")
+    parser.add_argument("--restart", action="store_true",
+                        help="Yarıda kalan sayfalama checkpoint'ini yok say, baştan başla")
+    parser.add_argument("--sources", default=None,
+                        help='MS_SOURCES yerine: "mailbox:Klasör1,Klasör2;mailbox2:Klasör"')
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Aynı anda çekilecek kaynak sayısı (varsayılan MS_INGEST_WORKERS)")
+    parser.add_argument("--selective", action=argparse.BooleanOptionalAction, default=None,
+                        help="Önce sadece başlıkları listele, konu / alıcı filtresinden geçenlerin "
+                             "gövdesini $batch ile indir (varsayılan MS_SELECTIVE_FETCH)")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
+    args = parse_args(argv)
     cfg = GraphConfig()
     client = GraphEmailClient(cfg)
 
+    sources = parse_sources(args.sources, cfg.mail_folder_display_name) if args.sources else cfg.mail_sources()
+    workers = max(1, min(args.workers or cfg.ingest_workers, len(sources)))
+    selective = cfg.selective_fetch if args.selective is None else args.selective
+
+    store = RawStore(RAW_DB_PATH)
+    migrate_legacy_jsonl(store)
+    writer = RawWriter(store)
+    logger.info("Raw store already has %d messages", len(store))
+    state = FetchState(restart=args.restart)
+
     logger.info(
-        "Fetching training emails from mailbox=%s, folder='%s', max=%d",
-        cfg.user_id,
-        cfg.mail_folder_display_name,
+        "Fetching training emails (%s%s) from %d sources with %d workers, max=%d per source: %s",
+        "delta" if args.delta else "full",
+        ", selective" if selective else "",
+        len(sources),
+        workers,
         cfg.max_training_emails,
+        ", ".join(s.key for s in sources),
     )
 
-    msgs = client.fetch_messages_from_folder(max_count=cfg.max_training_emails)
-    logger.info("Total messages fetched: %d", len(msgs))
+    # Klasör id'leri mailbox başına tek taramayla çözülür (sonrası cache'ten)
+    folders_by_user: Dict[str, List[str]] = {}
+    for source in sources:
+        folders_by_user.setdefault(source.user_id, []).append(source.folder)
+    for user_id, folders in folders_by_user.items():
+        try:
+            client.resolve_folder_ids(folders, user_id)
+        except Exception as e:
+            logger.warning("Could not pre-resolve folders of %s: %s", user_id, e)
+
+    results: List[SourceStats] = []
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="graph-ingest") as pool:
+            futures = {
+                pool.submit(
+                    ingest_source, client, source, writer, state, args.delta, cfg.max_training_emails, selective
+                ): source
+                for source in sources
+            }
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    # Bir kaynağın hatası diğerlerini durdurmasın; checkpoint'i kaldığı yerde kalır
+                    logger.exception("Ingestion failed for %s", source.key)
+                    stats = SourceStats(source, error=str(e))
+                logger.info("Source done: %s", stats.summary())
+                results.append(stats)
+    finally:
+        store.close()
+        client.transport.log_metrics()
+        client.close()
 
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_PATH.open("a", encoding="utf-8") as f:
-        for msg in msgs:
-            simple = simplify_message(msg)
-            f.write(json.dumps(simple, ensure_ascii=False) + "\n")
+    elapsed = time.perf_counter() - started
+    total = sum(stats.fetched for stats in results)
+    logger.info("Per-source throughput:")
+    for stats in sorted(results, key=lambda s: s.source.key):
+        logger.info("  %s", stats.summary())
+    logger.info(
+        "Total: fetched=%d new=%d duplicates=%d filtered=%d bodies=%d in %.1fs (%.1f msg/s)",
+        total,
+        sum(stats.new for stats in results),
+        sum(stats.duplicates for stats in results),
+        sum(stats.filtered for stats in results),
+        sum(stats.bodies for stats in results),
+        elapsed,
+        total / elapsed if elapsed else 0.0,
+    )
+    logger.info("Training emails written to %s", RAW_DB_PATH)
 
-    logger.info("Training emails written to %s", OUT_PATH)
+    failed = [stats.source.key for stats in results if stats.error]
+    if failed:
+        raise SystemExit(f"Ingestion failed for: {', '.join(failed)} (rerun to resume)")
 
 if __name__ == "__main__":
     main()
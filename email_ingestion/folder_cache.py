@@ -0,0 +1,68 @@
+import os
+import json
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# mailbox -> {klasör adı (lower) -> Graph folder id}
+FOLDER_CACHE_PATH = Path(os.getenv("MS_FOLDER_CACHE_PATH", "data/train/graph_folder_cache.json"))
+
+
+class FolderCache:
+    """
+    Klasör görünen adı -> Graph folder id eşlemesini mailbox bazında diskte tutar.
+    Folder id klasör silinip yeniden açılmadıkça değişmez; id ile yapılan
+    istek 404 dönerse çağıran taraf invalidate() ile kaydı siler.
+    """
+
+    def __init__(self, path: Optional[Path] = FOLDER_CACHE_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, str]] = {}
+        if path is not None and path.exists():
+            try:
+                with path.open("r", encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning("Ignoring unreadable folder cache %s: %s", path, e)
+
+    @staticmethod
+    def _key(name: str) -> str:
+        return (name or "").strip().lower()
+
+    def get(self, user_id: str, name: str) -> Optional[str]:
+        with self._lock:
+            return self._data.get(user_id.lower(), {}).get(self._key(name))
+
+    def update(self, user_id: str, folders: Dict[str, str]) -> None:
+        """folders: görünen ad -> id. Mevcut kayıtların üzerine yazar."""
+        if not folders:
+            return
+        with self._lock:
+            mailbox = self._data.setdefault(user_id.lower(), {})
+            mailbox.update({self._key(name): folder_id for name, folder_id in folders.items()})
+            self._save()
+
+    def invalidate(self, user_id: str, name: Optional[str] = None) -> None:
+        """Tek klasörü, name verilmezse mailbox'ın tüm kayıtlarını siler."""
+        with self._lock:
+            mailbox = self._data.get(user_id.lower())
+            if not mailbox:
+                return
+            if name is None:
+                del self._data[user_id.lower()]
+            elif mailbox.pop(self._key(name), None) is None:
+                return
+            self._save()
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -1,43 +1,44 @@
 
+import time
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
 from .config import GraphConfig
+from .folder_cache import FolderCache
+from .transport import GraphTransport
 import logging
 
 logger = logging.getLogger(__name__)
 
-TOKEN_URL_TEMPLATE = "https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
 
+MESSAGE_SELECT = "id,internetMessageId,subject,bodyPreview,body,from,toRecipients,ccRecipients,receivedDateTime"
+# İki aşamalı çekim: önce gövdesiz başlıklar, filtreden geçenlerin gövdesi $batch ile
+HEADER_SELECT = "id,internetMessageId,subject,from,toRecipients,ccRecipients,receivedDateTime"
+BODY_SELECT = "id,body,bodyPreview"
+
+# Graph JSON $batch tek istekte en fazla 20 alt istek kabul ediyor
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_RETRIES = 5
+BATCH_RETRY_STATUSES = {429, 503, 504}
+
 class GraphEmailClient:
-    def __init__(self, cfg: Optional[GraphConfig] = None) -> None:
+    def __init__(
+        self,
+        cfg: Optional[GraphConfig] = None,
+        transport: Optional[GraphTransport] = None,
+        folder_cache: Optional[FolderCache] = None,
+    ) -> None:
         self.cfg = cfg or GraphConfig()
-        self._access_token: Optional[str] = None
-
-    def _get_access_token(self) -> str:
-        if self._access_token:
-            return self._access_token
-
-        data = {
-            "client_id": self.cfg.client_id,
-            "client_secret": self.cfg.client_secret,
-            "grant_type": "client_credentials",
-            "scope": "https://graph.microsoft.com/.default",
-        }
-        token_url = TOKEN_URL_TEMPLATE.format(tenant_id=self.cfg.tenant_id)
-        logger.info("Requesting access token from Microsoft identity platform")
-        resp = requests.post(token_url, data=data, timeout=20)
-        resp.raise_for_status()
-        js = resp.json()
-        self._access_token = js["access_token"]
-        logger.debug("Access token acquired successfully")
-        return self._access_token
-
-    def _headers(self) -> Dict[str, str]:
-        return {
-            "Authorization": f"Bearer {self._get_access_token()}",
-            "Accept": "application/json",
-        }
+        # Token, bağlantı havuzu, throttling retry'ı ve metrikler transport'ta
+        self.transport = transport or GraphTransport(self.cfg)
+        self.folder_cache = folder_cache or FolderCache()
+
+    def _get(self, url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        return self.transport.get_json(url, params=params, headers=headers)
+
+    def close(self) -> None:
+        self.transport.close()
 
     WELL_KNOWN_FOLDERS = {
         "inbox": "Inbox",
@@ -46,91 +47,282 @@ class GraphEmailClient:
         "deleteditems": "DeletedItems",
     }
 
-    def _resolve_folder_id(self, display_name: str) -> str:
-        dn = (display_name or "").strip()
-        if not dn:
-            raise ValueError("Folder display name is empty")
+    def resolve_folder_ids(self, display_names: Iterable[str], user_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Birden fazla klasör adını tek bir klasör taramasıyla id'ye çevirir.
+        Önce well-known isimler ve cache'e bakılır; kalanlar için Inbox alt
+        klasörleri, sonra tüm mailFolders BİR KEZ sayfalanır (hepsi bulununca
+        durur). Taramada görülen tüm klasörler cache'e yazılır.
+        Dönüş: verilen ad -> id (bulunamayanlar dönüşte yer almaz).
+        """
+        user_id = user_id or self.cfg.user_id
+        result: Dict[str, str] = {}
+        missing: Dict[str, List[str]] = {}
+        for name in display_names:
+            dn = (name or "").strip()
+            if not dn:
+                raise ValueError("Folder display name is empty")
+            lower = dn.lower()
+            if lower in self.WELL_KNOWN_FOLDERS:
+                result[name] = self.WELL_KNOWN_FOLDERS[lower]
+                continue
+            cached = self.folder_cache.get(user_id, dn)
+            if cached:
+                result[name] = cached
+            else:
+                missing.setdefault(lower, []).append(name)
 
-        lower = dn.lower()
-        if lower in self.WELL_KNOWN_FOLDERS:
-            return self.WELL_KNOWN_FOLDERS[lower]
+        if not missing:
+            return result
 
-        # Önce Inbox altındaki alt klasörlerde ara
-        url = f"{GRAPH_BASE}/users/{self.cfg.user_id}/mailFolders/inbox/childFolders"
-        params = {"$top": 100}
-        while True:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=20)
-            resp.raise_for_status()
-            js = resp.json()
-            for f in js.get("value", []):
-                if (f.get("displayName") or "").strip().lower() == lower:
-                    folder_id = f.get("id")
-                    logger.info("Resolved folder '%s' under Inbox -> id=%s", dn, folder_id)
-                    return folder_id
-            next_link = js.get("@odata.nextLink")
-            if not next_link:
+        # Aynı isim hem Inbox altında hem başka yerde varsa Inbox altındaki kazanır
+        seen: Dict[str, str] = {}
+        for url, where in (
+            (f"{GRAPH_BASE}/users/{user_id}/mailFolders/inbox/childFolders", "under Inbox"),
+            (f"{GRAPH_BASE}/users/{user_id}/mailFolders", "in all folders"),
+        ):
+            params: Dict[str, Any] = {"$top": 100, "$select": "id,displayName"}
+            while True:
+                js = self._get(url, params=params)
+                for f in js.get("value", []):
+                    lower = (f.get("displayName") or "").strip().lower()
+                    if lower and f.get("id") and lower not in seen:
+                        seen[lower] = f["id"]
+                        if lower in missing:
+                            logger.info("Resolved folder '%s' %s -> id=%s", lower, where, f["id"])
+                next_link = js.get("@odata.nextLink")
+                if not next_link or all(lower in seen for lower in missing):
+                    break
+                url = next_link
+                params = {}
+            if all(lower in seen for lower in missing):
                 break
-            url = next_link
-            params = {}
 
-        # Tüm mailFolders içinde ara
-        url = f"{GRAPH_BASE}/users/{self.cfg.user_id}/mailFolders"
-        params = {"$top": 100}
+        self.folder_cache.update(user_id, seen)
+        for lower, names in missing.items():
+            if lower in seen:
+                for name in names:
+                    result[name] = seen[lower]
+        return result
+
+    def _resolve_folder_id(self, display_name: str, user_id: Optional[str] = None) -> str:
+        user_id = user_id or self.cfg.user_id
+        folder_id = self.resolve_folder_ids([display_name], user_id).get(display_name)
+        if not folder_id:
+            raise RuntimeError(f"Folder with displayName='{(display_name or '').strip()}' not found in mailbox {user_id}")
+        return folder_id
+
+    def _refresh_folder_id(self, error: requests.HTTPError, user_id: str, folder: str) -> str:
+        """
+        Cache'ten gelen folder id ile yapılan ilk istek 404 döndüyse (klasör
+        silinip aynı adla yeniden açılmış olabilir) kaydı silip tekrar çözer.
+        Başka hatalar aynen fırlatılır.
+        """
+        status = error.response.status_code if error.response is not None else None
+        if status != 404 or folder.strip().lower() in self.WELL_KNOWN_FOLDERS:
+            raise error
+        logger.warning("Folder '%s' of %s returned 404, refreshing cached folder id", folder, user_id)
+        self.folder_cache.invalidate(user_id, folder)
+        return self._resolve_folder_id(folder, user_id)
+
+    def iter_message_pages(
+        self,
+        max_count: int = 500,
+        start_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        folder: Optional[str] = None,
+        select: str = MESSAGE_SELECT,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        Klasördeki mesajları sayfa sayfa döner: (sayfadaki mesajlar, @odata.nextLink).
+        Son sayfada (veya max_count'a ulaşıldığında) next_link None olur.
+        start_url verilirse (checkpoint'ten gelen nextLink) oradan devam edilir.
+        user_id / folder verilmezse config'teki mailbox ve klasör kullanılır.
+        """
+        user_id = user_id or self.cfg.user_id
+        folder = folder or self.cfg.mail_folder_display_name
+
+        if start_url:
+            url = start_url
+            params: Dict[str, Any] = {}
+            logger.info("Resuming message listing for %s/'%s' from saved nextLink", user_id, folder)
+        else:
+            folder_id = self._resolve_folder_id(folder, user_id)
+            url = f"{GRAPH_BASE}/users/{user_id}/mailFolders/{folder_id}/messages"
+            params = {
+                "$top": 50,
+                "$orderby": "receivedDateTime desc",
+                "$select": select,
+            }
+            logger.info(
+                "Fetching messages from folder '%s' (id=%s) for user=%s, max_count=%s",
+                folder,
+                folder_id,
+                user_id,
+                max_count,
+            )
+
+        fetched = 0
+        retry_stale_folder = not start_url
         while True:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=20)
-            resp.raise_for_status()
-            js = resp.json()
-            for f in js.get("value", []):
-                if (f.get("displayName") or "").strip().lower() == lower:
-                    folder_id = f.get("id")
-                    logger.info("Resolved folder '%s' in all folders -> id=%s", dn, folder_id)
-                    return folder_id
+            try:
+                js = self._get(url, params=params)
+            except requests.HTTPError as e:
+                if not retry_stale_folder:
+                    raise
+                retry_stale_folder = False
+                folder_id = self._refresh_folder_id(e, user_id, folder)
+                url = f"{GRAPH_BASE}/users/{user_id}/mailFolders/{folder_id}/messages"
+                continue
+            retry_stale_folder = False
+            value = js.get("value", [])
             next_link = js.get("@odata.nextLink")
+
+            if fetched + len(value) >= max_count:
+                value = value[:max_count - fetched]
+                logger.info("Reached max_count=%d for %s/'%s', stopping pagination", max_count, user_id, folder)
+                next_link = None
+            fetched += len(value)
+            logger.debug("Fetched %d messages in current page, total so far: %d", len(value), fetched)
+
+            yield value, next_link
+
             if not next_link:
                 break
             url = next_link
             params = {}
 
-        raise RuntimeError(f"Folder with displayName='{dn}' not found in mailbox {self.cfg.user_id}")
+        logger.info("Total messages fetched from %s/'%s': %d", user_id, folder, fetched)
 
     def fetch_messages_from_folder(self, max_count: int = 500) -> List[Dict[str, Any]]:
-        folder_id = self._resolve_folder_id(self.cfg.mail_folder_display_name)
-
         messages: List[Dict[str, Any]] = []
-        url = f"{GRAPH_BASE}/users/{self.cfg.user_id}/mailFolders/{folder_id}/messages"
-        params = {
-            "$top": 50,
-            "$orderby": "receivedDateTime desc",
-            "$select": "id,subject,bodyPreview,body,from,toRecipients,ccRecipients,receivedDateTime",
-        }
-
-        logger.info(
-            "Fetching messages from folder '%s' (id=%s) for user=%s, max_count=%s",
-            self.cfg.mail_folder_display_name,
-            folder_id,
-            self.cfg.user_id,
-            max_count,
-        )
+        for page, _ in self.iter_message_pages(max_count=max_count):
+            messages.extend(page)
+        return messages
 
+    def iter_delta_pages(
+        self,
+        delta_link: Optional[str] = None,
+        start_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        folder: Optional[str] = None,
+        select: str = MESSAGE_SELECT,
+    ) -> Iterator[Tuple[List[Dict[str, Any]], Optional[str], Optional[str]]]:
+        """
+        Klasördeki değişiklikleri Graph delta query ile sayfa sayfa döner:
+        (sayfadaki mesajlar, @odata.nextLink, @odata.deltaLink).
+        Ara sayfalarda deltaLink None, son sayfada nextLink None olur.
+
+        delta_link yoksa ilk senkronizasyon yapılır (tüm klasör), varsa sadece o
+        linkten bu yana yeni gelen / değişen / silinen mesajlar döner.
+        start_url (yarıda kalan round'un nextLink'i) ikisinden de önceliklidir.
+        Silinen mesajlar {"id": ..., "@removed": {...}} şeklinde gelir.
+        select sadece ilk senkronizasyonda kullanılır; sonraki linkler kendi
+        $select'ini taşır.
+        """
+        user_id = user_id or self.cfg.user_id
+        folder = folder or self.cfg.mail_folder_display_name
+
+        params: Dict[str, Any] = {}
+        if start_url:
+            url = start_url
+            logger.info("Resuming delta round for %s/'%s' from saved nextLink", user_id, folder)
+        elif delta_link:
+            url = delta_link
+            logger.info("Fetching delta changes for %s/'%s'", user_id, folder)
+        else:
+            folder_id = self._resolve_folder_id(folder, user_id)
+            url = f"{GRAPH_BASE}/users/{user_id}/mailFolders/{folder_id}/messages/delta"
+            params = {"$select": select}
+            logger.info("No delta token for %s/'%s' (id=%s), starting initial sync", user_id, folder, folder_id)
+
+        fetched = 0
+        retry_stale_folder = not (start_url or delta_link)
         while True:
-            resp = requests.get(url, headers=self._headers(), params=params, timeout=20)
-            resp.raise_for_status()
-            js = resp.json()
+            try:
+                js = self._get(url, params=params, headers={"Prefer": "odata.maxpagesize=50"})
+            except requests.HTTPError as e:
+                if not retry_stale_folder:
+                    raise
+                retry_stale_folder = False
+                folder_id = self._refresh_folder_id(e, user_id, folder)
+                url = f"{GRAPH_BASE}/users/{user_id}/mailFolders/{folder_id}/messages/delta"
+                continue
+            retry_stale_folder = False
             value = js.get("value", [])
-            messages.extend(value)
-            logger.debug("Fetched %d messages in current page, total so far: %d", len(value), len(messages))
-
-            if len(messages) >= max_count:
-                messages = messages[:max_count]
-                logger.info("Reached max_count=%d, stopping pagination", max_count)
-                break
+            fetched += len(value)
+            logger.debug("Fetched %d delta items in current page, total so far: %d", len(value), fetched)
 
             next_link = js.get("@odata.nextLink")
+            yield value, next_link, None if next_link else js.get("@odata.deltaLink")
+
             if not next_link:
-                logger.info("No @odata.nextLink, finished pagination")
                 break
             url = next_link
             params = {}
 
-        logger.info("Total messages fetched from '%s': %d", self.cfg.mail_folder_display_name, len(messages))
-        return messages
+        logger.info("Delta sync for %s/'%s' returned %d items", user_id, folder, fetched)
+
+    def fetch_message_bodies(
+        self,
+        message_ids: Iterable[str],
+        user_id: Optional[str] = None,
+        select: str = BODY_SELECT,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Verilen mesajların gövdelerini JSON $batch ile (istek başına en fazla 20
+        mesaj) çeker. Dönüş: id -> {"id", "body", "bodyPreview"}.
+        Alt isteklerden throttle edilenler (429 / 503 / 504) Retry-After kadar
+        beklenip tekrar gönderilir; silinmiş (404) mesajlar dönüşte yer almaz,
+        diğer hatalar RuntimeError olarak fırlatılır.
+        """
+        user_id = user_id or self.cfg.user_id
+        pending = list(dict.fromkeys(message_ids))
+        bodies: Dict[str, Dict[str, Any]] = {}
+
+        for start in range(0, len(pending), BATCH_MAX_REQUESTS):
+            chunk = pending[start:start + BATCH_MAX_REQUESTS]
+            attempt = 0
+            while chunk:
+                requests_ = [
+                    {
+                        "id": str(n),
+                        "method": "GET",
+                        "url": f"/users/{user_id}/messages/{quote(msg_id, safe='')}?$select={select}",
+                    }
+                    for n, msg_id in enumerate(chunk)
+                ]
+                js = self.transport.post_json(f"{GRAPH_BASE}/$batch", {"requests": requests_})
+
+                throttled: List[str] = []
+                retry_after = 0.0
+                for item in js.get("responses", []):
+                    msg_id = chunk[int(item["id"])]
+                    status = item.get("status")
+                    if status == 200:
+                        bodies[msg_id] = item.get("body") or {}
+                    elif status == 404:
+                        logger.warning("Message %s no longer exists, skipping body", msg_id)
+                    elif status in BATCH_RETRY_STATUSES:
+                        throttled.append(msg_id)
+                        headers = {k.lower(): v for k, v in (item.get("headers") or {}).items()}
+                        try:
+                            retry_after = max(retry_after, float(headers.get("retry-after", 1)))
+                        except ValueError:
+                            retry_after = max(retry_after, 1.0)
+                    else:
+                        error = (item.get("body") or {}).get("error", {})
+                        raise RuntimeError(f"Body fetch for message {msg_id} failed with {status}: {error}")
+
+                if throttled and attempt >= BATCH_MAX_RETRIES:
+                    raise RuntimeError(f"Body fetch still throttled after {attempt} retries ({len(throttled)} messages)")
+                if throttled:
+                    attempt += 1
+                    logger.warning(
+                        "%d of %d batched body requests throttled, retry %d/%d in %.1fs",
+                        len(throttled), len(chunk), attempt, BATCH_MAX_RETRIES, retry_after,
+                    )
+                    time.sleep(retry_after)
+                chunk = throttled
+
+        return bodies
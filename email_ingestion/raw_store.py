@@ -0,0 +1,288 @@
+import os
+import json
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import threading
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+RAW_DB_PATH = Path(os.getenv("RAW_STORE_PATH", "data/train/raw_emails.sqlite"))
+# Eski append-only JSONL store (import / export için)
+RAW_JSONL_PATH = Path("data/train/raw_emails.jsonl")
+
+BODY_COMPRESS_LEVEL = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id TEXT PRIMARY KEY,
+    internet_message_id TEXT,
+    subject TEXT,
+    from_json TEXT,
+    to_json TEXT,
+    cc_json TEXT,
+    received TEXT,
+    body_preview TEXT,
+    body_sha TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_messages_received ON messages(received);
+CREATE INDEX IF NOT EXISTS idx_messages_internet_id ON messages(internet_message_id);
+
+-- Gövdeler ayrı tabloda: başlık taramaları gövde sayfalarına hiç dokunmaz
+CREATE TABLE IF NOT EXISTS bodies (
+    id TEXT PRIMARY KEY,
+    content_type TEXT,
+    content BLOB
+);
+"""
+
+_HEADER_COLUMNS = "id, internet_message_id, subject, from_json, to_json, cc_json, received, body_preview, body_sha"
+
+
+def body_sha(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), BODY_COMPRESS_LEVEL)
+
+
+def _decompress(blob: Optional[bytes]) -> str:
+    return zlib.decompress(blob).decode("utf-8") if blob else ""
+
+
+def _header_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "internetMessageId": row["internet_message_id"],
+        "subject": row["subject"],
+        "from": json.loads(row["from_json"] or "{}"),
+        "to": json.loads(row["to_json"] or "[]"),
+        "cc": json.loads(row["cc_json"] or "[]"),
+        "receivedDateTime": row["received"],
+        "bodyPreview": row["body_preview"],
+        "bodySha": row["body_sha"],
+    }
+
+
+class RawStore:
+    """
+    Ham mail deposu (raw_emails.jsonl yerine): SQLite, id primary key,
+    receivedDateTime index'li, gövdeler zlib ile sıkıştırılmış ayrı tabloda.
+
+    - iter_headers(): konu / alıcı / tarih; gövde okunmaz, açılmaz.
+    - iter_messages() / get_message(): JSONL satırlarıyla aynı şekilde tam mesaj.
+    - upsert(): aynı id tekrar gelirse (delta'da değişen mesaj) üzerine yazar.
+
+    Tek connection, paralel ingestion thread'leri için lock ile korunuyor.
+    """
+
+    def __init__(self, path: Path = RAW_DB_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def known_ids(self) -> Set[str]:
+        """Graph id'leri ve internetMessageId'ler (kaynaklar arası tekrar kontrolü için)."""
+        ids: Set[str] = set()
+        with self._lock:
+            for msg_id, internet_id in self._conn.execute("SELECT id, internet_message_id FROM messages"):
+                ids.add(msg_id)
+                if internet_id:
+                    ids.add(internet_id)
+        return ids
+
+    def upsert(self, msgs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Sadeleştirilmiş mesajları (fetch_training_batch.simplify_message formatı)
+        tek transaction'da yazar; dönünce veri commit edilmiş olur.
+        """
+        header_rows = []
+        body_rows = []
+        for msg in msgs:
+            body = msg.get("body") or {}
+            content = body.get("content") or ""
+            header_rows.append((
+                msg["id"],
+                msg.get("internetMessageId"),
+                msg.get("subject"),
+                json.dumps(msg.get("from") or {}, ensure_ascii=False),
+                json.dumps(msg.get("to") or [], ensure_ascii=False),
+                json.dumps(msg.get("cc") or [], ensure_ascii=False),
+                msg.get("receivedDateTime"),
+                msg.get("bodyPreview"),
+                body_sha(content),
+            ))
+            body_rows.append((msg["id"], body.get("contentType", "html"), _compress(content)))
+
+        if not header_rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"""
+                INSERT INTO messages ({_HEADER_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    internet_message_id = excluded.internet_message_id,
+                    subject = excluded.subject,
+                    from_json = excluded.from_json,
+                    to_json = excluded.to_json,
+                    cc_json = excluded.cc_json,
+                    received = excluded.received,
+                    body_preview = excluded.body_preview,
+                    body_sha = excluded.body_sha
+                """,
+                header_rows,
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bodies (id, content_type, content) VALUES (?, ?, ?)",
+                body_rows,
+            )
+        return len(header_rows)
+
+    def iter_headers(self, since: Optional[str] = None, batch_size: int = 2000) -> Iterator[Dict[str, Any]]:
+        """Ekleme sırasıyla başlıklar; since verilirse receivedDateTime >= since olanlar."""
+        last_rowid = 0
+        while True:
+            sql = f"SELECT rowid AS rid, {_HEADER_COLUMNS} FROM messages WHERE rowid > ?"
+            params: List[Any] = [last_rowid]
+            if since:
+                sql += " AND received >= ?"
+                params.append(since)
+            sql += " ORDER BY rowid LIMIT ?"
+            params.append(batch_size)
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _header_from_row(row)
+            last_rowid = rows[-1]["rid"]
+
+    def get_body(self, msg_id: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT content_type, content FROM bodies WHERE id = ?", (msg_id,)).fetchone()
+        if row is None:
+            return None
+        return {"contentType": row["content_type"], "content": _decompress(row["content"])}
+
+    def get_message(self, msg_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_HEADER_COLUMNS} FROM messages WHERE id = ?", (msg_id,)).fetchone()
+        if row is None:
+            return None
+        msg = _header_from_row(row)
+        msg["body"] = self.get_body(msg_id) or {"contentType": "html", "content": ""}
+        return msg
+
+    def iter_messages(self, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Tüm mesajlar gövdeleriyle, ekleme sırasıyla (bellekte en fazla batch_size satır)."""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"""
+                    SELECT m.rowid AS rid, {", ".join("m." + c.strip() for c in _HEADER_COLUMNS.split(","))},
+                           b.content_type, b.content
+                    FROM messages m LEFT JOIN bodies b ON b.id = m.id
+                    WHERE m.rowid > ? ORDER BY m.rowid LIMIT ?
+                    """,
+                    (last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                msg = _header_from_row(row)
+                msg["body"] = {"contentType": row["content_type"] or "html", "content": _decompress(row["content"])}
+                yield msg
+            last_rowid = rows[-1]["rid"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def import_jsonl(store: RawStore, path: Path, batch_size: int = 500) -> int:
+    """Eski raw_emails.jsonl'i store'a aktarır; aynı id'den sonuncusu kalır."""
+    imported = 0
+    batch: List[Dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                msg = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning("Skipping invalid JSON line")
+                continue
+            if not msg.get("id"):
+                continue
+            batch.append(msg)
+            if len(batch) >= batch_size:
+                imported += store.upsert(batch)
+                batch = []
+    imported += store.upsert(batch)
+    return imported
+
+
+def migrate_legacy_jsonl(store: RawStore, path: Path = RAW_JSONL_PATH) -> int:
+    """Store boşsa ve eski raw_emails.jsonl duruyorsa bir kereliğine içeri aktarır."""
+    if len(store) or not path.exists():
+        return 0
+    count = import_jsonl(store, path)
+    logger.info("Imported %d lines from legacy %s into %s", count, path, store.path)
+    return count
+
+
+def export_jsonl(store: RawStore, path: Path) -> int:
+    exported = 0
+    with path.open("w", encoding="utf-8") as f:
+        for msg in store.iter_messages():
+            msg.pop("bodySha", None)
+            f.write(json.dumps(msg, ensure_ascii=False) + "\n")
+            exported += 1
+    return exported
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Raw email store maintenance")
+    parser.add_argument("command", choices=["import", "export", "stats"])
+    parser.add_argument("--jsonl", type=Path, default=RAW_JSONL_PATH, help="import / export edilecek JSONL")
+    parser.add_argument("--db", type=Path, default=RAW_DB_PATH)
+    args = parser.parse_args(argv)
+
+    store = RawStore(args.db)
+    if args.command == "import":
+        if not args.jsonl.exists():
+            logger.error("JSONL file not found: %s", args.jsonl)
+            return
+        count = import_jsonl(store, args.jsonl)
+        logger.info("Imported %d lines from %s, store now has %d messages", count, args.jsonl, len(store))
+    elif args.command == "export":
+        count = export_jsonl(store, args.jsonl)
+        logger.info("Exported %d messages to %s", count, args.jsonl)
+    else:
+        size = args.db.stat().st_size if args.db.exists() else 0
+        logger.info("%s: %d messages, %.1f MB", args.db, len(store), size / 1e6)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import random
+import threading
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import GraphConfig
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL_TEMPLATE = "https://login.microsoftonline.com/{tenant_id}/oauth2/v2.0/token"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# HTTP bağlantı havuzu (paralel ingestion worker sayısından küçük olmamalı)
+GRAPH_POOL_SIZE = int(os.getenv("MS_GRAPH_POOL_SIZE", "16"))
+GRAPH_TIMEOUT = float(os.getenv("MS_GRAPH_TIMEOUT", "20"))
+GRAPH_MAX_RETRIES = int(os.getenv("MS_GRAPH_MAX_RETRIES", "6"))
+# Token süresi dolmadan bu kadar saniye önce yenilenir
+TOKEN_REFRESH_SKEW = float(os.getenv("MS_TOKEN_REFRESH_SKEW", "300"))
+# Endpoint başına latency percentile'ları için tutulan son süre sayısı
+METRICS_WINDOW = int(os.getenv("MS_GRAPH_METRICS_WINDOW", "10000"))
+
+# Graph throttling: 429 / 503 / 504 -> Retry-After kadar bekle, tekrar dene
+RETRY_STATUSES = {429, 503, 504}
+DEFAULT_RETRY_AFTER = 5.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# Bu segmentlerden sonra gelen path parçası bir id'dir (metriklerde {id} olarak toplanır)
+_ID_PARENTS = {"users", "mailFolders", "childFolders", "messages", "attachments"}
+_NAMED_SEGMENTS = {"delta", "$batch", "inbox", "sentitems", "drafts", "deleteditems", "childFolders", "messages"}
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """
+    "GET https://graph.microsoft.com/v1.0/users/a@x/mailFolders/AAMk.../messages?$top=50"
+    -> "GET /users/{id}/mailFolders/{id}/messages"
+    """
+    path = url.split("?", 1)[0]
+    path = re.sub(r"^https?://[^/]+", "", path)
+    path = re.sub(r"^/(v1\.0|beta)", "", path)
+    segments = path.strip("/").split("/")
+    normalized: List[str] = []
+    for i, segment in enumerate(segments):
+        prev = segments[i - 1] if i else ""
+        if prev in _ID_PARENTS and segment not in _NAMED_SEGMENTS:
+            normalized.append("{id}")
+        else:
+            normalized.append(segment)
+    return f"{method} /" + "/".join(normalized)
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    errors: int = 0
+    retries: int = 0
+    response_bytes: int = 0
+    # Son METRICS_WINDOW isteğin süreleri (uzun süren process'te bellek sabit kalsın)
+    durations: Deque[float] = field(default_factory=lambda: deque(maxlen=METRICS_WINDOW))
+
+    def percentile(self, q: float) -> float:
+        if not self.durations:
+            return 0.0
+        ordered = sorted(self.durations)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> str:
+        mean = sum(self.durations) / len(self.durations) if self.durations else 0.0
+        return (
+            f"count={self.count} errors={self.errors} retries={self.retries} "
+            f"bytes={self.response_bytes} "
+            f"mean={mean * 1000:.0f}ms p50={self.percentile(0.5) * 1000:.0f}ms "
+            f"p95={self.percentile(0.95) * 1000:.0f}ms max={max(self.durations, default=0.0) * 1000:.0f}ms"
+        )
+
+
+class GraphTransport:
+    """
+    Graph çağrılarının ortak HTTP katmanı:
+    - tek requests.Session + bağlantı havuzu (keep-alive),
+    - token'ı süresi dolmadan yeniler, 401 gelirse bir kez yeniden auth olur,
+    - 429 / 503 / 504'te Retry-After'a uyarak tekrar dener,
+    - endpoint bazında latency / hata / retry sayaçları tutar.
+    Thread-safe; paralel ingestion worker'ları aynı instance'ı paylaşır.
+    """
+
+    def __init__(self, cfg: Optional[GraphConfig] = None, pool_size: int = GRAPH_POOL_SIZE) -> None:
+        self.cfg = cfg or GraphConfig()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {}
+        self._stats_lock = threading.Lock()
+
+    # ---- token ----
+
+    def _fetch_token(self) -> None:
+        data = {
+            "client_id": self.cfg.client_id,
+            "client_secret": self.cfg.client_secret,
+            "grant_type": "client_credentials",
+            "scope": GRAPH_SCOPE,
+        }
+        token_url = TOKEN_URL_TEMPLATE.format(tenant_id=self.cfg.tenant_id)
+        logger.info("Requesting access token from Microsoft identity platform")
+        started = time.perf_counter()
+        resp = self.session.post(token_url, data=data, timeout=GRAPH_TIMEOUT)
+        self._record("POST /oauth2/token", time.perf_counter() - started, ok=resp.ok)
+        resp.raise_for_status()
+        js = resp.json()
+        self._token = js["access_token"]
+        self._token_expires_at = time.monotonic() + float(js.get("expires_in", 3599))
+        logger.debug("Access token acquired, expires in %ss", js.get("expires_in"))
+
+    def access_token(self, force_refresh: bool = False) -> str:
+        with self._token_lock:
+            if force_refresh or not self._token or time.monotonic() >= self._token_expires_at - TOKEN_REFRESH_SKEW:
+                self._fetch_token()
+            return self._token
+
+    def _invalidate_token(self, rejected: str) -> None:
+        with self._token_lock:
+            # Başka bir thread zaten yenilediyse tekrar istek atma
+            if self._token == rejected:
+                self._token = None
+
+    # ---- metrics ----
+
+    def _record(self, endpoint: str, duration: float, ok: bool = True, retried: bool = False, size: int = 0) -> None:
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            stats.count += 1
+            stats.response_bytes += size
+            stats.durations.append(duration)
+            if not ok:
+                stats.errors += 1
+            if retried:
+                stats.retries += 1
+
+    def metrics(self) -> Dict[str, EndpointStats]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def log_metrics(self) -> None:
+        for endpoint, stats in sorted(self.metrics().items()):
+            logger.info("Graph %s: %s", endpoint, stats.summary())
+
+    # ---- requests ----
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        json: Any = None,
+    ) -> requests.Response:
+        endpoint = endpoint_name(method, url)
+        attempt = 0
+        reauthed = False
+        while True:
+            token = self.access_token()
+            req_headers = {"Authorization": f"Bearer {token}", "Accept": "application/json", **(headers or {})}
+            started = time.perf_counter()
+            try:
+                resp = self.session.request(
+                    method, url, params=params, headers=req_headers, json=json, timeout=GRAPH_TIMEOUT
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, time.perf_counter() - started, ok=False, retried=attempt < GRAPH_MAX_RETRIES)
+                if attempt >= GRAPH_MAX_RETRIES:
+                    raise
+                attempt += 1
+                wait = min(2 ** attempt, BACKOFF_MAX_SECONDS) * (0.5 + random.random() / 2)
+                logger.warning("Graph request failed (%s), retry %d/%d in %.1fs", e, attempt, GRAPH_MAX_RETRIES, wait)
+                time.sleep(wait)
+                continue
+
+            duration = time.perf_counter() - started
+
+            if resp.status_code == 401 and not reauthed:
+                # Token süresinden önce iptal edilmiş / reddedilmiş olabilir
+                self._record(endpoint, duration, ok=False, retried=True)
+                logger.warning("Graph returned 401 for %s, refreshing access token", endpoint)
+                self._invalidate_token(token)
+                reauthed = True
+                continue
+
+            if resp.status_code in RETRY_STATUSES and attempt < GRAPH_MAX_RETRIES:
+                self._record(endpoint, duration, ok=False, retried=True)
+                attempt += 1
+                try:
+                    wait = float(resp.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+                except ValueError:
+                    wait = DEFAULT_RETRY_AFTER
+                logger.warning(
+                    "Graph returned %d for %s, retry %d/%d in %.1fs",
+                    resp.status_code, endpoint, attempt, GRAPH_MAX_RETRIES, wait,
+                )
+                time.sleep(min(wait, BACKOFF_MAX_SECONDS))
+                continue
+
+            self._record(endpoint, duration, ok=resp.ok, size=len(resp.content))
+            return resp
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        resp = self.request("GET", url, params=params, headers=headers)
+        resp.raise_for_status()
+        return resp.json()
+
+    def post_json(self, url: str, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        resp = self.request("POST", url, headers=headers, json=body)
+        resp.raise_for_status()
+        return resp.json()
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,189 @@
+import os
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+from .extractor import Extraction
+
+logger = logging.getLogger(__name__)
+
+# Bir generate çağrısına giren en fazla mail
+INFER_MAX_BATCH = int(os.getenv("INFER_MAX_BATCH", "16"))
+# İlk mail geldikten sonra batch'i doldurmak için en fazla bekleme (ms).
+# 0 -> beklemeden, o an kuyrukta ne varsa
+INFER_MAX_WAIT_MS = float(os.getenv("INFER_MAX_WAIT_MS", "10"))
+# Bir bucket'taki en uzun input, en kısanın en fazla bu katı olabilir (padding sınırı).
+# 0 -> bölme yok, toplanan her şey tek generate'te
+INFER_BUCKET_RATIO = float(os.getenv("INFER_BUCKET_RATIO", "2.0"))
+
+_STOP = object()
+
+
+@dataclass
+class _Pending:
+    body: str
+    # Token uzunluğu; worker thread bucket'lamadan önce doldurur
+    length: int = 0
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+def split_buckets(items: List[_Pending], ratio: float) -> List[List[_Pending]]:
+    """Token uzunluğuna göre sıralayıp, uzunluk oranı ratio'yu aşınca yeni bucket açar."""
+    items = sorted(items, key=lambda item: item.length)
+    if ratio <= 0:
+        return [items]
+    buckets: List[List[_Pending]] = []
+    for item in items:
+        if buckets and item.length <= max(buckets[-1][0].length, 1) * ratio:
+            buckets[-1].append(item)
+        else:
+            buckets.append([item])
+    return buckets
+
+
+class MicroBatcher:
+    """
+    Dinamik micro-batching: eş zamanlı gelen mailleri tek bir generate
+    çağrısında toplar.
+
+    submit() maili kuyruğa koyup bir Future döner. Tek worker thread ilk
+    mail geldikten sonra max_wait_ms boyunca ya da max_batch maile
+    ulaşana kadar toplar, token uzunluğuna göre bucket'lara ayırır
+    (padding'i sınırlamak için) ve her bucket'ı extractor.extract ile
+    çalıştırır. Sonuçlar ilgili Future'lara dağıtılır.
+
+    Extractor'da token_lengths(bodies) varsa uzunluk için o, yoksa
+    karakter sayısı kullanılır. Uzunluklar da worker thread'de hesaplanır:
+    tokenizer HTTP thread'leri ile generate arasında paylaşılmaz.
+
+    Bir bucket'ın generate'i hata verirse mailler tek tek tekrar denenir,
+    sadece hatalı mailin Future'ı exception alır.
+    """
+
+    def __init__(
+        self,
+        extractor: Any,
+        max_batch: int = INFER_MAX_BATCH,
+        max_wait_ms: float = INFER_MAX_WAIT_MS,
+        bucket_ratio: float = INFER_BUCKET_RATIO,
+    ) -> None:
+        self.extractor = extractor
+        self.max_batch = max(max_batch, 1)
+        self.max_wait = max(max_wait_ms, 0.0) / 1000
+        self.bucket_ratio = bucket_ratio
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._stopping = False
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._mails = 0
+        self._tokens = 0
+        self._padded_tokens = 0
+        self._queue_wait = 0.0
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def _lengths(self, bodies: Sequence[str]) -> List[int]:
+        token_lengths = getattr(self.extractor, "token_lengths", None)
+        if token_lengths is not None:
+            return list(token_lengths(bodies))
+        return [len(body) for body in bodies]
+
+    def submit_many(self, bodies: Sequence[str]) -> List[Future]:
+        if self._stopping:
+            raise RuntimeError("MicroBatcher is closed")
+        pending = [_Pending(body) for body in bodies]
+        for item in pending:
+            self._queue.put(item)
+        return [item.future for item in pending]
+
+    def submit(self, body: str) -> Future:
+        return self.submit_many([body])[0]
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        """Mailleri kuyruğa verip sonuçları aynı sırayla bekler."""
+        return [future.result() for future in self.submit_many(bodies)]
+
+    def _collect(self) -> Optional[List[_Pending]]:
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        items = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(items) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            items.append(item)
+        return items
+
+    def _run_bucket(self, bucket: List[_Pending]) -> None:
+        started = time.perf_counter()
+        try:
+            results = list(self.extractor.extract([item.body for item in bucket]))
+            # Eksik sonuçta Future'lar hiç çözülmez, extract() çağıranlar sonsuza kadar bekler
+            if len(results) != len(bucket):
+                raise RuntimeError(f"Extractor returned {len(results)} results for {len(bucket)} mails")
+        except Exception as e:
+            if len(bucket) > 1:
+                logger.warning("Batch of %d mails failed (%s), retrying one by one", len(bucket), e)
+                for item in bucket:
+                    self._run_bucket([item])
+                return
+            logger.exception("Mail failed")
+            bucket[0].future.set_exception(e)
+            return
+        for item, result in zip(bucket, results):
+            item.future.set_result(result)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._mails += len(bucket)
+            self._tokens += sum(item.length for item in bucket)
+            self._padded_tokens += bucket[-1].length * len(bucket)
+            self._queue_wait += sum(started - item.enqueued for item in bucket)
+
+    def _run(self) -> None:
+        while True:
+            items = self._collect()
+            if items is None:
+                return
+            try:
+                lengths = self._lengths([item.body for item in items])
+            except Exception:
+                logger.exception("token_lengths failed, bucketing by character count")
+                lengths = [len(item.body) for item in items]
+            for item, length in zip(items, lengths):
+                item.length = length
+            for bucket in split_buckets(items, self.bucket_ratio):
+                self._run_bucket(bucket)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batches, mails = self._batches, self._mails
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "batches": batches,
+                "mean_batch_size": round(mails / batches, 2) if batches else 0.0,
+                # Gerçek token / padding'li token (1.0 = hiç padding yok)
+                "padding_efficiency": round(self._tokens / self._padded_tokens, 3) if self._padded_tokens else 1.0,
+                "mean_queue_wait_ms": round(self._queue_wait / mails * 1000, 1) if mails else 0.0,
+            }
+
+    def close(self) -> None:
+        """Kuyruktakileri bitirip worker'ı durdurur."""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._queue.put(_STOP)
+        self._worker.join()
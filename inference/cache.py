@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from labeling.response_cache import CacheStats, fingerprint, normalize_body
+
+from .extractor import Extraction
+
+# Sonuç cache'inin bellek sınırı (MB); 0 -> cache yok
+INFER_CACHE_MB = float(os.getenv("INFER_CACHE_MB", "64"))
+
+# Kayıt başına yaklaşık sabit maliyet: anahtar, Extraction nesnesi, parse edilmiş dict
+_ENTRY_OVERHEAD = 512
+
+
+def _entry_size(key: str, result: Extraction) -> int:
+    # Ham çıktı + parse edilmiş request kabaca iki kopya
+    return len(key) + 2 * len(result.raw.encode("utf-8")) + _ENTRY_OVERHEAD
+
+
+class CachedExtractor:
+    """
+    Herhangi bir extractor'ın (ya da MicroBatcher'ın) önünde bellek içi LRU
+    sonuç cache'i. Anahtar, boşlukları normalize edilmiş gövdenin hash'i;
+    beam search deterministik olduğundan aynı mail aynı çıktıyı verir.
+
+    Aynı batch içinde tekrar eden gövdeler modele bir kez gider. Toplam
+    (yaklaşık) boyut max_bytes'ı geçince en uzun süredir okunmayanlar atılır.
+    """
+
+    def __init__(self, inner: Any, max_bytes: int = int(INFER_CACHE_MB * 1024 * 1024)) -> None:
+        self.inner = inner
+        self.name = getattr(inner, "name", None)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, Tuple[Extraction, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        keys = [fingerprint(normalize_body(body)) for body in bodies]
+        results: List[Optional[Extraction]] = [None] * len(bodies)
+        # anahtar -> bu anahtarı bekleyen pozisyonlar
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = entry[0]
+                else:
+                    missing.setdefault(key, []).append(i)
+            self.stats.misses += len(missing)
+            self.stats.hits += len(bodies) - len(missing)
+
+        if missing:
+            fresh = self.inner.extract([bodies[positions[0]] for positions in missing.values()])
+            with self._lock:
+                for (key, positions), result in zip(missing.items(), fresh):
+                    for i in positions:
+                        results[i] = result
+                    self._put(key, result)
+        return results  # type: ignore[return-value]
+
+    def _put(self, key: str, result: Extraction) -> None:
+        size = _entry_size(key, result)
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (result, size)
+        self._bytes += size
+        self.stats.stored += 1
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.stats.evicted += 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": round(self._bytes / 1024 / 1024, 2),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "hits": self.stats.hits,
+                "misses": self.stats.misses,
+                "hit_rate": round(self.stats.hit_rate, 3),
+                "evicted": self.stats.evicted,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
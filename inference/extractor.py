@@ -0,0 +1,229 @@
+import os
+import json
+import threading
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import ValidationError
+
+from labeling.schema import EmailRequest
+
+logger = logging.getLogger(__name__)
+
+# Yerel klasör ya da Hugging Face Hub id'si
+MODEL_DIR = os.getenv("INFER_MODEL_DIR", "melihkocaadam/flan-t5-json-extractor-v2")
+MAX_INPUT_LENGTH = int(os.getenv("INFER_MAX_INPUT_LENGTH", "512"))
+MAX_OUTPUT_LENGTH = int(os.getenv("INFER_MAX_OUTPUT_LENGTH", "256"))
+NUM_BEAMS = int(os.getenv("INFER_NUM_BEAMS", "4"))
+# 0 -> torch varsayılanı (fiziksel çekirdek sayısı)
+INFER_THREADS = int(os.getenv("INFER_THREADS", "0"))
+
+# inference.optimize export --format int8'in yazdığı quantize edilmiş state_dict
+INT8_WEIGHTS_NAME = "quantized_int8.pt"
+
+INSTRUCTION = (
+    "Aşağıda bir seyahat talebi e-postasının gövdesi var. "
+    "Bu metinden sadece geçerli JSON formatında flight/hotel/transfer "
+    "taleplerini çıkar. JSON dışında hiçbir şey yazma."
+)
+
+
+# Eğitimdeki input ile aynı: make_finetune_dataset'in "input" alanı,
+# train_mt5_json_extractor'ın "E-posta içeriği:" önekiyle
+PROMPT_PREFIX = "E-posta içeriği:\n" + INSTRUCTION + "\n\nE-posta gövdesi:\n"
+
+# Önekin ayrı tokenize edilmesinin birleşik prompt'la aynı id'leri verdiğini kontrol etmek için
+_PREFIX_PROBES = ["Merhaba,\n2 kişi İstanbul - Paris uçuşu rica ederiz.", ", PNR: ABC123", "x"]
+
+
+def build_prompt(mail_body: str) -> str:
+    return PROMPT_PREFIX + mail_body.strip()
+
+
+@dataclass
+class Extraction:
+    raw: str
+    request: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"request": self.request, "raw": self.raw, "error": self.error}
+
+
+def parse_output(raw: str) -> Extraction:
+    """Model çıktısını JSON olarak parse edip EmailRequest şemasıyla doğrular."""
+    try:
+        parsed = json.loads(raw.strip())
+    except ValueError as e:
+        return Extraction(raw=raw, error=f"invalid JSON: {e}")
+    try:
+        request = EmailRequest.model_validate(parsed)
+    except ValidationError as e:
+        return Extraction(raw=raw, error=f"schema validation failed: {e}")
+    return Extraction(raw=raw, request=request.model_dump(mode="json", by_alias=True))
+
+
+class Seq2SeqExtractor:
+    """
+    Fine-tune edilmiş AutoModelForSeq2SeqLM'i bir kez yükler, sadece CPU'da çalışır.
+    generate() çağrıları lock ile sıralanıyor: torch zaten tüm çekirdekleri
+    kullanıyor, paralel generate çağrıları sadece birbirini yavaşlatır.
+    """
+
+    name = "hf"
+
+    def __init__(
+        self,
+        model_dir: str = MODEL_DIR,
+        threads: int = INFER_THREADS,
+        max_input_length: int = MAX_INPUT_LENGTH,
+        max_output_length: int = MAX_OUTPUT_LENGTH,
+        num_beams: int = NUM_BEAMS,
+    ) -> None:
+        import torch
+        from transformers import AutoTokenizer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.model_dir = model_dir
+        self.threads = threads
+        self.max_input_length = max_input_length
+        self.max_output_length = max_output_length
+        self.num_beams = num_beams
+
+        logger.info("Loading %s model %s on CPU (%d threads)", self.name, model_dir, torch.get_num_threads())
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+        self.model = self._load_model(str(model_dir))
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+            self.model.config.pad_token_id = self.tokenizer.pad_token_id
+        self._lock = threading.Lock()
+        self.prefix_ids = self._tokenize_prefix()
+
+    def _tokenize_prefix(self) -> Optional[List[int]]:
+        """
+        Sabit önek bir kez tokenize ediliyor, her çağrıda sadece gövde
+        tokenize edilip önek id'lerinin arkasına ekleniyor. Tokenizer önek
+        sınırında farklı id üretiyorsa (BOS ekleyen tokenizer'lar vb.)
+        None dönüp birleşik prompt tokenize edilmeye devam ediliyor.
+        """
+        prefix_ids = self.tokenizer(PROMPT_PREFIX, add_special_tokens=False)["input_ids"]
+        for probe in _PREFIX_PROBES:
+            joint = self.tokenizer(build_prompt(probe))["input_ids"]
+            if joint != prefix_ids + self.tokenizer(probe.strip())["input_ids"]:
+                logger.warning("Tokenizer of %s is not prefix-stable, tokenizing full prompts", self.model_dir)
+                return None
+        return prefix_ids
+
+    def _input_ids(self, bodies: Sequence[str]) -> List[List[int]]:
+        """Truncation sonrası prompt token id'leri (padding yok)."""
+        if self.prefix_ids is None:
+            return self.tokenizer(
+                [build_prompt(body) for body in bodies],
+                truncation=True,
+                max_length=self.max_input_length,
+            )["input_ids"]
+        # Sağdan truncation: birleşik prompt'u max_input_length'e kesmekle aynı
+        encoded = self.tokenizer(
+            [body.strip() for body in bodies],
+            truncation=True,
+            max_length=max(self.max_input_length - len(self.prefix_ids), 1),
+        )["input_ids"]
+        return [self.prefix_ids + ids for ids in encoded]
+
+    def _load_model(self, model_dir: str) -> Any:
+        from transformers import AutoModelForSeq2SeqLM
+
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_dir).to("cpu")
+        model.eval()
+        return model
+
+    def token_lengths(self, bodies: Sequence[str]) -> List[int]:
+        """Prompt'ların (truncation sonrası) token sayıları; micro-batching bucket'ları için."""
+        # Rust tokenizer aynı anda iki thread'den truncation ayarıyla çağrılınca
+        # "Already borrowed" hatası veriyor: tokenizer erişimleri de _lock altında
+        with self._lock:
+            return [len(ids) for ids in self._input_ids(bodies)]
+
+    def generate(self, bodies: Sequence[str]) -> List[str]:
+        """Mail gövdelerini tek batch'te modele verir, ham çıktı string'lerini döner."""
+        if not bodies:
+            return []
+        # Encoder her input için bir kez çalışıyor, çıktısı beam'lere kopyalanıyor; decoder
+        # KV cache'i (use_cache) her adımda sadece yeni token'ı hesaplıyor. Önekin encoder
+        # çıktısı çağrılar arasında paylaşılamaz: encoder çift yönlü, önek token'larının
+        # temsilleri de gövdeye bağlı.
+        with self._lock, self.torch.inference_mode():
+            inputs = self.tokenizer.pad({"input_ids": self._input_ids(bodies)}, return_tensors="pt")
+            outputs = self.model.generate(
+                **inputs,
+                max_length=self.max_output_length,
+                num_beams=self.num_beams,
+                early_stopping=True,
+                use_cache=True,
+            )
+            return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        return [parse_output(raw) for raw in self.generate(bodies)]
+
+
+def quantize_int8(model: Any) -> Any:
+    """nn.Linear katmanlarını dinamik int8'e çevirir (ağırlıklar int8, aktivasyonlar çalışırken quantize)."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class Int8Seq2SeqExtractor(Seq2SeqExtractor):
+    """
+    Dinamik int8 quantize edilmiş model. Klasörde INT8_WEIGHTS_NAME varsa
+    (inference.optimize export) o yükleniyor, yoksa fp32 checkpoint
+    açılışta quantize ediliyor.
+    """
+
+    name = "int8"
+
+    def _load_model(self, model_dir: str) -> Any:
+        from transformers import AutoConfig, AutoModelForSeq2SeqLM, GenerationConfig
+
+        weights = Path(model_dir) / INT8_WEIGHTS_NAME
+        if not weights.exists():
+            return quantize_int8(super()._load_model(model_dir))
+
+        model = AutoModelForSeq2SeqLM.from_config(AutoConfig.from_pretrained(model_dir))
+        model.eval()
+        model = quantize_int8(model)
+        # Packed int8 ağırlıklar weights_only ile açılamıyor; dosyayı export kendimiz yazıyoruz
+        model.load_state_dict(self.torch.load(weights, map_location="cpu", weights_only=False))
+        if (Path(model_dir) / "generation_config.json").exists():
+            model.generation_config = GenerationConfig.from_pretrained(model_dir)
+        return model
+
+
+class OnnxSeq2SeqExtractor(Seq2SeqExtractor):
+    """
+    optimum + onnxruntime ile ONNX model: ayrı encoder / decoder grafları,
+    decoder'da KV cache (decoder_with_past). Klasörde .onnx dosyası yoksa
+    checkpoint açılışta export ediliyor.
+    """
+
+    name = "onnx"
+
+    def _load_model(self, model_dir: str) -> Any:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        session_options = onnxruntime.SessionOptions()
+        if self.threads > 0:
+            session_options.intra_op_num_threads = self.threads
+        return ORTModelForSeq2SeqLM.from_pretrained(
+            model_dir,
+            export=not any(Path(model_dir).glob("*.onnx")),
+            use_cache=True,
+            provider="CPUExecutionProvider",
+            session_options=session_options,
+        )
@@ -0,0 +1,65 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+# Percentile'lar son bu kadar istek üzerinden hesaplanır
+METRICS_WINDOW = int(os.getenv("INFER_METRICS_WINDOW", "10000"))
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class LatencyStats:
+    """
+    /extract istekleri için latency / throughput sayaçları. Toplamlar
+    başlangıçtan beri, percentile ve throughput son METRICS_WINDOW istek
+    üzerinden. Thread-safe.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW) -> None:
+        self.started = time.time()
+        self.requests = 0
+        self.mails = 0
+        self.errors = 0
+        # (bitiş zamanı, süre, mail sayısı)
+        self._recent: Deque[Tuple[float, float, int]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, duration: float, mails: int = 1, ok: bool = True) -> None:
+        with self._lock:
+            self.requests += 1
+            self.mails += mails
+            if not ok:
+                self.errors += 1
+            self._recent.append((time.time(), duration, mails))
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)
+            totals = {"requests": self.requests, "mails": self.mails, "errors": self.errors}
+
+        durations = sorted(duration for _, duration, _ in recent)
+        # Pencerenin ilk isteğinin başlangıcından şimdiye
+        span = time.time() - (recent[0][0] - recent[0][1]) if recent else 0.0
+        window_mails = sum(mails for _, _, mails in recent)
+        return {
+            **totals,
+            "uptime_s": round(time.time() - self.started, 1),
+            "window": len(recent),
+            "latency_ms": {
+                "mean": round(sum(durations) / len(durations) * 1000, 1) if durations else 0.0,
+                "p50": round(percentile(durations, 0.50) * 1000, 1),
+                "p95": round(percentile(durations, 0.95) * 1000, 1),
+                "p99": round(percentile(durations, 0.99) * 1000, 1),
+                "max": round(durations[-1] * 1000, 1) if durations else 0.0,
+            },
+            "throughput": {
+                "requests_per_s": round(len(recent) / span, 2) if span else 0.0,
+                "mails_per_s": round(window_mails / span, 2) if span else 0.0,
+            },
+        }
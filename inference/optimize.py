@@ -0,0 +1,245 @@
+import sys
+import json
+import time
+import argparse
+import logging
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .extractor import INFER_THREADS, INT8_WEIGHTS_NAME, MODEL_DIR, parse_output, quantize_int8
+from .metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+# train_mt5_json_extractor ile aynı dataset ve split
+DATA_PATH = BASE_DIR / "data" / "train" / "finetune_io_dataset.jsonl"
+VAL_SIZE = 0.15
+SEED = 42
+
+FORMATS = ("int8", "onnx")
+_BODY_MARKER = "\n\nE-posta gövdesi:\n"
+
+
+def default_output_dir(model_dir: str, fmt: str) -> Path:
+    """models/flan-t5-json-extractor-v2 -> models/flan-t5-json-extractor-v2-int8 (Hub id'de models/ altına)."""
+    if Path(model_dir).exists():
+        return Path(f"{Path(model_dir)}-{fmt}")
+    return BASE_DIR / "models" / f"{model_dir.rstrip('/').split('/')[-1]}-{fmt}"
+
+
+def export_int8(model_dir: str, out_dir: Path) -> None:
+    import torch
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_dir)
+    model.eval()
+    quantized = quantize_int8(model)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    torch.save(quantized.state_dict(), out_dir / INT8_WEIGHTS_NAME)
+    model.config.save_pretrained(out_dir)
+    model.generation_config.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_dir).save_pretrained(out_dir)
+
+
+def export_onnx(model_dir: str, out_dir: Path) -> None:
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    from transformers import AutoTokenizer
+
+    # encoder_model.onnx + decoder_model.onnx + decoder_with_past_model.onnx (KV cache)
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_dir, export=True, use_cache=True)
+    model.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(model_dir).save_pretrained(out_dir)
+
+
+def dir_size_mb(path: Path) -> Optional[float]:
+    if not path.is_dir():
+        return None
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6
+
+
+def load_val_split(limit: int = 0) -> List[Tuple[str, str]]:
+    """Eğitimdeki validation split'i: (mail gövdesi, altın JSON string) çiftleri."""
+    from datasets import load_dataset
+
+    raw = load_dataset("json", data_files=str(DATA_PATH), split="train")
+    val = raw.train_test_split(test_size=VAL_SIZE, seed=SEED)["test"]
+    pairs = [(row["input"].split(_BODY_MARKER, 1)[-1], row["output"]) for row in val]
+    return pairs[:limit] if limit else pairs
+
+
+def flatten(obj: Any, prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    """JSON'u (yol, değer) yapraklarına açar; None yapraklar atlanır."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            yield from flatten(value, f"{prefix}[{i}]")
+    elif obj is not None:
+        yield prefix, obj
+
+
+def _fields(request: Optional[Dict[str, Any]]) -> Set[Tuple[str, Any]]:
+    return set(flatten(request)) if request is not None else set()
+
+
+def field_agreement(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> float:
+    """İki çıktının alan düzeyinde Jaccard uyumu (ikisi de boş / geçersizse 1.0)."""
+    fa, fb = _fields(a), _fields(b)
+    if not fa and not fb:
+        return 1.0
+    return len(fa & fb) / len(fa | fb)
+
+
+def field_f1(predicted: Optional[Dict[str, Any]], gold: Optional[Dict[str, Any]]) -> float:
+    fp, fg = _fields(predicted), _fields(gold)
+    if not fp and not fg:
+        return 1.0
+    common = len(fp & fg)
+    return 2 * common / (len(fp) + len(fg))
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Linux'ta KB, macOS'ta byte
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def measure(backend: str, model_dir: str, threads: int, bodies: List[str]) -> Dict[str, Any]:
+    """Ayrı process'te: modeli yükler, her maili tek tek (batch=1) çalıştırır."""
+    from .server import load_extractor
+
+    started = time.perf_counter()
+    extractor = load_extractor(backend, model_dir=model_dir, threads=threads)
+    load_s = time.perf_counter() - started
+
+    raws, latencies = [], []
+    for body in bodies:
+        started = time.perf_counter()
+        raws.append(extractor.generate([body])[0])
+        latencies.append(time.perf_counter() - started)
+    return {"raws": raws, "latencies": latencies, "load_s": load_s, "peak_rss_mb": _peak_rss_mb()}
+
+
+def _measure_isolated(backend: str, model_dir: str, threads: int, bodies: List[str]) -> Dict[str, Any]:
+    # Peak RSS model başına temiz ölçülsün diye her model kendi process'inde
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(measure, (backend, model_dir, threads, bodies))
+
+
+def check(
+    baseline_dir: str,
+    backend: str,
+    model_dir: str,
+    threads: int = INFER_THREADS,
+    limit: int = 0,
+) -> Dict[str, Any]:
+    pairs = load_val_split(limit)
+    bodies = [body for body, _ in pairs]
+    gold = [parse_output(output).request for _, output in pairs]
+    logger.info("Comparing %s (%s) against fp32 %s on %d validation mails", backend, model_dir, baseline_dir, len(pairs))
+
+    runs = {
+        "fp32": _measure_isolated("hf", baseline_dir, threads, bodies),
+        backend: _measure_isolated(backend, model_dir, threads, bodies),
+    }
+    base = [parse_output(raw) for raw in runs["fp32"]["raws"]]
+    optimized = [parse_output(raw) for raw in runs[backend]["raws"]]
+
+    report: Dict[str, Any] = {
+        "mails": len(pairs),
+        "exact_match": sum(a.raw.strip() == b.raw.strip() for a, b in zip(base, optimized)) / max(len(pairs), 1),
+        "field_agreement": sum(
+            field_agreement(a.request, b.request) for a, b in zip(base, optimized)
+        ) / max(len(pairs), 1),
+        "models": {},
+    }
+    for name, results, path in (("fp32", base, baseline_dir), (backend, optimized, model_dir)):
+        latencies = sorted(runs[name]["latencies"])
+        report["models"][name] = {
+            "valid": sum(r.request is not None for r in results) / max(len(results), 1),
+            "field_f1_vs_gold": sum(field_f1(r.request, g) for r, g in zip(results, gold)) / max(len(results), 1),
+            "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+            "latency_p95_ms": percentile(latencies, 0.95) * 1000,
+            "latency_mean_ms": sum(latencies) / max(len(latencies), 1) * 1000,
+            "load_s": runs[name]["load_s"],
+            "peak_rss_mb": runs[name]["peak_rss_mb"],
+            "disk_mb": dir_size_mb(Path(path)),
+        }
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"validation mails: {report['mails']}")
+    print(f"exact match vs fp32:     {report['exact_match']:.1%}")
+    print(f"field agreement vs fp32: {report['field_agreement']:.1%}")
+
+    def fmt(value: Optional[float], spec: str) -> str:
+        return "-" if value is None else format(value, spec)
+
+    print(f"{'model':<6} {'valid':>6} {'F1_gold':>7} {'p50_ms':>8} {'p95_ms':>8} {'mean_ms':>8} {'rss_mb':>8} {'disk_mb':>8}")
+    for name, m in report["models"].items():
+        print(
+            f"{name:<6} {m['valid']:>6.1%} {m['field_f1_vs_gold']:>7.3f} {m['latency_p50_ms']:>8.0f} "
+            f"{m['latency_p95_ms']:>8.0f} {m['latency_mean_ms']:>8.0f} {fmt(m['peak_rss_mb'], '>8.0f')} "
+            f"{fmt(m['disk_mb'], '>8.0f')}"
+        )
+    base, optimized = list(report["models"].values())
+    print(
+        f"speedup (mean latency) x{base['latency_mean_ms'] / max(optimized['latency_mean_ms'], 1e-9):.2f}"
+        + (
+            f", peak RSS {optimized['peak_rss_mb'] - base['peak_rss_mb']:+.0f} MB"
+            if base["peak_rss_mb"] and optimized["peak_rss_mb"] else ""
+        )
+    )
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Export the extractor to CPU-optimized formats and check accuracy")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="int8 (torch dynamic quantization) ya da ONNX export")
+    export.add_argument("--model", default=MODEL_DIR, help="fp32 checkpoint (train_mt5_json_extractor çıktısı)")
+    export.add_argument("--format", choices=FORMATS, default="int8")
+    export.add_argument("--out", type=Path, default=None)
+
+    chk = sub.add_parser("check", help="optimize modeli validation split'inde fp32 ile karşılaştır")
+    chk.add_argument("--baseline", default=MODEL_DIR, help="fp32 model")
+    chk.add_argument("--backend", choices=FORMATS, default="int8")
+    chk.add_argument("--model", required=True, help="optimize edilmiş model klasörü")
+    chk.add_argument("--threads", type=int, default=INFER_THREADS)
+    chk.add_argument("--limit", type=int, default=0, help="ilk N validation maili (0 = hepsi)")
+    chk.add_argument("--report", type=Path, default=None, help="sonuçları JSON olarak kaydet")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        out_dir = args.out or default_output_dir(args.model, args.format)
+        started = time.perf_counter()
+        (export_int8 if args.format == "int8" else export_onnx)(args.model, out_dir)
+        logger.info(
+            "Exported %s model to %s in %.1fs (%.0f MB, fp32 %s MB)",
+            args.format, out_dir, time.perf_counter() - started, dir_size_mb(out_dir) or 0,
+            f"{dir_size_mb(Path(args.model)):.0f}" if Path(args.model).is_dir() else "?",
+        )
+        logger.info("Serve it with: python -m inference.server --backend %s --model %s", args.format, out_dir)
+        return
+
+    report = check(args.baseline, args.backend, args.model, threads=args.threads, limit=args.limit)
+    print_report(report)
+    if args.report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
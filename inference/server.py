@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import argparse
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .batcher import INFER_BUCKET_RATIO, INFER_MAX_BATCH, INFER_MAX_WAIT_MS, MicroBatcher
+from .cache import INFER_CACHE_MB, CachedExtractor
+from .extractor import (
+    INFER_THREADS,
+    MODEL_DIR,
+    Extraction,
+    Int8Seq2SeqExtractor,
+    OnnxSeq2SeqExtractor,
+    Seq2SeqExtractor,
+)
+from .metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+INFER_HOST = os.getenv("INFER_HOST", "127.0.0.1")
+INFER_PORT = int(os.getenv("INFER_PORT", "8080"))
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+
+# Backend adı -> extractor fabrikası. Her extractor'ın extract(bodies) -> List[Extraction]
+# metodu ve name attribute'u olmalı.
+BACKENDS: Dict[str, Callable[..., Any]] = {
+    "hf": Seq2SeqExtractor,
+    "int8": Int8Seq2SeqExtractor,
+    "onnx": OnnxSeq2SeqExtractor,
+}
+
+
+def load_extractor(backend: str = "hf", **kwargs: Any) -> Any:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](**kwargs)
+
+
+class InferenceServer(ThreadingHTTPServer):
+    """
+    Extractor'ı bir kez yüklenmiş olarak tutan HTTP sunucusu.
+
+    POST /extract  {"text": "..."}            -> {"request": {...} | null, "raw": "...", "error": ..., "latency_ms": ...}
+                   {"texts": ["...", "..."]}  -> {"results": [...], "latency_ms": ...}
+    GET  /metrics  -> istek / mail sayıları, p50 / p95 / p99 latency, throughput, batching
+    GET  /health   -> {"status": "ok"}
+
+    Tüm istekler (farklı bağlantılardan gelenler dahil) MicroBatcher
+    üzerinden ortak generate batch'lerine giriyor. cache_mb > 0 ise önünde
+    LRU sonuç cache'i var; tekrar eden mailler kuyruğa hiç girmiyor.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        extractor: Any,
+        max_batch: int = INFER_MAX_BATCH,
+        max_wait_ms: float = INFER_MAX_WAIT_MS,
+        bucket_ratio: float = INFER_BUCKET_RATIO,
+        cache_mb: float = INFER_CACHE_MB,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.extractor = extractor
+        self.batcher = MicroBatcher(extractor, max_batch=max_batch, max_wait_ms=max_wait_ms, bucket_ratio=bucket_ratio)
+        self.cache = CachedExtractor(self.batcher, max_bytes=int(cache_mb * 1024 * 1024)) if cache_mb > 0 else None
+        self.stats = LatencyStats()
+
+    def extract(self, bodies: List[str]) -> List[Extraction]:
+        return (self.batcher if self.cache is None else self.cache).extract(bodies)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": getattr(self.extractor, "name", None),
+            **self.stats.summary(),
+            "batching": self.batcher.stats(),
+            "cache": None if self.cache is None else self.cache.summary(),
+        }
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+
+
+class _BadRequest(Exception):
+    pass
+
+
+def _parse_bodies(payload: Any) -> Tuple[List[str], bool]:
+    """İstek gövdesinden mail metinleri ve batch isteği olup olmadığı."""
+    if not isinstance(payload, dict):
+        raise _BadRequest("expected a JSON object")
+    if "texts" in payload:
+        texts = payload["texts"]
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise _BadRequest("'texts' must be a list of strings")
+        return texts, True
+    if isinstance(payload.get("text"), str):
+        return [payload["text"]], False
+    raise _BadRequest("expected 'text' (string) or 'texts' (list of strings)")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: InferenceServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            self._send_json(200, self.server.metrics())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/extract":
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_REQUEST_BYTES:
+                self.close_connection = True
+                raise _BadRequest(f"request body larger than {MAX_REQUEST_BYTES} bytes")
+            try:
+                payload = json.loads(self.rfile.read(length) or b"null")
+            except ValueError as e:
+                raise _BadRequest(f"invalid JSON: {e}")
+            bodies, is_batch = _parse_bodies(payload)
+        except _BadRequest as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        started = time.perf_counter()
+        try:
+            results = self.server.extract(bodies)
+        except Exception as e:
+            self.server.stats.record(time.perf_counter() - started, mails=len(bodies), ok=False)
+            logger.exception("Extraction failed for %d mails", len(bodies))
+            self._send_json(500, {"error": str(e)})
+            return
+        duration = time.perf_counter() - started
+        self.server.stats.record(duration, mails=len(bodies))
+
+        latency = {"latency_ms": round(duration * 1000, 1)}
+        if is_batch:
+            self._send_json(200, {"results": [r.to_dict() for r in results], **latency})
+        else:
+            self._send_json(200, {**results[0].to_dict(), **latency})
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Headless CPU inference server for the JSON extractor")
+    parser.add_argument("--host", default=INFER_HOST)
+    parser.add_argument("--port", type=int, default=INFER_PORT)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="hf")
+    parser.add_argument("--model", default=MODEL_DIR, help="model klasörü ya da Hugging Face Hub id'si")
+    parser.add_argument("--threads", type=int, default=INFER_THREADS, help="torch intra-op thread sayısı (0 = varsayılan)")
+    parser.add_argument("--max-batch", type=int, default=INFER_MAX_BATCH, help="bir generate çağrısına giren en fazla mail")
+    parser.add_argument("--max-wait-ms", type=float, default=INFER_MAX_WAIT_MS, help="batch doldurmak için en fazla bekleme")
+    parser.add_argument("--bucket-ratio", type=float, default=INFER_BUCKET_RATIO, help="0 = uzunluğa göre bölme yok")
+    parser.add_argument("--cache-mb", type=float, default=INFER_CACHE_MB, help="sonuç cache'i bellek sınırı (0 = kapalı)")
+    args = parser.parse_args(argv)
+
+    extractor = load_extractor(args.backend, model_dir=args.model, threads=args.threads)
+    server = InferenceServer(
+        (args.host, args.port),
+        extractor,
+        max_batch=args.max_batch,
+        max_wait_ms=args.max_wait_ms,
+        bucket_ratio=args.bucket_ratio,
+        cache_mb=args.cache_mb,
+    )
+    logger.info("Serving %s backend on http://%s:%d (POST /extract, GET /metrics)", args.backend, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("Final metrics: %s", json.dumps(server.metrics()))
+
+
+if __name__ == "__main__":
+    main()
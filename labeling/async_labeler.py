@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AbstractSet, Any, AsyncIterator, Deque, Dict, Iterable, List, Optional, Tuple
+
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+
+from .openai_client import USAGE_STATS
+from .prompts import build_messages
+from .response_cache import ResponseCache, is_json
+
+logger = logging.getLogger(__name__)
+
+# Cevap için ayrılan token tahmini (TPM hesabında prompt'a eklenir)
+COMPLETION_TOKENS_ESTIMATE = 800
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Kaba token tahmini: Türkçe metinde ~3 karakter / token.
+    Gerçek kullanım cevap geldikten sonra RateLimiter.adjust ile düzeltilir.
+    """
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 3 + COMPLETION_TOKENS_ESTIMATE
+
+
+class RateLimiter:
+    """
+    Dakikalık istek (RPM) ve token (TPM) limiti için iki token bucket.
+    rpm / tpm <= 0 ise ilgili limit devre dışı.
+    """
+
+    def __init__(self, rpm: int, tpm: int) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(max(rpm, 0))
+        self._tokens = float(max(tpm, 0))
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm > 0:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens: int) -> float:
+        wait = 0.0
+        if self.rpm > 0 and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60.0 / self.rpm)
+        if self.tpm > 0 and self._tokens < tokens:
+            wait = max(wait, (tokens - self._tokens) * 60.0 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens: int) -> None:
+        if self.tpm > 0:
+            # Tek bir istek bucket kapasitesinden büyükse sonsuza kadar beklemesin
+            tokens = min(tokens, self.tpm)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    if self.rpm > 0:
+                        self._requests -= 1
+                    if self.tpm > 0:
+                        self._tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+    def adjust(self, delta_tokens: int) -> None:
+        """Tahmin ile gerçek kullanım arasındaki farkı bucket'a yansıt (negatife düşebilir)."""
+        if self.tpm > 0:
+            self._tokens -= delta_tokens
+
+
+def _retry_after_seconds(exc: APIStatusError) -> Optional[float]:
+    headers = getattr(exc.response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    return None
+
+
+def retry_delay(exc: BaseException, attempt: int) -> Optional[float]:
+    """
+    Tekrar denenebilir hatalar için bekleme süresi, değilse None.
+    429 ve 5xx -> Retry-After varsa ona uy, yoksa exponential backoff + jitter.
+    """
+    if isinstance(exc, APIStatusError):
+        if exc.status_code != 429 and exc.status_code < 500:
+            return None
+        retry_after = _retry_after_seconds(exc)
+        if retry_after is not None:
+            return min(retry_after, BACKOFF_MAX_SECONDS)
+    elif not isinstance(exc, APIConnectionError):
+        return None
+
+    backoff = min(BACKOFF_BASE_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+    return backoff * (0.5 + random.random() / 2)
+
+
+async def call_openai_async(
+    client: AsyncOpenAI,
+    model: str,
+    body_text: str,
+    limiter: RateLimiter,
+    max_retries: int = 5,
+) -> str:
+    messages = build_messages(body_text)
+    estimate = estimate_tokens(messages)
+
+    attempt = 0
+    while True:
+        await limiter.acquire(estimate)
+        try:
+            resp = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.0,
+            )
+        except Exception as exc:
+            delay = retry_delay(exc, attempt)
+            if delay is None or attempt >= max_retries:
+                raise
+            attempt += 1
+            logger.warning("OpenAI request failed (%s), retry %d/%d in %.1fs", exc, attempt, max_retries, delay)
+            await asyncio.sleep(delay)
+            continue
+
+        if resp.usage is not None:
+            USAGE_STATS.record(resp.usage)
+            limiter.adjust(resp.usage.total_tokens - estimate)
+        return resp.choices[0].message.content
+
+
+async def label_jobs_async(
+    jobs: Iterable[Any],
+    client: AsyncOpenAI,
+    model: str,
+    concurrency: int = 8,
+    rpm: int = 0,
+    tpm: int = 0,
+    max_retries: int = 5,
+    cache: Optional[ResponseCache] = None,
+    force_ids: AbstractSet[Optional[str]] = frozenset(),
+) -> AsyncIterator[Tuple[Any, Optional[str], Optional[BaseException]]]:
+    """
+    Job'ları en fazla `concurrency` eşzamanlı istekle etiketler.
+    Sonuçlar (job, raw_json_str, error) olarak GİRİŞ SIRASIYLA döner; böylece
+    çıktı dosyasındaki sıra senkron mod ile aynı kalır.
+
+    Job nesnesinin `body_text`, `mail_id`, `idx` ve `subject` alanları olmalı.
+    cache verilirse cache'teki gövdeler için istek atılmaz; force_ids'teki
+    mail'ler için cache okunmaz, yeni cevap eskisinin üzerine yazılır.
+    """
+    limiter = RateLimiter(rpm, tpm)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run_one(job: Any) -> Tuple[Any, Optional[str], Optional[BaseException]]:
+        if cache is not None and job.mail_id not in force_ids:
+            raw = cache.get(job.body_text)
+            if raw is not None:
+                logger.info("Cache hit for mail %s (%d)", job.mail_id, job.idx)
+                return job, raw, None
+
+        async with semaphore:
+            logger.info("Labeling mail %s (%d): %s", job.mail_id, job.idx, job.subject)
+            try:
+                raw = await call_openai_async(client, model, job.body_text, limiter, max_retries)
+                if cache is not None and is_json(raw):
+                    cache.put(job.body_text, raw)
+                return job, raw, None
+            except Exception as exc:
+                return job, None, exc
+
+    # Sırayı korurken belleği sınırlı tutmak için kayan pencere:
+    # baştaki iş bitmeden en fazla `window` iş havada bekler.
+    window = max(concurrency, 1) * 4
+    pending: Deque["asyncio.Task[Tuple[Any, Optional[str], Optional[BaseException]]]"] = deque()
+
+    try:
+        for job in jobs:
+            pending.append(asyncio.create_task(run_one(job)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openai import OpenAI
+
+from .openai_client import USAGE_STATS
+from .prompts import build_messages
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+# Provider limiti 50k istek / batch; üstü birden fazla batch'e bölünür
+BATCH_MAX_REQUESTS = int(os.getenv("OPENAI_BATCH_MAX_REQUESTS", "50000"))
+BATCH_POLL_SECONDS = float(os.getenv("OPENAI_BATCH_POLL_SECONDS", "60"))
+
+# Gönderilmiş ama sonucu alınmamış batch'ler; run çökerse tekrar submit etmeden poll edilir
+BATCH_STATE_PATH = Path("data/train/openai_batch_state.json")
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id_for(job: Any) -> str:
+    # Satır numarası + gövde hash'i: resume sırasında raw dosya değiştiyse eşleşmeyenler ayıklanır
+    return f"{job.idx}-{job.body_hash[:16]}"
+
+
+def build_batch_lines(jobs: Sequence[Any], model: str) -> bytes:
+    lines = []
+    for job in jobs:
+        lines.append(json.dumps(
+            {
+                "custom_id": custom_id_for(job),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": model,
+                    "messages": build_messages(job.body_text),
+                    "temperature": 0.0,
+                },
+            },
+            ensure_ascii=False,
+        ))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def submit_batch(client: OpenAI, jobs: Sequence[Any], model: str) -> str:
+    data = build_batch_lines(jobs, model)
+    input_file = client.files.create(file=("batch_input.jsonl", data), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=BATCH_COMPLETION_WINDOW,
+        metadata={"source": "labeling.openai_label_batch"},
+    )
+    logger.info("Submitted batch %s with %d requests (%d bytes)", batch.id, len(jobs), len(data))
+    return batch.id
+
+
+def wait_for_batch(client: OpenAI, batch_id: str, poll_seconds: float = BATCH_POLL_SECONDS) -> Any:
+    last_status = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if batch.status != last_status:
+            logger.info(
+                "Batch %s status=%s (completed=%s failed=%s total=%s)",
+                batch_id,
+                batch.status,
+                getattr(counts, "completed", None),
+                getattr(counts, "failed", None),
+                getattr(counts, "total", None),
+            )
+            last_status = batch.status
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        time.sleep(poll_seconds)
+
+
+def _read_file_lines(client: OpenAI, file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+    if not file_id:
+        return
+    text = client.files.content(file_id).text
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning("Skipping invalid line in batch file %s", file_id)
+
+
+def read_batch_results(client: OpenAI, batch: Any) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """custom_id -> (cevap içeriği, hata mesajı)"""
+    results: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+
+    for item in _read_file_lines(client, batch.output_file_id):
+        custom_id = item.get("custom_id")
+        response = item.get("response") or {}
+        error = item.get("error")
+        if error:
+            results[custom_id] = (None, f"{error.get('code')}: {error.get('message')}")
+            continue
+        if response.get("status_code") != 200:
+            results[custom_id] = (None, f"HTTP {response.get('status_code')}: {response.get('body')}")
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            results[custom_id] = (None, f"Unexpected batch response: {e}")
+            continue
+        if response["body"].get("usage"):
+            USAGE_STATS.record(response["body"]["usage"])
+        results[custom_id] = (content, None)
+
+    for item in _read_file_lines(client, batch.error_file_id):
+        custom_id = item.get("custom_id")
+        error = item.get("error") or {}
+        response = item.get("response") or {}
+        message = error.get("message") or (response.get("body") or {}).get("error", {}).get("message")
+        results.setdefault(custom_id, (None, f"{error.get('code') or response.get('status_code')}: {message}"))
+
+    return results
+
+
+def _load_state() -> Optional[Dict[str, Any]]:
+    if not BATCH_STATE_PATH.exists():
+        return None
+    with BATCH_STATE_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    BATCH_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = BATCH_STATE_PATH.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, BATCH_STATE_PATH)
+
+
+def _submit_jobs(client: OpenAI, jobs: List[Any], model: str, state: Dict[str, Any]) -> List[str]:
+    """Job'ları BATCH_MAX_REQUESTS'lik batch'ler halinde gönderir; her batch id'si hemen state'e yazılır."""
+    submitted = []
+    for start in range(0, len(jobs), BATCH_MAX_REQUESTS):
+        batch_id = submit_batch(client, jobs[start:start + BATCH_MAX_REQUESTS], model)
+        submitted.append(batch_id)
+        state["batch_ids"].append(batch_id)
+        _save_state(state)
+    return submitted
+
+
+def _collect_results(
+    client: OpenAI,
+    batch_ids: List[str],
+    state: Dict[str, Any],
+    poll_seconds: float,
+    results: Dict[str, Tuple[Optional[str], Optional[str]]],
+) -> None:
+    """
+    Batch'ler bitene kadar bekleyip sonuçlarını results'a ekler. completed
+    dışında biten (failed / expired / cancelled) batch'lerin varsa kısmi
+    sonuçları alınır ve id'leri state'ten düşülür; sonucu gelmeyen job'ları
+    tekrar gönderilir, sonraki run'lar ölü batch'i resume etmeye çalışmaz.
+    """
+    for batch_id in batch_ids:
+        batch = wait_for_batch(client, batch_id, poll_seconds)
+        results.update(read_batch_results(client, batch))
+        if batch.status != "completed":
+            logger.error(
+                "Batch %s ended with status %s (errors: %s), its mails will be resubmitted",
+                batch_id, batch.status, getattr(batch, "errors", None),
+            )
+            state["batch_ids"].remove(batch_id)
+            _save_state(state)
+
+
+def run_batch(
+    jobs: List[Any],
+    client: OpenAI,
+    model: str,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+) -> Iterator[Tuple[Any, Optional[str], Optional[BaseException]]]:
+    """
+    Job'ları Batch API ile etiketler ve (job, raw_json_str, error) üçlülerini
+    giriş sırasıyla döner.
+
+    Önceki run'dan kalan batch'ler varsa önce onlar beklenir; sonucu
+    onlarda olmayan job'lar (yeni mailler, başarısız biten batch'lerdekiler)
+    yeni batch olarak gönderilir. Bu turda da sonucu gelmeyen job'lar
+    döndürülmez; index'e yazılmadıkları için bir sonraki run'da tekrar denenir.
+    """
+    state = _load_state()
+    if state and state.get("model") == model and state.get("batch_ids"):
+        logger.info("Resuming %d previously submitted batches: %s", len(state["batch_ids"]), ", ".join(state["batch_ids"]))
+    else:
+        state = {"model": model, "batch_ids": [], "submitted_at": time.time()}
+
+    results: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    _collect_results(client, list(state["batch_ids"]), state, poll_seconds, results)
+
+    todo = [job for job in jobs if custom_id_for(job) not in results]
+    if todo:
+        if results:
+            logger.info("Submitting %d mails without a batch result", len(todo))
+        _collect_results(client, _submit_jobs(client, todo, model, state), state, poll_seconds, results)
+
+    missing = 0
+    for job in jobs:
+        item = results.get(custom_id_for(job))
+        if item is None:
+            missing += 1
+            continue
+        content, error = item
+        yield job, content, RuntimeError(error) if error else None
+
+    if missing:
+        logger.warning("%d mails have no batch result, they will be retried on the next run", missing)
+    BATCH_STATE_PATH.unlink(missing_ok=True)
@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import logging
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from email_ingestion.raw_store import RAW_DB_PATH, RawStore, migrate_legacy_jsonl
+
+from . import cleaning
+from .cleaning import SegmentSelection, html_to_text, select_best_segment
+from .filters import header_skip_reason
+from .response_cache import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Temizlenmiş gövdeler + segment seçim bilgisi (labeling bunu okuyor)
+CLEANED_DB_PATH = Path(os.getenv("CLEANED_STORE_PATH", "data/train/cleaned_emails.sqlite"))
+# 0 -> os.cpu_count(); 1 -> process pool olmadan, ana process'te
+CLEAN_WORKERS = int(os.getenv("CLEAN_WORKERS", "0"))
+# Worker'a tek seferde gönderilen mail sayısı (pickle / IPC maliyeti chunk başına)
+CLEAN_CHUNK_SIZE = int(os.getenv("CLEAN_CHUNK_SIZE", "64"))
+
+# cleaning.py değişince eski kayıtlar bayat sayılır ve tekrar temizlenir
+CLEANER_VERSION = fingerprint(Path(cleaning.__file__).read_text(encoding="utf-8"))[:16]
+
+# (mail_id, body_sha, contentType, content)
+RawItem = Tuple[str, str, str, str]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cleaned (
+    mail_id TEXT PRIMARY KEY,
+    body_sha TEXT,
+    cleaner_version TEXT,
+    text TEXT,
+    segment_index INTEGER,
+    segment_scores TEXT,
+    plain_chars INTEGER,
+    cleaned_at REAL
+);
+"""
+
+
+@dataclass
+class CleanedEmail:
+    mail_id: str
+    body_sha: str
+    text: str
+    segment_index: int
+    segment_scores: Tuple[float, ...]
+    plain_chars: int
+
+
+def clean_body(content_type: Optional[str], content: Optional[str]) -> Tuple[SegmentSelection, int]:
+    """HTML -> düz metin -> en iyi segment. (seçim, düz metin uzunluğu) döner."""
+    content = content or ""
+    if (content_type or "html").lower() == "html":
+        plain = html_to_text(content)
+    else:
+        plain = content
+    return select_best_segment(plain), len(plain)
+
+
+def clean_chunk(chunk: List[RawItem]) -> List[CleanedEmail]:
+    """Process pool worker'ı: bir chunk maili temizler."""
+    results = []
+    for mail_id, sha, content_type, content in chunk:
+        selection, plain_chars = clean_body(content_type, content)
+        results.append(CleanedEmail(
+            mail_id=mail_id,
+            body_sha=sha,
+            text=selection.text,
+            segment_index=selection.index,
+            segment_scores=selection.scores,
+            plain_chars=plain_chars,
+        ))
+    return results
+
+
+class CleanStore:
+    """
+    Temizlenmiş mail deposu: mail_id -> temiz gövde, seçilen segment index'i,
+    segment skorları. Kayıt sadece raw gövdenin sha'sı ve CLEANER_VERSION
+    tutuyorsa geçerli; gövde değişmiş ya da cleaning.py güncellenmişse
+    get() None döner ve mail tekrar temizlenir.
+    """
+
+    def __init__(self, path: Path = CLEANED_DB_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM cleaned WHERE cleaner_version = ?", (CLEANER_VERSION,)
+            ).fetchone()[0]
+
+    def fresh_shas(self) -> Dict[str, str]:
+        """Güncel sürümle temizlenmiş mailler: mail_id -> raw body_sha."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT mail_id, body_sha FROM cleaned WHERE cleaner_version = ?", (CLEANER_VERSION,)
+            ).fetchall()
+        return dict(rows)
+
+    def get(self, mail_id: str, sha: Optional[str]) -> Optional[CleanedEmail]:
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT text, segment_index, segment_scores, plain_chars FROM cleaned
+                WHERE mail_id = ? AND body_sha = ? AND cleaner_version = ?
+                """,
+                (mail_id, sha, CLEANER_VERSION),
+            ).fetchone()
+        if row is None:
+            return None
+        text, segment_index, scores_json, plain_chars = row
+        return CleanedEmail(
+            mail_id=mail_id,
+            body_sha=sha,
+            text=text,
+            segment_index=segment_index,
+            segment_scores=tuple(json.loads(scores_json or "[]")),
+            plain_chars=plain_chars,
+        )
+
+    def upsert(self, items: Iterable[CleanedEmail]) -> int:
+        now = time.time()
+        rows = [
+            (
+                item.mail_id,
+                item.body_sha,
+                CLEANER_VERSION,
+                item.text,
+                item.segment_index,
+                json.dumps(item.segment_scores),
+                item.plain_chars,
+                now,
+            )
+            for item in items
+        ]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cleaned VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def iter_raw_chunks(
+    store: RawStore,
+    fresh: Dict[str, str],
+    chunk_size: int,
+    all_mails: bool = False,
+) -> Iterator[List[RawItem]]:
+    """
+    Temizlenmesi gereken mailleri chunk'lar halinde okur. Varsayılan olarak
+    labeling'in başlık filtresinden geçmeyenler ve güncel kaydı olanlar atlanır.
+    """
+    chunk: List[RawItem] = []
+    for msg in store.iter_headers():
+        mail_id = msg["id"]
+        if not all_mails:
+            to_addrs = [r.get("address") or "" for r in msg.get("to", [])]
+            if header_skip_reason(msg.get("subject"), to_addrs):
+                continue
+        if fresh.get(mail_id) == msg.get("bodySha"):
+            continue
+        body = store.get_body(mail_id) or {}
+        chunk.append((mail_id, msg.get("bodySha"), body.get("contentType", "html"), body.get("content") or ""))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def clean_chunks(chunks: Iterable[List[RawItem]], workers: int) -> Iterator[List[CleanedEmail]]:
+    """
+    Chunk'ları process pool'da temizler; sonuçlar bitiş sırasıyla gelir.
+    Havuzda en fazla 2 * workers chunk bekler, raw store'un tamamı belleğe alınmaz.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield clean_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in chunks:
+            pending.add(pool.submit(clean_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def run(
+    store: RawStore,
+    cleaned: CleanStore,
+    workers: int = CLEAN_WORKERS,
+    chunk_size: int = CLEAN_CHUNK_SIZE,
+    all_mails: bool = False,
+) -> int:
+    workers = workers or os.cpu_count() or 1
+    fresh = cleaned.fresh_shas()
+    logger.info("Cleaning with %d workers, chunk size %d (%d mails already up to date)", workers, chunk_size, len(fresh))
+
+    started = time.perf_counter()
+    written = 0
+    for results in clean_chunks(iter_raw_chunks(store, fresh, chunk_size, all_mails), workers):
+        written += cleaned.upsert(results)
+        if written % (chunk_size * 50) < len(results):
+            logger.info("Cleaned %d mails (%.0f mails/s)", written, written / (time.perf_counter() - started))
+
+    elapsed = time.perf_counter() - started
+    logger.info("Cleaned %d mails in %.1fs (%.0f mails/s)", written, elapsed, written / elapsed if elapsed else 0.0)
+    return written
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Clean raw emails in parallel into the cleaned store")
+    parser.add_argument("--workers", type=int, default=CLEAN_WORKERS, help="0 = CPU sayısı, 1 = process pool yok")
+    parser.add_argument("--chunk-size", type=int, default=CLEAN_CHUNK_SIZE)
+    parser.add_argument("--all", action="store_true", help="başlık filtresinden geçmeyen mailleri de temizle")
+    parser.add_argument("--db", type=Path, default=CLEANED_DB_PATH)
+    args = parser.parse_args(argv)
+
+    store = RawStore(RAW_DB_PATH)
+    migrate_legacy_jsonl(store)
+    cleaned = CleanStore(args.db)
+    run(store, cleaned, workers=args.workers, chunk_size=max(args.chunk_size, 1), all_mails=args.all)
+    logger.info("Cleaned store %s: %d mails", args.db, len(cleaned))
+    cleaned.close()
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
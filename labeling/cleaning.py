@@ -1,9 +1,13 @@
 # labeling/cleaning.py
 
 import re
+import sys
 import unicodedata
-from typing import List
-from bs4 import BeautifulSoup
+from html.entities import html5
+from html.parser import HTMLParser
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+")
 PHONE_RE = re.compile(r"(?<![0-9A-Za-z])\+?\d[\d \-]{7,}\d(?![0-9A-Za-z])")
@@ -37,65 +41,411 @@ LEGAL_KEYWORDS = [
 ]
 
 
+# ---- keyword tarama ----
+
+class KeywordMatcher:
+    """
+    Birden fazla keyword grubunu (travel, legal, ...) tek tabloda toplar ve
+    bir metin için tüm tabloyu tek çağrıda tarar. Sonuç (keyword başına
+    geçiyor / geçmiyor) hem skorda hem legal kuyruk kesiminde kullanılır;
+    ilk pozisyon sadece geçen keyword'ler için ayrıca bulunur.
+
+    Not: ~65 kısa keyword için CPython'da keyword başına `in` (C'de fastsearch)
+    hem saf Python Aho-Corasick'ten hem de overlap'leri yakalamak için
+    lookahead'li tek regex alternation'dan hızlı çıktı.
+    """
+
+    def __init__(self, *groups: Sequence[str]) -> None:
+        self.keywords = list(dict.fromkeys(kw for group in groups for kw in group))
+        index = {kw: i for i, kw in enumerate(self.keywords)}
+        self._pickers = [_items_getter([index[kw] for kw in group]) for group in groups]
+
+    def scan(self, text: str) -> List[Tuple[bool, ...]]:
+        """Her grup için keyword sırasıyla text'te geçip geçmediği."""
+        found = [kw in text for kw in self.keywords]
+        return [pick(found) for pick in self._pickers]
+
+    @staticmethod
+    def first_position(text: str, keywords: Sequence[str], found: Sequence[bool]) -> int:
+        """Geçen keyword'lerden en önce gelenin index'i, hiçbiri yoksa -1."""
+        positions = [text.find(kw) for kw, hit in zip(keywords, found) if hit]
+        return min(positions) if positions else -1
+
+
+def _items_getter(indices: List[int]):
+    """itemgetter gibi ama her zaman tuple döner (0 / 1 elemanlı gruplar için de)."""
+    if len(indices) > 1:
+        return itemgetter(*indices)
+    return lambda seq: tuple(seq[i] for i in indices)
+
+
+@dataclass
+class KeywordHits:
+    travel: int = 0
+    legal: int = 0
+    # _LEGAL_KEYWORDS_LOWER sırasıyla hangi legal keyword'ler geçiyor
+    legal_found: Tuple[bool, ...] = ()
+
+
+# score_segment keyword'leri olduğu gibi, trim_legal_tail kw.lower() ile arıyordu
+_LEGAL_KEYWORDS_LOWER = [kw.lower() for kw in LEGAL_KEYWORDS]
+_KEYWORD_MATCHER = KeywordMatcher(TRAVEL_KEYWORDS, LEGAL_KEYWORDS, _LEGAL_KEYWORDS_LOWER)
+
+
+def scan_keywords(lower: str) -> KeywordHits:
+    """Küçük harfe çevrilmiş segmentte travel / legal keyword'leri sayar."""
+    travel, legal, legal_found = _KEYWORD_MATCHER.scan(lower)
+    return KeywordHits(travel=travel.count(True), legal=legal.count(True), legal_found=legal_found)
+
+
+# ---- HTML -> text ----
+# Eskiden BeautifulSoup(html, "html.parser").get_text(separator="\n") kullanıyorduk.
+# Ağaç kurmadan aynı sonucu veren tek geçişlik dönüştürücü; kurallar bs4'ün
+# html.parser builder'ıyla birebir aynı (çıktı regresyon corpus'unda eşleşiyor,
+# bkz. benchmarks/html_to_text_bench.py).
+
+# Kapanış tag'i beklenmeyen (void) elementler
+_VOID_TAGS = frozenset([
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen",
+    "link", "menuitem", "meta", "param", "source", "track", "wbr",
+    "basefont", "bgsound", "command", "frame", "image", "isindex", "nextid", "spacer",
+])
+# İçindeki boşluklar sıkıştırılmayan tag'ler
+_PRESERVE_WS_TAGS = frozenset(["pre", "textarea"])
+# İçindeki metin görünür text sayılmayan tag'ler (style / script vs.)
+_HIDDEN_TEXT_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+_ASCII_SPACES = " \n\t\x0c\r"
+
+_ENTITY_TO_CHAR = {}
+for _name, _char in sorted(html5.items()):
+    _ENTITY_TO_CHAR.setdefault(_name[:-1] if _name.endswith(";") else _name, _char)
+
+_DEC_REF_RE = re.compile("^([0-9]+)(.*)")
+_HEX_REF_RE = re.compile("^([0-9a-f]+)(.*)")
+
+
+def _numeric_char(code: int) -> str:
+    if code == 0 or code > 0x10FFFF or 0xD800 <= code <= 0xDFFF:
+        return "\ufffd"
+    if 0x80 <= code <= 0x9F:
+        # windows-1252 ile kodlanmış karakter referansları (&#150; vs.)
+        try:
+            return bytes([code]).decode("cp1252")
+        except UnicodeDecodeError:
+            pass
+    return chr(code)
+
+
+class _TextExtractor(HTMLParser):
+    """
+    HTMLParser event'lerinden görünür metin parçalarını toplar.
+    Her tag / yorum sınırında biriken metin ayrı bir parça olur;
+    sadece boşluktan oluşan parça tek boşluğa (içinde satır sonu varsa "\n") iner.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.parts: List[str] = []
+        self._data: List[str] = []
+        self._open: List[str] = []
+        self._open_count = {}
+        self._preserve_depth = 0
+        self._hidden_depth = 0
+        self._closed_void: List[str] = []
+
+    def _flush(self, keep: Optional[bool] = None) -> None:
+        """keep=None: normal metin (gizli tag içindeyse atılır)."""
+        if not self._data:
+            return
+        text = "".join(self._data)
+        self._data = []
+        if not self._preserve_depth and not text.strip(_ASCII_SPACES):
+            text = "\n" if "\n" in text else " "
+        if keep is None:
+            keep = not self._hidden_depth
+        if keep:
+            self.parts.append(text)
+
+    def _push(self, tag: str) -> None:
+        self._open.append(tag)
+        self._open_count[tag] = self._open_count.get(tag, 0) + 1
+        if tag in _PRESERVE_WS_TAGS:
+            self._preserve_depth += 1
+        if tag in _HIDDEN_TEXT_TAGS:
+            self._hidden_depth += 1
+
+    def _close(self, tag: str) -> None:
+        self._flush()
+        if not self._open_count.get(tag):
+            return
+        while True:
+            name = self._open.pop()
+            self._open_count[name] -= 1
+            if name in _PRESERVE_WS_TAGS:
+                self._preserve_depth -= 1
+            if name in _HIDDEN_TEXT_TAGS:
+                self._hidden_depth -= 1
+            if name == tag:
+                return
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        self._push(tag)
+        if tag in _VOID_TAGS:
+            self._close(tag)
+            self._closed_void.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+        self._push(tag)
+        self._close(tag)
+
+    def handle_endtag(self, tag):
+        # <br></br>: void tag zaten kapatıldı, kapanış tag'i yok sayılır
+        if tag in self._closed_void:
+            self._closed_void.remove(tag)
+        else:
+            self._close(tag)
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_entityref(self, name):
+        char = _ENTITY_TO_CHAR.get(name)
+        self._data.append(char if char is not None else "&" + name)
+
+    def handle_charref(self, name):
+        base, ref_re = 10, _DEC_REF_RE
+        if name[:1] in ("x", "X"):
+            name, base, ref_re = name[1:], 16, _HEX_REF_RE
+        extra = ""
+        try:
+            code: Optional[int] = int(name, base)
+        except ValueError:
+            # "&#12abc" gibi sonlandırılmamış referans: sayı kısmı karakter, gerisi metin
+            match = ref_re.search(name)
+            code = int(match.group(1), base) if match else None
+            extra = match.group(2) if match else name
+        self._data.append(_numeric_char(code) if code is not None else "")
+        self._data.append(extra)
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.upper().startswith("CDATA["):
+            # CDATA içeriği görünür metin sayılır (style / script içinde bile)
+            self._data.append(data[len("CDATA["):])
+            self._flush(keep=True)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def text(self) -> str:
+        self._flush()
+        return "\n".join(self.parts)
+
+
 def html_to_text(html: str) -> str:
     if not html:
         return ""
-    soup = BeautifulSoup(html, "html.parser")
-    text = soup.get_text(separator="\n")
-    text = re.sub(r"\r\n", "\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
-    text = normalize_whitespace_and_invisible(text)
-    return text.strip()
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return normalize_whitespace_and_invisible(parser.text())
+
+
+# ---- Anonimleştirme ----
+# Eskiden EMAIL_RE, PHONE_RE, PNR_RE sırayla üç ayrı re.sub ile uygulanıyordu.
+# Sonuç aynı, ama metin iki kez taranıyor: e-postalar '@' etrafından bulunur,
+# telefon + PNR tek regex'te aranır (bkz. benchmarks/anonymize_bench.py).
+
+_EMAIL_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+_EMAIL_DOMAIN_RE = re.compile(r"[A-Za-z0-9.-]+")
+
+# PHONE_RE | PNR_RE. Her iki desen de [+\dA-Z] ile başlıyor; ilk karakter
+# alternation'dan önce alınınca regex motoru diğer karakterlerde denemeye hiç
+# girmiyor. Baştaki lookbehind'lar ilk karakterden sonra kontrol ediliyor:
+#   PHONE: (?<![0-9A-Za-z])\+?\d  ->  "+" ise önü alfanümerik değil ve arkası rakam,
+#                                   rakamsa önü alfanümerik değil
+#   PNR:   \b[A-Z0-9]             ->  ASCII büyük harf / rakam ve önü \w değil
+# Hangi desenin eşleştiği boş PHONE / PNR grubuyla (m.lastgroup) belli oluyor.
+# Telefon önce denendiği için sonuç "önce PHONE_RE.sub, sonra PNR_RE.sub" ile aynı.
+_PHONE_PNR_RE = re.compile(
+    r"[+\dA-Z](?:"
+    r"(?:(?<=\+)(?<![0-9A-Za-z]\+)\d|(?<=\d)(?<![0-9A-Za-z].))[\d \-]{7,}\d(?![0-9A-Za-z])(?P<PHONE>)"
+    r"|(?<=[A-Z0-9])(?<!\w.)[A-Z0-9]{4,6}\b(?P<PNR>)"
+    r")"
+)
+_PLACEHOLDER_RE = re.compile(r"(?:EMAIL|PHONE|PNR)\d+_MASKED")
+_MASKS = {"EMAIL": "EMAIL_MASKED", "PHONE": "PHONE_MASKED", "PNR": "PNR_MASKED"}
+
+
+def _mask_emails(text: str, replace) -> str:
+    """EMAIL_RE.sub(replace, text) ile aynı; sadece '@' olan yerlerde çalışır."""
+    at = text.find("@")
+    if at < 0:
+        return text
+    parts = []
+    cursor = 0
+    while at >= 0:
+        start = at
+        while start > cursor and text[start - 1] in _EMAIL_LOCAL_CHARS:
+            start -= 1
+        domain = _EMAIL_DOMAIN_RE.match(text, at + 1)
+        if start == at or domain is None:
+            at = text.find("@", at + 1)
+            continue
+        parts.append(text[cursor:start])
+        parts.append(replace(text[start:domain.end()]))
+        cursor = domain.end()
+        at = text.find("@", cursor)
+    parts.append(text[cursor:])
+    return "".join(parts)
+
+
+def _fixed_mask(match: "re.Match[str]") -> str:
+    return _MASKS[match.lastgroup]
+
+
+def _email_mask(value: str) -> str:
+    return "EMAIL_MASKED"
+
+
+class Anonymizer:
+    """
+    E-posta, telefon ve PNR maskeleme.
+
+    reversible=False: her değer EMAIL_MASKED / PHONE_MASKED / PNR_MASKED olur
+    (anonymize_text ile aynı). reversible=True: her farklı değer kendi
+    placeholder'ını alır (EMAIL1_MASKED, PHONE2_MASKED ...); aynı e-posta
+    (büyük/küçük harf farkı), aynı telefon (boşluk / tire farkı) tüm
+    metinlerde aynı placeholder'a gider. mapping placeholder -> orijinal
+    değeri tutar, restore() metni geri çevirir.
+    """
+
+    def __init__(self, reversible: bool = False) -> None:
+        self.reversible = reversible
+        self.mapping: Dict[str, str] = {}
+        self._placeholders: Dict[Tuple[str, str], str] = {}
+
+    def _placeholder(self, kind: str, value: str) -> str:
+        if kind == "EMAIL":
+            key = value.lower()
+        elif kind == "PHONE":
+            key = "".join(ch for ch in value if ch.isdigit())
+        else:
+            key = value
+        placeholder = self._placeholders.get((kind, key))
+        if placeholder is None:
+            # Numara ortada: "_MASKED" ile bittiği için sonraki telefon / PNR
+            # eşleşmeleri sabit maskedeki gibi placeholder'a yapışamıyor
+            placeholder = f"{kind}{len(self._placeholders) + 1}_MASKED"
+            self._placeholders[(kind, key)] = placeholder
+            self.mapping[placeholder] = value
+        return placeholder
+
+    def _email(self, value: str) -> str:
+        return self._placeholder("EMAIL", value)
+
+    def _phone_pnr(self, match: "re.Match[str]") -> str:
+        return self._placeholder(match.lastgroup, match.group())
+
+    def anonymize(self, text: str) -> str:
+        if not text:
+            return ""
+        if not self.reversible:
+            return _PHONE_PNR_RE.sub(_fixed_mask, _mask_emails(text, _email_mask))
+        return _PHONE_PNR_RE.sub(self._phone_pnr, _mask_emails(text, self._email))
+
+    def anonymize_batch(self, texts: Iterable[str]) -> List[str]:
+        """Metin listesini maskeler; reversible ise placeholder'lar tüm liste boyunca tutarlı."""
+        return [self.anonymize(text) for text in texts]
+
+    def restore(self, text: str) -> str:
+        """Placeholder'ları orijinal değerlere çevirir (bu instance'ın ürettikleri)."""
+        return _PLACEHOLDER_RE.sub(lambda m: self.mapping.get(m.group(), m.group()), text)
+
+
+_ANONYMIZER = Anonymizer()
 
 
 def anonymize_text(text: str) -> str:
-    if not text:
-        return ""
-    text = EMAIL_RE.sub("EMAIL_MASKED", text)
-    text = PHONE_RE.sub("PHONE_MASKED", text)
-    text = PNR_RE.sub("PNR_MASKED", text)
-    return text
+    return _ANONYMIZER.anonymize(text)
 
 
-def split_segments(full_text: str) -> List[str]:
-    """
-    Thread içinden tek tek "mail" bloklarını çıkar.
-    Marker'lar: -----Original Message-----, From:, Gönderen:, Kimden: vs.
-    """
-    if not full_text:
-        return []
+def anonymize_texts(texts: Iterable[str]) -> List[str]:
+    return _ANONYMIZER.anonymize_batch(texts)
 
-    t = full_text.replace("\r\n", "\n")
-    lower = t.lower()
 
-    markers = [
-        "-----original message-----",
-        "----- özgün ileti -----",
-        "-----özgün ileti-----",
-        "\nfrom:",
-        "\ngönderen:",
-        "\nkimden:",
-    ]
+# Thread içindeki mail sınırları (küçük harf metinde aranır)
+SEGMENT_MARKERS = [
+    "-----original message-----",
+    "----- özgün ileti -----",
+    "-----özgün ileti-----",
+    "\nfrom:",
+    "\ngönderen:",
+    "\nkimden:",
+]
+
+Span = Tuple[int, int]
 
-    indices = [0]
 
-    for m in markers:
+def _segment_boundaries(lower: str, limit: int) -> List[int]:
+    """
+    Marker'ların başladığı index'ler (0 dahil, sıralı, tekrarsız, < limit).
+    Her marker'ın tekrarları çakışmadan aranır (find(m, önceki + len(m))).
+    """
+    bounds = {0}
+    find = lower.find
+    for marker in SEGMENT_MARKERS:
         start = 0
         while True:
-            idx = lower.find(m, start)
+            idx = find(marker, start)
             if idx == -1:
                 break
-            indices.append(idx)
-            start = idx + len(m)
+            bounds.add(idx)
+            start = idx + len(marker)
+    return sorted(i for i in bounds if i < limit)
 
-    indices = sorted(set(i for i in indices if 0 <= i < len(t)))
 
-    segments: List[str] = []
-    for i, start in enumerate(indices):
-        end = indices[i + 1] if i + 1 < len(indices) else len(t)
-        seg = t[start:end].strip()
-        if seg:
-            segments.append(seg)
+def segment_spans(full_text: str) -> Tuple[str, str, List[Span]]:
+    """
+    split_segments'in kopya almayan hali: (text, lower, spans) döner.
+    text: satır sonları normalize edilmiş thread, lower: text.lower(),
+    spans: text içinde boşlukları kırpılmış, boş olmayan segmentlerin (start, end)'i.
+    """
+    if not full_text:
+        return "", "", []
+
+    t = full_text.replace("\r\n", "\n")
+    lower = t.lower()
+    bounds = _segment_boundaries(lower, len(t))
+
+    spans: List[Span] = []
+    for i, start in enumerate(bounds):
+        end = bounds[i + 1] if i + 1 < len(bounds) else len(t)
+        # t[start:end].strip() ile aynı sınırlar
+        while start < end and t[start].isspace():
+            start += 1
+        while end > start and t[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+    return t, lower, spans
+
+
+def split_segments(full_text: str) -> List[str]:
+    """
+    Thread içinden tek tek "mail" bloklarını çıkar.
+    Marker'lar: -----Original Message-----, From:, Gönderen:, Kimden: vs.
+    """
+    t, _, spans = segment_spans(full_text)
+    segments = [t[start:end] for start, end in spans]
 
     # marker hiç bulunamadıysa tek segment olsun
     if not segments and full_text.strip():
@@ -104,21 +454,21 @@ def split_segments(full_text: str) -> List[str]:
     return segments
 
 
-def trim_legal_tail(segment: str) -> str:
+def trim_legal_tail(segment: str, hits: Optional[KeywordHits] = None) -> str:
     """
     Bir mail segmentinin SONUNDAKİ legal / disclaimer bloklarını kes.
     (Talep üstte, legal altta olduğu için.)
+    hits: segment için scan_keywords sonucu (verilmezse taranır).
     """
     if not segment:
         return ""
 
     lower = segment.lower()
-    cut_pos = len(segment)
-
-    for kw in LEGAL_KEYWORDS:
-        idx = lower.find(kw.lower())
-        if idx != -1 and idx < cut_pos:
-            cut_pos = idx
+    if hits is None:
+        hits = scan_keywords(lower)
+    cut_pos = KeywordMatcher.first_position(lower, _LEGAL_KEYWORDS_LOWER, hits.legal_found)
+    if cut_pos == -1:
+        cut_pos = len(segment)
 
     # Gövdeden önce anlamlı kısım varsa kes
     if 50 < cut_pos < len(segment):
@@ -126,45 +476,120 @@ def trim_legal_tail(segment: str) -> str:
     return segment.strip()
 
 
-def score_segment(segment: str) -> float:
+def score_segment(segment: str, hits: Optional[KeywordHits] = None) -> float:
     """
     Tüm bir mail segmenti için talep skoru:
     + travel keyword
     - legal keyword
     - çok kısaysa ceza
     """
-    lower = segment.lower()
-    travel_hits = sum(1 for kw in TRAVEL_KEYWORDS if kw in lower)
-    legal_hits  = sum(1 for kw in LEGAL_KEYWORDS  if kw in lower)
+    if hits is None:
+        hits = scan_keywords(segment.lower())
+    return segment_score(len(segment), hits)
+
 
-    length = len(segment)
+def segment_score(length: int, hits: KeywordHits) -> float:
+    """score_segment'in segment metni olmadan hali (uzunluk + keyword sonuçları)."""
     length_penalty = 1.0 if length < 40 else 0.0
 
-    return travel_hits - 0.7 * legal_hits - length_penalty
+    return hits.travel - 0.7 * hits.legal - length_penalty
 
 
-def choose_best_segment(full_text: str) -> str:
+@dataclass
+class SegmentSelection:
+    """choose_best_segment sonucu: seçilen (kesilmiş) segment + seçim bilgisi."""
+    text: str
+    index: int = -1
+    scores: Tuple[float, ...] = ()
+
+
+def select_best_segment(full_text: str) -> SegmentSelection:
     """
     1) Thread'i mail segmentlerine böler
     2) Her segmenti skorlar
     3) En yüksek skorlu mail segmentini seçer
     4) O segmentin sonundaki legal kuyruğu keser
+    Segmentler thread üzerinde (start, end) olarak skorlanır; orijinal metinden
+    sadece seçilen segment kopyalanır. Kesim skorlamadaki tarama sonucunu kullanır.
+    Segment yoksa index -1 ve boş metin döner.
     """
-    segments = split_segments(full_text)
-    if not segments:
-        return ""
+    t, lower, spans = segment_spans(full_text)
+    if not spans:
+        return SegmentSelection(text="")
+
+    # lower() uzunluğu değiştirmediyse ("İ" -> "i̇" gibi karakter yoksa) segmentin
+    # küçük harf hali lower[start:end]; yoksa segment segment lower() alınır.
+    # (Keyword araması için str.find(kw, start, end) slice + `in`'den yavaş çıktı.)
+    aligned = len(lower) == len(t)
+
+    scores: List[float] = []
+    best_index = 0
+    best_hits = None
+
+    for i, (start, end) in enumerate(spans):
+        if aligned:
+            hits = scan_keywords(lower[start:end])
+        else:
+            hits = scan_keywords(t[start:end].lower())
+        s = segment_score(end - start, hits)
+        if best_hits is None or s > scores[best_index]:
+            best_index = i
+            best_hits = hits
+        scores.append(s)
+
+    start, end = spans[best_index]
+    best_seg = trim_legal_tail(t[start:end], best_hits)
+    return SegmentSelection(text=best_seg.strip(), index=best_index, scores=tuple(scores))
+
+
+def choose_best_segment(full_text: str) -> str:
+    """select_best_segment'in sadece metni (labeling / inference bunu kullanıyor)."""
+    return select_best_segment(full_text).text
+
 
-    best_score = None
-    best_seg = ""
+# Aynı satırda birden fazla boşluk / tab ya da tek tab; tek boşluk zaten
+# sonuçla aynı olduğu için eşleşmiyor (çoğu eşleşme kelime arası tek boşluktu)
+_SPACE_RUN_RE = re.compile(r"[ \t]{2,}|\t")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+# Unicode "format" (Cf) karakterleri ve onları içerebilecek karakter koşuları;
+# ilk kullanımda unicodedata'nın sürümüne göre bir kez kurulur (~0.1 sn)
+_FORMAT_CHARS: Optional[frozenset] = None
+_FORMAT_CANDIDATE_RE: Optional["re.Pattern[str]"] = None
 
-    for seg in segments:
-        s = score_segment(seg)
-        if best_score is None or s > best_score:
-            best_score = s
-            best_seg = seg
 
-    best_seg = trim_legal_tail(best_seg)
-    return best_seg.strip()
+def _build_format_tables() -> None:
+    """
+    Cf karakterlerinin hepsi U+00AD (soft hyphen) ya da Arapça bloğu ve sonrası
+    (U+0600+); Latin / Türkçe harfler bu aralığın dışında kalıyor. Önce sadece
+    bu aralıktaki karakter koşuları regex ile bulunur, Cf kontrolü koşuların
+    içinde yapılır; metnin geri kalanına Python tarafında hiç dokunulmaz.
+    """
+    global _FORMAT_CHARS, _FORMAT_CANDIDATE_RE
+    chars = frozenset(
+        chr(code) for code in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(code)) == "Cf"
+    )
+    first, second = sorted(ord(ch) for ch in chars)[:2]
+    # first (U+00AD) ve second (U+0600) dışında, second'dan küçük her şey atlanır
+    _FORMAT_CANDIDATE_RE = re.compile(
+        f"[^\\x00-\\u{first - 1:04x}\\u{first + 1:04x}-\\u{second - 1:04x}]+"
+    )
+    _FORMAT_CHARS = chars
+
+
+def _drop_format_chars(match: "re.Match[str]") -> str:
+    run = match.group()
+    if _FORMAT_CHARS.isdisjoint(run):
+        return run
+    return "".join(ch for ch in run if ch not in _FORMAT_CHARS)
+
+
+def strip_format_chars(text: str) -> str:
+    """Unicode "format" (Cf) kategorisindeki karakterleri siler (zero-width space, BOM vs.)."""
+    if _FORMAT_CANDIDATE_RE is None:
+        _build_format_tables()
+    return _FORMAT_CANDIDATE_RE.sub(_drop_format_chars, text)
+
 
 def normalize_whitespace_and_invisible(text: str) -> str:
     """
@@ -179,18 +604,15 @@ def normalize_whitespace_and_invisible(text: str) -> str:
 
     # Unicode "format" kategorisindeki karakterleri (Cf) sil
     # (zero-width space, zero-width joiner vs.)
-    text = "".join(
-        ch for ch in text
-        if unicodedata.category(ch) != "Cf"
-    )
+    text = strip_format_chars(text)
 
     # Satır sonlarını normalize et
     text = text.replace("\r\n", "\n")
 
     # Aynı satırdaki fazla boşlukları sıkıştır
-    text = re.sub(r"[ \t]+", " ", text)
+    text = _SPACE_RUN_RE.sub(" ", text)
 
     # Birden fazla boş satırı tek boş satıra indir
-    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text)
 
-    return text.strip()
\ No newline at end of file
+    return text.strip()
@@ -0,0 +1,31 @@
+from typing import Iterable, Optional
+
+# Etiketlenecek mailler: şirket domain'indeki bu dağıtım gruplarına gelmiş olmalı
+COMPANY_DOMAIN = "julesverne.com.tr"
+MAIL_GROUPS = ["booking", "jvnobet", "karadeniz", "denizbank", "tvekip1", "tvekip2", "tvekip3", "tvekip4"]
+
+RE_PREFIXES = ("re:", "fw:", "fwd:", "ynt:", "cev:", "cevap:", "yanıt:")
+
+
+def is_reply_subject(subject: Optional[str]) -> bool:
+    return (subject or "").lower().startswith(RE_PREFIXES)
+
+
+def has_target_group(to_addrs: Iterable[str]) -> bool:
+    return any(
+        addr.endswith(f"@{COMPANY_DOMAIN}") and any(group in addr for group in MAIL_GROUPS)
+        for addr in (a.lower() for a in to_addrs)
+    )
+
+
+def header_skip_reason(subject: Optional[str], to_addrs: Iterable[str]) -> Optional[str]:
+    """
+    Sadece başlık bilgisiyle (konu + alıcılar) mailin etiketlenip
+    etiketlenmeyeceğine karar verir. Atlanacaksa sebebi, değilse None döner.
+    Gövdeye bakan kontroller (çok kısa gövde vs.) burada değil.
+    """
+    if is_reply_subject(subject):
+        return "reply/forward subject"
+    if not has_target_group(to_addrs):
+        return "not sent to target groups"
+    return None
@@ -0,0 +1,243 @@
+import os
+import re
+import zlib
+import random
+import sqlite3
+import hashlib
+import argparse
+import logging
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Temiz gövdelerin MinHash imzaları + LSH bucket'ları
+DEDUP_INDEX_PATH = Path(os.getenv("LABEL_DEDUP_INDEX_PATH", "data/train/near_dup_index.sqlite"))
+# Tahmini Jaccard benzerliği (kelime 3-gram'ları) bu değer ve üstündeyse aynı küme
+DEDUP_THRESHOLD = float(os.getenv("LABEL_DEDUP_THRESHOLD", "0.9"))
+
+NUM_PERM = 128
+# 16 band x 8 satır: benzerliği ~0.7 üstü olan çiftler en az bir band'da
+# aynı bucket'a düşer; kesin karar imza karşılaştırmasıyla DEDUP_THRESHOLD'a göre
+NUM_BANDS = 16
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_TOKEN_RE = re.compile(r"\w+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    mail_id TEXT PRIMARY KEY,
+    body_hash TEXT,
+    signature BLOB,
+    cluster TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_signatures_cluster ON signatures(cluster);
+
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER,
+    bucket INTEGER,
+    mail_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands(band, bucket);
+CREATE INDEX IF NOT EXISTS idx_bands_mail ON bands(mail_id);
+"""
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    """Küçük harf kelime n-gram'larının 32 bit hash'leri (kısa metinde kelimelerin kendisi)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        grams = tokens
+    else:
+        grams = [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+    return {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+
+
+class MinHasher:
+    """h(x) = (a * x + b) mod p ailesinden NUM_PERM permütasyonla MinHash imzası."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1) -> None:
+        rng = random.Random(seed)
+        self.params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, hashes: Set[int]) -> Tuple[int, ...]:
+        if not hashes:
+            return tuple(_MERSENNE_PRIME for _ in self.params)
+        p = _MERSENNE_PRIME
+        return tuple(min([(a * x + b) % p for x in hashes]) for a, b in self.params)
+
+
+def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """İki imzanın tahmini Jaccard benzerliği."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def band_buckets(signature: Sequence[int], bands: int = NUM_BANDS) -> List[int]:
+    """Her band'ın satırlarından 64 bit (SQLite INTEGER'a sığan) bucket anahtarı."""
+    rows = len(signature) // bands
+    buckets = []
+    for band in range(bands):
+        chunk = array("I", signature[band * rows:(band + 1) * rows]).tobytes()
+        buckets.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True))
+    return buckets
+
+
+class NearDupIndex:
+    """
+    Temiz gövdeler için artımlı near-duplicate indeksi (MinHash + LSH banding).
+
+    Her mail bir kümeye atanır; küme adı kümeye ilk giren mailin id'si
+    (representative). Yeni mail için sadece NUM_BANDS bucket'taki adaylar
+    okunup imzaları karşılaştırılır, index boyutundan bağımsız.
+    Aynı (mail_id, gövde hash'i) tekrar gelirse imza yeniden hesaplanmaz.
+    Representative'in gövdesi değişirse kümenin diğer üyeleri birbirlerine
+    göre yeniden kümelenir (eski kümeleri artık o gövdeye dayanmıyor).
+    """
+
+    def __init__(self, path: Path = DEDUP_INDEX_PATH, threshold: float = DEDUP_THRESHOLD) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+    def _candidates(self, buckets: List[int], exclude: str) -> Set[str]:
+        found: Set[str] = set()
+        for band, bucket in enumerate(buckets):
+            found.update(
+                row[0] for row in self._conn.execute(
+                    "SELECT mail_id FROM bands WHERE band = ? AND bucket = ?", (band, bucket)
+                )
+            )
+        found.discard(exclude)
+        return found
+
+    def find(self, signature: Tuple[int, ...], exclude: str = "") -> Optional[Tuple[str, float]]:
+        """En benzer indeksli mailin kümesi ve benzerliği (eşik altındaysa None)."""
+        best: Optional[Tuple[str, float]] = None
+        for mail_id in self._candidates(band_buckets(signature), exclude):
+            row = self._conn.execute(
+                "SELECT signature, cluster FROM signatures WHERE mail_id = ?", (mail_id,)
+            ).fetchone()
+            if row is None:
+                continue
+            score = similarity(signature, array("I", row[0]))
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (row[1], score)
+        return best
+
+    def cluster_of(self, mail_id: str) -> Optional[str]:
+        """Mailin şu anki kümesi (indekste yoksa None)."""
+        row = self._conn.execute("SELECT cluster FROM signatures WHERE mail_id = ?", (mail_id,)).fetchone()
+        return row[0] if row else None
+
+    def _repoint_members(self, rep: str) -> Dict[str, str]:
+        """
+        rep'in kümesindeki diğer mailleri (eklenme sırasıyla) eşik üstündeki en
+        benzer üyenin kümesine, yoksa kendi kümelerine taşır. mail_id -> yeni küme.
+        """
+        rows = self._conn.execute(
+            "SELECT mail_id, signature FROM signatures WHERE cluster = ? AND mail_id != ? ORDER BY rowid",
+            (rep, rep),
+        ).fetchall()
+        moved: Dict[str, str] = {}
+        placed: List[Tuple[str, array]] = []
+        for member, blob in rows:
+            signature = array("I", blob)
+            best: Optional[Tuple[str, float]] = None
+            for other, other_signature in placed:
+                score = similarity(signature, other_signature)
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (moved[other], score)
+            moved[member] = best[0] if best else member
+            placed.append((member, signature))
+        self._conn.executemany(
+            "UPDATE signatures SET cluster = ? WHERE mail_id = ?",
+            [(cluster, member) for member, cluster in moved.items()],
+        )
+        return moved
+
+    def assign(self, mail_id: str, body_hash: str, text: str) -> str:
+        """Maili indekse ekler ve kümesinin representative id'sini döner (yeni kümede kendisi)."""
+        row = self._conn.execute(
+            "SELECT body_hash, cluster FROM signatures WHERE mail_id = ?", (mail_id,)
+        ).fetchone()
+        if row is not None and row[0] == body_hash:
+            return row[1]
+
+        if row is not None and row[1] == mail_id:
+            with self._conn:
+                moved = self._repoint_members(mail_id)
+            if moved:
+                logger.info(
+                    "Representative %s changed, %d near-duplicates moved to %d clusters",
+                    mail_id, len(moved), len(set(moved.values())),
+                )
+
+        signature = self.hasher.signature(shingles(text))
+        match = self.find(signature, exclude=mail_id)
+        cluster = match[0] if match else mail_id
+        with self._conn:
+            self._conn.execute("DELETE FROM bands WHERE mail_id = ?", (mail_id,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO signatures (mail_id, body_hash, signature, cluster) VALUES (?, ?, ?, ?)",
+                (mail_id, body_hash, array("I", signature).tobytes(), cluster),
+            )
+            self._conn.executemany(
+                "INSERT INTO bands (band, bucket, mail_id) VALUES (?, ?, ?)",
+                [(band, bucket, mail_id) for band, bucket in enumerate(band_buckets(signature))],
+            )
+        if match:
+            logger.debug("Mail %s is a near-duplicate of %s (similarity %.2f)", mail_id, cluster, match[1])
+        return cluster
+
+    def cluster_sizes(self, limit: int = 10) -> List[Tuple[str, int]]:
+        return self._conn.execute(
+            "SELECT cluster, COUNT(*) AS n FROM signatures GROUP BY cluster HAVING n > 1 ORDER BY n DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        mails, clusters = self._conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT cluster) FROM signatures"
+        ).fetchone()
+        return {"mails": mails, "clusters": clusters, "duplicates": mails - clusters}
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Near-duplicate index stats")
+    parser.add_argument("--db", type=Path, default=DEDUP_INDEX_PATH)
+    parser.add_argument("--top", type=int, default=10, help="en büyük N kümeyi listele")
+    args = parser.parse_args(argv)
+
+    index = NearDupIndex(args.db)
+    stats = index.stats()
+    logger.info(
+        "%s: %d mails in %d clusters (%d near-duplicates)",
+        args.db, stats["mails"], stats["clusters"], stats["duplicates"],
+    )
+    for cluster, size in index.cluster_sizes(args.top):
+        logger.info("  cluster %s: %d mails", cluster, size)
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
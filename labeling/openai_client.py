@@ -0,0 +1,193 @@
+import os
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+# Lokal stub / proxy sunucusu için (boşsa resmi endpoint)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# HTTP bağlantı havuzu ayarları
+OPENAI_POOL_SIZE = int(os.getenv("OPENAI_POOL_SIZE", "16"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+
+
+@dataclass
+class PoolStats:
+    """Gönderilen HTTP istekleri ve açılan TCP bağlantıları sayaçları."""
+
+    requests: int = 0
+    connections_opened: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    @property
+    def connections_reused(self) -> int:
+        return max(self.requests - self.connections_opened, 0)
+
+    def summary(self) -> str:
+        return (
+            f"requests={self.requests} connections_opened={self.connections_opened} "
+            f"connections_reused={self.connections_reused}"
+        )
+
+
+POOL_STATS = PoolStats()
+
+
+@dataclass
+class UsageStats:
+    """
+    API'den dönen token kullanımı. `mails` bu tokenlarla etiketlenen mail
+    sayısı (packed istekte pakettekilerin hepsi); mail başı maliyeti
+    sync / packed / batch yolları arasında karşılaştırmak için.
+    """
+
+    requests: int = 0
+    mails: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, usage: Any, mails: int = 1) -> None:
+        if isinstance(usage, dict):
+            prompt = usage.get("prompt_tokens") or 0
+            completion = usage.get("completion_tokens") or 0
+        else:
+            prompt = getattr(usage, "prompt_tokens", 0) or 0
+            completion = getattr(usage, "completion_tokens", 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.mails += mails
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def summary(self) -> str:
+        per_mail = self.total_tokens / self.mails if self.mails else 0.0
+        return (
+            f"requests={self.requests} mails={self.mails} prompt_tokens={self.prompt_tokens} "
+            f"completion_tokens={self.completion_tokens} tokens_per_mail={per_mail:.0f}"
+        )
+
+
+USAGE_STATS = UsageStats()
+
+
+# httpcore her yeni TCP bağlantısında "connection.connect_tcp.*" trace event'i üretir;
+# istek sayısından farkı keep-alive ile yeniden kullanılan bağlantılardır.
+def _trace(event_name: str, info: Any) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        POOL_STATS.record_connection()
+
+
+async def _atrace(event_name: str, info: Any) -> None:
+    _trace(event_name, info)
+
+
+def _on_request(request: httpx.Request) -> None:
+    POOL_STATS.record_request()
+    request.extensions["trace"] = _trace
+
+
+async def _aon_request(request: httpx.Request) -> None:
+    POOL_STATS.record_request()
+    request.extensions["trace"] = _atrace
+
+
+def _limits(pool_size: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+
+_lock = threading.Lock()
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+
+def get_client() -> OpenAI:
+    """Tüm senkron çağrıların paylaştığı, keep-alive havuzlu OpenAI client'ı."""
+    global _client
+    with _lock:
+        if _client is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            http_client = httpx.Client(
+                limits=_limits(OPENAI_POOL_SIZE),
+                timeout=_timeout(),
+                event_hooks={"request": [_on_request]},
+            )
+            _client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, http_client=http_client)
+            logger.debug("Created shared OpenAI client (pool_size=%d)", OPENAI_POOL_SIZE)
+        return _client
+
+
+def get_async_client(pool_size: Optional[int] = None) -> AsyncOpenAI:
+    """
+    Async labeling için paylaşılan client. Event loop'a bağlı olduğu için
+    loop kapanmadan önce aclose_async_client() ile kapatılmalı.
+    Retry/backoff async_labeler'da yapıldığı için SDK retry'ı kapalı.
+    """
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("OPENAI_API_KEY is not set")
+            size = pool_size or OPENAI_POOL_SIZE
+            http_client = httpx.AsyncClient(
+                limits=_limits(size),
+                timeout=_timeout(),
+                event_hooks={"request": [_aon_request]},
+            )
+            _async_client = AsyncOpenAI(
+                api_key=OPENAI_API_KEY,
+                base_url=OPENAI_BASE_URL,
+                http_client=http_client,
+                max_retries=0,
+            )
+            logger.debug("Created shared async OpenAI client (pool_size=%d)", size)
+        return _async_client
+
+
+async def aclose_async_client() -> None:
+    global _async_client
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
+def close_client() -> None:
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
@@ -1,369 +1,592 @@
 
 import os
 import json
+import asyncio
+import argparse
 import logging
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import AbstractSet, Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from pydantic import ValidationError
 
-from .schema import EmailRequest
-from .cleaning import html_to_text, anonymize_text, choose_best_segment
+from email_ingestion.raw_store import RAW_DB_PATH, RawStore, migrate_legacy_jsonl
 
-from openai import OpenAI
+from .schema import EmailRequest
+from .cleaning import anonymize_text
+from .clean_batch import CLEANED_DB_PATH, CleanStore, clean_body
+from .filters import header_skip_reason
+from .prompts import PROMPT_TEMPLATE, SYSTEM_PROMPT, build_messages
+from .response_cache import ResponseCache, fingerprint, is_json
+from .async_labeler import label_jobs_async
+from .packing import PACKED_PROMPT_TAIL, SCHEMA_PROMPT, build_packed_messages, pack_jobs, split_packed_response
+from .batch_backend import BATCH_POLL_SECONDS, run_batch
+from .progress_index import LabelIndex, body_hash, is_failed_record
+from .near_dup import DEDUP_INDEX_PATH, NearDupIndex
+from .openai_client import (
+    OPENAI_MODEL,
+    POOL_STATS,
+    USAGE_STATS,
+    aclose_async_client,
+    close_client,
+    get_async_client,
+    get_client,
+)
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-RAW_PATH = Path("data/train/raw_emails.jsonl")
 OUT_PATH = Path("data/train/labeled_emails.jsonl")
-
-OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-
-COMPANY_DOMAIN = "julesverne.com.tr"
-MAIL_GROUPS = ["booking", "jvnobet", "karadeniz", "denizbank", "tvekip1", "tvekip2", "tvekip3", "tvekip4"]
-
-RE_PREFIXES = ("re:", "fw:", "fwd:", "ynt:", "cev:", "cevap:", "yanıt:")
-
-PROMPT_TEMPLATE = """
-Aşağıda bir uçuş / otel / transfer talebi e-postası var.
-
-Bu e-postadan aşağıdaki JSON şemasına UYGUN bir çıktı üret.
-
-Genel şema:
-
-{
-  "requests": [
-    {
-      "type": "flight" | "hotel" | "transfer",
-      "flight": FlightRequest veya null,
-      "hotel": HotelRequest veya null,
-      "transfer": TransferRequest veya null
-    }
-  ]
-}
-
-Her request için:
-- type = "flight" ise: flight doldur, hotel ve transfer = null
-- type = "hotel" ise: hotel doldur, flight ve transfer = null
-- type = "transfer" ise: transfer doldur, flight ve hotel = null
-
-Aşağıda her tip için kullanılacak alanlar detaylı olarak verilmiştir.
-
---------------------
-DateSpec (tüm tarihler için)
---------------------
-JSON alan adı: DateSpec
-Yapı:
-
-{
-  "type": "exact" | "range" | "after" | "before" | "unspecified",
-  "exact": "YYYY-MM-DD" veya null,
-  "from": "YYYY-MM-DD" veya null,
-  "to": "YYYY-MM-DD" veya null,
-  "text": "kullanıcının serbest metni" veya null
-}
-
-Örnekler:
-- Kullanıcı net bir tarih veriyorsa: 5 Ocak 2026
-  → { "type": "exact", "exact": "2026-01-05", "from": null, "to": null, "text": null }
-
-- "5-7 Ocak arası" diyorsa:
-  → { "type": "range", "exact": null, "from": "2026-01-05", "to": "2026-01-07", "text": null }
-
-- "Ocak içinde bir gün" diyorsa:
-  → { "type": "unspecified", "exact": null, "from": null, "to": null, "text": "ocak içinde bir gün" }
-
---------------------
-TimeSpec (tüm saatler için)
---------------------
-JSON alan adı: TimeSpec
-Yapı:
-
-{
-  "type": "exact" | "range" | "after" | "before" | "unspecified",
-  "exact": "HH:MM" veya null,
-  "from": "HH:MM" veya null,
-  "to": "HH:MM" veya null,
-  "text": "kullanıcının serbest metni" veya null
-}
-
-Örnekler:
-- "Saat 15:30" diyorsa:
-  → { "type": "exact", "exact": "15:30", "from": null, "to": null, "text": null }
-
-- "Öğleden sonra" veya "akşam 5'ten sonra" diyorsa:
-  → { "type": "unspecified", "exact": null, "from": null, "to": null, "text": "öğleden sonra" }
-
---------------------
-FlightRequest
---------------------
-JSON alan adı: flight
-Yapı:
-
-{
-  "trip_type": "one_way" | "round_trip" | "multi_city",
-  "pnr": string veya null,
-  "airline_preference": string veya null,   // THY, Pegasus vb.
-  "cabin": "ECONOMY" | "BUSINESS" | "FIRST" | "PREMIUM_ECONOMY" veya null,
-  "legs": [ Leg, ... ],
-  "pax": {
-    "adult": int,
-    "child": int,
-    "infant": int
-  },
-  "baggage": {
-    "hand": int,
-    "hold": int
-  },
-  "currency": string veya null,     // TRY, EUR, USD...
-  "budget_total": number veya null,
-  "notes": string veya null,
-  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
-}
-
-Leg yapısı:
-
-{
-  "from": string veya null,    // Şehir veya havaalanı (örn: "IST", "SAW", "Istanbul")
-  "to": string veya null,      // Şehir veya havaalanı
-  "date": DateSpec,
-  "time": TimeSpec
-}
-
-Örnek tek yön uçuş:
-
-{
-  "type": "flight",
-  "flight": {
-    "trip_type": "one_way",
-    "pnr": null,
-    "airline_preference": "THY",
-    "cabin": "ECONOMY",
-    "legs": [
-      {
-        "from": "IST",
-        "to": "BER",
-        "date": { ... DateSpec ... },
-        "time": { ... TimeSpec ... }
-      }
-    ],
-    "pax": { "adult": 1, "child": 0, "infant": 0 },
-    "baggage": { "hand": 1, "hold": 0 },
-    "currency": "EUR",
-    "budget_total": null,
-    "notes": "mümkünse direkt uçuş",
-    "po_number": "DNZ12345"
-  },
-  "hotel": null,
-  "transfer": null
-}
-
---------------------
-HotelRequest
---------------------
-JSON alan adı: hotel
-Yapı:
-
-{
-  "city": string veya null,
-  "area": string veya null,            // semt/bölge
-  "date": {
-    "check_in": DateSpec,
-    "check_out": DateSpec
-  },
-  "nights": int veya null,
-  "rooms": int veya null,
-  "pax": {
-    "adult": int,
-    "child": int
-  },
-  "purpose": "business" | "leisure" | "mixed" veya null,
-  "theme": "city_center" | "sea_side" | "ski" | "conference" veya null,
-  "hotel_class": int veya null,        // 3, 4, 5
-  "budget_total": number veya null,
-  "currency": string veya null,
-  "notes": string veya null,
-  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
-}
-
---------------------
-TransferRequest
---------------------
-JSON alan adı: transfer
-Yapı:
-
-{
-  "direction": "arrival" | "departure" | "roundtrip" | "other" veya null,
-  "from": string veya null,
-  "to": string veya null,
-  "date": DateSpec,
-  "time": TimeSpec,
-  "pax": {
-    "adult": int,
-    "child": int,
-    "infant": int
-  },
-  "luggage_pieces": int veya null,
-  "notes": string veya null,
-  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
-}
-
---------------------
-Kurallar (çok önemli)
---------------------
-
-1. JSON DIŞINDA hiçbir şey yazma. Açıklama, yorum, metin KULLANMA.
-2. Bilmediğin veya mailde açık yazmayan alanları UYDURMA → o alanı null yap.
-3. Listeler boş olabilir (örn: legs: []), ama alan ADLARI her zaman şemadaki gibi olmalıdır.
-4. "from" ve "to" alanları JSON içinde tam olarak "from" ve "to" olarak yazılmalıdır (from_ kullanma).
-5. Eğer mailde hem uçak hem otel hem de transfer isteniyorsa, "requests" listesinde birden fazla obje kullan:
-   - Bir flight request,
-   - Bir hotel request,
-   - Bir transfer request.
-6. Sadece aşağıdaki gibi açık kelimeler geçiyorsa transfer isteği oluştur:
-    "transfer", "şoförlü araç", "karşılama", "karşılanma", "şuttle", "shuttle", "servis", "özel araç", "pickup", "drop-off", "ground transfer"
-7. Eğer cümlede “uçak”, “uçuş”, “flight” kelimeleri geçiyor ve güzergah “şehir ↔ havaalanı” olsa bile, bunu uçuş isteği olarak yorumla, transfer oluşturma.
-8. Transfer isteği, açıkça karayolu / araçla ulaşım için olmalı. Sadece “uçak saatleri rica edebilir miyiz” deniyorsa, bu uçuş talebidir, transfer değildir.
-
-E-posta içeriği:
----
-{body}
----
-"""
+# (mail_id, gövde hash'i) -> etiketlendi mi; tekrar çalıştırmada atlamak için
+INDEX_PATH = Path("data/train/labeled_emails.index.sqlite")
+# (model, prompt hash, normalize gövde) -> ham LLM cevabı
+CACHE_PATH = Path("data/train/llm_response_cache.sqlite")
+LLM_CACHE_TTL_DAYS = float(os.getenv("LLM_CACHE_TTL_DAYS", "90"))
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "512"))
+
+# Async mod ayarları
+LABEL_MODE = os.getenv("LABEL_MODE", "sync")
+LABEL_CONCURRENCY = int(os.getenv("LABEL_CONCURRENCY", "8"))
+LABEL_RPM = int(os.getenv("LABEL_RPM", "500"))
+LABEL_TPM = int(os.getenv("LABEL_TPM", "200000"))
+LABEL_MAX_RETRIES = int(os.getenv("LABEL_MAX_RETRIES", "5"))
+# >1 ise kısa mailler tek istekte paketlenir (sadece sync mod)
+LABEL_PACK_SIZE = int(os.getenv("LABEL_PACK_SIZE", "1"))
+# 1 ise gövdedeki e-posta / telefon / PNR OpenAI'ye gitmeden maskelenir.
+# Açıp kapatmak temiz gövde hash'ini değiştirir: index'teki mailler yeniden etiketlenir.
+LABEL_ANONYMIZE = os.getenv("LABEL_ANONYMIZE", "0") == "1"
+# Near-duplicate mailler (aynı talep farklı gruplara iletilmiş / ufak düzeltmeyle
+# tekrar gönderilmiş) etiketlenmez, kümenin ilk mailinin etiketi kopyalanır.
+# Varsayılan kapalı: --dedup / LABEL_DEDUP=1 ile açılır
+LABEL_DEDUP = os.getenv("LABEL_DEDUP", "0") == "1"
+
+@dataclass
+class LabelJob:
+    idx: int
+    mail_id: Optional[str]
+    subject: str
+    recv: Optional[str]
+    body_text: str
+    body_hash: str
 
 
 def build_body_text(msg: Dict[str, Any]) -> str:
     body = (msg.get("body") or {})
-    content_type = body.get("contentType", "html")
-    content = body.get("content", "") or ""
 
     # 1) HTML ise düz metne çevir
-    if content_type.lower() == "html":
-        plain = html_to_text(content)
-    else:
-        plain = content
-
     # 2) Thread içinden en anlamlı mail segmentini seç
-    best_segment = choose_best_segment(plain)
+    selection, _ = clean_body(body.get("contentType", "html"), body.get("content"))
+    best_segment = selection.text
 
     # 3) Maskele
-    # best_segment = anonymize_text(best_segment)
+    return mask_body_text(best_segment)
 
-    return best_segment
 
+def mask_body_text(text: str) -> str:
+    return anonymize_text(text) if LABEL_ANONYMIZE else text
 
-def call_openai(body_text: str) -> str:
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY is not set")
-
-    client = OpenAI(api_key=OPENAI_API_KEY)
 
-    prompt = PROMPT_TEMPLATE.replace("{body}", body_text)
+def chat_completion(messages: List[Dict[str, str]], mails: int = 1) -> str:
+    client = get_client()
 
     resp = client.chat.completions.create(
         model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "You are an assistant that extracts structured travel requests (flight, hotel, transfer) as JSON."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=messages,
         temperature=0.0,
     )
+    if resp.usage is not None:
+        USAGE_STATS.record(resp.usage, mails=mails)
     content = resp.choices[0].message.content
     return content
 
 
-def main():
+def call_openai(body_text: str) -> str:
+    return chat_completion(build_messages(body_text))
+
+
+def iter_label_jobs(store: RawStore, cleaned: Optional[CleanStore] = None) -> Iterator[LabelJob]:
+    """
+    Raw store'daki mailleri filtreleyip etiketlenecek olanları üretir.
+    (reply/forward konulu, hedef gruba gitmeyen ve çok kısa gövdeler atlanır)
+    Konu / alıcı filtresi sadece başlıklarla yapılır; gövde sadece filtreden
+    geçen mailler için okunup açılır. cleaned store'da güncel kaydı olan
+    mailler tekrar temizlenmez (bkz. labeling.clean_batch).
+    """
+    for idx, msg in enumerate(store.iter_headers(), start=1):
+        mail_id = msg.get("id")
+        subject = msg.get("subject")
+        recv = msg.get("receivedDateTime")
+
+        to_addrs = [r.get("address") or "" for r in msg.get("to", [])]
+        reason = header_skip_reason(subject, to_addrs)
+        if reason:
+            logger.info("Skipping mail %s (%d): %s '%s'", mail_id, idx, reason, subject)
+            continue
+
+        entry = cleaned.get(mail_id, msg.get("bodySha")) if cleaned is not None else None
+        if entry is not None:
+            body_text = mask_body_text(entry.text)
+        else:
+            msg["body"] = store.get_body(mail_id)
+            body_text = build_body_text(msg)
+
+        if len(body_text) < 40:
+            logger.info("Skipping mail %s (%d): body too short after block selection", mail_id, idx)
+            continue
+
+        yield LabelJob(
+            idx=idx,
+            mail_id=mail_id,
+            subject=subject,
+            recv=recv,
+            body_text=body_text,
+            body_hash=body_hash(body_text),
+        )
+
+
+def skip_labeled(jobs: Iterable[LabelJob], index: LabelIndex) -> Iterator[LabelJob]:
+    """Daha önce (aynı gövdeyle) etiketlenmiş mailleri atla."""
+    seen = set()
+    for job in jobs:
+        key = (job.mail_id or "", job.body_hash)
+        if key in index or key in seen:
+            logger.info("Skipping mail %s (%d): already labeled", job.mail_id, job.idx)
+            continue
+        seen.add(key)
+        yield job
+
+
+def split_near_duplicates(
+    jobs: Iterable[LabelJob],
+    dedup: NearDupIndex,
+    index: LabelIndex,
+    duplicates: List[Tuple[LabelJob, str]],
+) -> Iterator[LabelJob]:
+    """
+    Her maili near-duplicate indeksine ekler. Kümenin representative'i
+    etiketlenmek üzere aynen geçer; diğerleri (henüz etiketlenmemişlerse)
+    (job, representative id) olarak duplicates'e eklenir, etiketleri run
+    sonunda copy_duplicate_labels ile kopyalanır.
+    """
+    for job in jobs:
+        rep = dedup.assign(job.mail_id or "", job.body_hash, job.body_text)
+        if rep == (job.mail_id or ""):
+            yield job
+        elif (job.mail_id or "", job.body_hash) not in index:
+            logger.info("Mail %s (%d) is a near-duplicate of %s, label will be copied", job.mail_id, job.idx, rep)
+            duplicates.append((job, rep))
+
+
+def copy_duplicate_labels(duplicates: List[Tuple[LabelJob, str]], writer: "RecordWriter", out_path: Path) -> int:
+    """
+    Near-duplicate maillere representative'in kaydını dedup_of ile kopyalar.
+    Representative'i henüz etiketlenmemiş (veya kaydı hatalı) olanlar sonraki run'a kalır.
+    """
+    reps = {rep for _, rep in duplicates}
+    records: Dict[str, Dict[str, Any]] = {}
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("mail_id") in reps and not record.get("dedup_of") and not is_failed_record(record):
+                records[record["mail_id"]] = record
+
+    copied = 0
+    for job, rep in duplicates:
+        record = records.get(rep)
+        if record is None:
+            logger.info("Representative %s of mail %s is not labeled yet, skipping", rep, job.mail_id)
+            continue
+        writer.write(job, {
+            "mail_id": job.mail_id,
+            "subject": job.subject,
+            "receivedDateTime": job.recv,
+            "text": job.body_text,
+            "label": record.get("label"),
+            "review_needed": record.get("review_needed", False),
+            "error": record.get("error"),
+            "dedup_of": rep,
+        })
+        copied += 1
+    return copied
+
+
+def dedup_copies(out_path: Path, rep_ids: Iterable[str]) -> List[str]:
+    """Verilen representative'lerden dedup_of ile kopyalanmış kayıtların mail_id'leri."""
+    reps = set(rep_ids)
+    mail_ids: List[str] = []
+    if not out_path.exists():
+        return mail_ids
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("dedup_of") in reps and record.get("mail_id"):
+                mail_ids.append(record["mail_id"])
+    return mail_ids
+
+
+def stale_copies(out_path: Path, dedup: NearDupIndex) -> List[str]:
+    """
+    dedup_of'u mailin şu anki kümesini göstermeyen kopya kayıtların mail_id'leri
+    (representative'in gövdesi değişip küme yeniden dağıtıldıysa).
+    """
+    mail_ids: List[str] = []
+    if not out_path.exists():
+        return mail_ids
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            mail_id, rep = record.get("mail_id"), record.get("dedup_of")
+            if not mail_id or not rep:
+                continue
+            cluster = dedup.cluster_of(mail_id)
+            if cluster is not None and cluster != rep:
+                mail_ids.append(mail_id)
+    return mail_ids
+
+
+def resolve_duplicates(duplicates: List[Tuple[LabelJob, str]], dedup: NearDupIndex) -> List[Tuple[LabelJob, str]]:
+    """
+    Run sırasında kümesi değişen mailleri yeni representative'e yönlendirir;
+    kendi kümesinin representative'i olanlar sonraki run'da etiketlenir.
+    """
+    resolved = []
+    for job, _ in duplicates:
+        rep = dedup.cluster_of(job.mail_id or "")
+        if rep is not None and rep != (job.mail_id or ""):
+            resolved.append((job, rep))
+    return resolved
+
+
+def make_record(
+    job: LabelJob,
+    raw_json_str: Optional[str],
+    error: Optional[BaseException] = None,
+) -> Dict[str, Any]:
+    """
+    OpenAI cevabını (veya hatasını) labeled_emails.jsonl kaydına çevirir.
+    Parse edilemeyen / şemaya uymayan cevaplar review_needed=True olur.
+    """
+    parsed = None
+    if error is None:
+        try:
+            parsed = json.loads(raw_json_str)
+        except Exception as e:
+            error = e
+
+    if error is not None:
+        logger.error("OpenAI or JSON parse error for mail %s: %s", job.mail_id, error, exc_info=error)
+        return {
+            "mail_id": job.mail_id,
+            "subject": job.subject,
+            "receivedDateTime": job.recv,
+            "text": job.body_text,
+            "label": None,
+            "review_needed": True,
+            "error": str(error),
+        }
+
+    try:
+        EmailRequest.model_validate(parsed)
+        review_needed = False
+        error_msg = None
+    except ValidationError as ve:
+        logger.warning("Validation error for mail %s: %s", job.mail_id, ve)
+        review_needed = True
+        error_msg = str(ve)
+
+    return {
+        "mail_id": job.mail_id,
+        "subject": job.subject,
+        "receivedDateTime": job.recv,
+        "text": job.body_text,
+        "label": parsed,
+        "review_needed": review_needed,
+        "error": error_msg,
+    }
+
+
+class RecordWriter:
+    """
+    Kayıtları çıktı dosyasına yazar ve her kayıttan sonra progress index'i
+    günceller. Önce flush, sonra index: çökmede en fazla son satır tekrar taranır.
+    Etiketi olmayan hata kayıtları indekse eklenmez; bir sonraki run'da
+    tekrar denenirler.
+    """
+
+    def __init__(self, out_f: IO[str], index: LabelIndex) -> None:
+        self.out_f = out_f
+        self.index = index
+        self.written = 0
+
+    def write(self, job: LabelJob, record: Dict[str, Any]) -> None:
+        self.out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out_f.flush()
+        offset = os.fstat(self.out_f.fileno()).st_size
+        if is_failed_record(record):
+            self.index.advance(offset)
+        else:
+            self.index.add(job.mail_id, job.body_hash, offset)
+        self.written += 1
+
+
+# Packed istekten bölünen cevaplar farklı prompt'la üretildi: cache'te ayrı anahtarlarda
+PACKED_CACHE_PROMPT = fingerprint(SCHEMA_PROMPT, PACKED_PROMPT_TAIL)
+
+
+def open_cache() -> ResponseCache:
+    return ResponseCache(
+        CACHE_PATH,
+        namespace=fingerprint(OPENAI_MODEL, SYSTEM_PROMPT, PROMPT_TEMPLATE),
+        ttl_seconds=LLM_CACHE_TTL_DAYS * 86400,
+        max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+
+def cached_answer(
+    cache: Optional[ResponseCache],
+    job: LabelJob,
+    force_ids: AbstractSet[Optional[str]],
+    prompt: str = "",
+) -> Optional[str]:
+    """Cache'teki cevap; --force ile verilen mail'lerde cache okunmaz (yeni cevap üzerine yazılır)."""
+    if cache is None or job.mail_id in force_ids:
+        return None
+    return cache.get(job.body_text, prompt)
+
+
+def label_packed(jobs: List[LabelJob]) -> Optional[Dict[int, str]]:
+    """
+    Birden fazla kısa maili tek istekte etiketler. job.idx -> tek mail cevabı
+    döner; parse / validasyondan geçemeyenler sonuçta yer almaz. İstek
+    hata verirse None (mailler usage'da sayılmadı).
+    """
+    item_ids = [str(i) for i in range(1, len(jobs) + 1)]
+    logger.info("Labeling %d mails in one packed request: %s", len(jobs), ", ".join(str(j.mail_id) for j in jobs))
+    try:
+        raw = chat_completion(
+            build_packed_messages(list(zip(item_ids, (j.body_text for j in jobs)))),
+            mails=len(jobs),
+        )
+    except Exception as e:
+        logger.warning("Packed request failed, falling back to single-mail calls: %s", e)
+        return None
+
+    parts = split_packed_response(raw, item_ids)
+    return {job.idx: parts[item_id] for item_id, job in zip(item_ids, jobs) if item_id in parts}
+
+
+def label_sync(
+    jobs: Iterable[LabelJob],
+    writer: RecordWriter,
+    cache: Optional[ResponseCache] = None,
+    pack_size: int = 1,
+    force_ids: AbstractSet[Optional[str]] = frozenset(),
+) -> None:
+    for group in pack_jobs(jobs, pack_size):
+        results: Dict[int, str] = {}
+        todo: List[LabelJob] = []
+        for job in group:
+            raw_json_str = cached_answer(cache, job, force_ids)
+            if raw_json_str is None and pack_size > 1:
+                # Tek mail cevabı yoksa önceki packed run'ın cevabı
+                raw_json_str = cached_answer(cache, job, force_ids, PACKED_CACHE_PROMPT)
+            if raw_json_str is not None:
+                logger.info("Cache hit for mail %s (%d)", job.mail_id, job.idx)
+                results[job.idx] = raw_json_str
+            else:
+                todo.append(job)
+
+        packed = label_packed(todo) if len(todo) > 1 else None
+        if packed:
+            results.update(packed)
+            if cache is not None:
+                for job in todo:
+                    if is_json(packed.get(job.idx)):
+                        cache.put(job.body_text, packed[job.idx], PACKED_CACHE_PROMPT)
+
+        for job in group:
+            raw_json_str, error = results.get(job.idx), None
+            if raw_json_str is None:
+                logger.info("Labeling mail %s (%d): %s%s", job.mail_id, job.idx, job.subject,
+                            " (packed fallback)" if len(todo) > 1 else "")
+                try:
+                    # Packed istek başarılıysa mail orada zaten sayıldı
+                    raw_json_str = chat_completion(build_messages(job.body_text), mails=0 if packed is not None else 1)
+                except Exception as e:
+                    raw_json_str, error = None, e
+                if cache is not None and is_json(raw_json_str):
+                    cache.put(job.body_text, raw_json_str)
+            writer.write(job, make_record(job, raw_json_str, error))
+
+
+async def label_async(
+    jobs: Iterable[LabelJob],
+    writer: RecordWriter,
+    args: argparse.Namespace,
+    cache: Optional[ResponseCache] = None,
+    force_ids: AbstractSet[Optional[str]] = frozenset(),
+) -> None:
+    # Havuz en az eşzamanlı istek sayısı kadar bağlantı tutabilmeli
+    client = get_async_client(pool_size=max(args.concurrency, 1))
+    try:
+        async for job, raw_json_str, error in label_jobs_async(
+            jobs,
+            client,
+            OPENAI_MODEL,
+            concurrency=args.concurrency,
+            rpm=args.rpm,
+            tpm=args.tpm,
+            max_retries=args.max_retries,
+            cache=cache,
+            force_ids=force_ids,
+        ):
+            writer.write(job, make_record(job, raw_json_str, error))
+    finally:
+        await aclose_async_client()
+
+
+def label_batch(
+    jobs: Iterable[LabelJob],
+    writer: RecordWriter,
+    args: argparse.Namespace,
+    cache: Optional[ResponseCache] = None,
+    force_ids: AbstractSet[Optional[str]] = frozenset(),
+) -> None:
+    """
+    Offline toplu etiketleme (Batch API). Cache'te olanlar hemen yazılır,
+    kalanlar tek batch job olarak gönderilip sonuç gelene kadar poll edilir.
+    """
+    pending: List[LabelJob] = []
+    for job in jobs:
+        raw_json_str = cached_answer(cache, job, force_ids)
+        if raw_json_str is not None:
+            logger.info("Cache hit for mail %s (%d)", job.mail_id, job.idx)
+            writer.write(job, make_record(job, raw_json_str))
+        else:
+            pending.append(job)
+
+    logger.info("Sending %d mails to the Batch API", len(pending))
+    for job, raw_json_str, error in run_batch(pending, get_client(), OPENAI_MODEL, poll_seconds=args.batch_poll):
+        if cache is not None and is_json(raw_json_str):
+            cache.put(job.body_text, raw_json_str)
+        writer.write(job, make_record(job, raw_json_str, error))
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Label raw emails with OpenAI")
+    parser.add_argument("--mode", choices=("sync", "async", "batch"), default=LABEL_MODE,
+                        help="sync: tek tek, async: eşzamanlı istek havuzu, batch: offline Batch API")
+    parser.add_argument("--concurrency", type=int, default=LABEL_CONCURRENCY,
+                        help="async modda aynı anda en fazla kaç istek")
+    parser.add_argument("--rpm", type=int, default=LABEL_RPM, help="dakikalık istek limiti (0 = limitsiz)")
+    parser.add_argument("--tpm", type=int, default=LABEL_TPM, help="dakikalık token limiti (0 = limitsiz)")
+    parser.add_argument("--max-retries", type=int, default=LABEL_MAX_RETRIES,
+                        help="429/5xx için en fazla kaç tekrar")
+    parser.add_argument("--pack", type=int, default=LABEL_PACK_SIZE,
+                        help="sync modda kısa mailleri N'li paketler halinde tek istekte etiketle")
+    parser.add_argument("--batch-poll", type=float, default=BATCH_POLL_SECONDS,
+                        help="batch modda durum sorgulama aralığı (sn)")
+    parser.add_argument("--force", nargs="+", default=[], metavar="MAIL_ID",
+                        help="bu mail'lerin eski kayıtlarını silip yeniden etiketle")
+    parser.add_argument("--no-cache", action="store_true", help="LLM cevap cache'ini kullanma")
+    parser.add_argument("--dedup", action=argparse.BooleanOptionalAction, default=LABEL_DEDUP,
+                        help="near-duplicate mailleri tek sefer etiketle, etiketi kopyala")
+    args = parser.parse_args(argv)
+    if args.pack > 1 and args.mode != "sync":
+        parser.error("--pack is only supported in sync mode")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
+    args = parse_args(argv)
 
-    if not RAW_PATH.exists():
-        logger.error("Raw emails file not found: %s", RAW_PATH)
+    store = RawStore(RAW_DB_PATH)
+    migrate_legacy_jsonl(store)
+    if not len(store):
+        logger.error("Raw email store is empty: %s", RAW_DB_PATH)
+        store.close()
         return
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    with OUT_PATH.open("a", encoding="utf-8") as out_f:
-        with RAW_PATH.open("r", encoding="utf-8") as f:
-            for idx, line in enumerate(f, start=1):
-                line = line.strip()
-
-                if not line:
-                    continue
-                try:
-                    msg = json.loads(line)
-                except json.JSONDecodeError:
-                    logger.warning("Skipping invalid JSON line")
-                    continue
-
-                mail_id = msg.get("id")
-                subject = msg.get("subject")
-                subject_lower = subject.lower()
-                recv = msg.get("receivedDateTime")
+    # Açılışta önceki (çökmüş olabilecek) run'ın kuyruğu index'e işlenir
+    index = LabelIndex(INDEX_PATH, OUT_PATH)
+    logger.info("Label index: %d mails already labeled", len(index))
 
-                if subject_lower.startswith(RE_PREFIXES):
-                    logger.info("Skipping mail %s (%d): reply/forward subject '%s'", mail_id, idx, subject)
-                    continue                
+    if args.force:
+        # Representative yeniden etiketlenince ondan kopyalanan etiketler de yenilenmeli
+        copies = dedup_copies(OUT_PATH, args.force)
+        removed = index.remove([*args.force, *copies])
+        logger.info("--force: removed %d old records for %d mail ids (%d near-duplicate copies)",
+                    removed, len(args.force), len(copies))
 
-                to_addrs = [(r.get("address") or "").lower() for r in msg.get("to", [])]
-                has_target_group = any(
-                    addr.endswith(f"@{COMPANY_DOMAIN}") and any(group in addr for group in MAIL_GROUPS)
-                    for addr in to_addrs
-                )
+    cache = None if args.no_cache else open_cache()
 
-                if not has_target_group:
-                    logger.info("Skipping mail %s (%d): not sent to target groups", mail_id, idx)
-                    continue
+    # clean_batch önceden çalıştırıldıysa gövdeler oradan okunur
+    cleaned = CleanStore(CLEANED_DB_PATH) if CLEANED_DB_PATH.exists() else None
+    if cleaned is not None:
+        logger.info("Cleaned store: %d mails already cleaned", len(cleaned))
 
-                body_text = build_body_text(msg)
-
-                if len(body_text) < 40:
-                    logger.info("Skipping mail %s (%d): body too short after block selection", mail_id, idx)
-                    continue
-
-                logger.info("Labeling mail %s (%d): %s", mail_id, idx, subject)
-
-                try:
-                    raw_json_str = call_openai(body_text)
-                    parsed = json.loads(raw_json_str)
-                except Exception as e:
-                    logger.exception("OpenAI or JSON parse error for mail %s: %s", mail_id, e)
-                    record = {
-                        "mail_id": mail_id,
-                        "subject": subject,
-                        "receivedDateTime": recv,
-                        "text": body_text,
-                        "label": None,
-                        "review_needed": True,
-                        "error": str(e),
-                    }
-                    out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
-                    continue
-
-                try:
-                    EmailRequest.model_validate(parsed)
-                    review_needed = False
-                    error_msg = None
-                except ValidationError as ve:
-                    logger.warning("Validation error for mail %s: %s", mail_id, ve)
-                    review_needed = True
-                    error_msg = str(ve)
-
-                record = {
-                    "mail_id": mail_id,
-                    "subject": subject,
-                    "receivedDateTime": recv,
-                    "text": body_text,
-                    "label": parsed,
-                    "review_needed": review_needed,
-                    "error": error_msg,
-                }
-                out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    dedup = NearDupIndex(DEDUP_INDEX_PATH) if args.dedup else None
+    duplicates: List[Tuple[LabelJob, str]] = []
+    copied = 0
 
+    with OUT_PATH.open("a", encoding="utf-8") as out_f:
+        writer = RecordWriter(out_f, index)
+        jobs = iter_label_jobs(store, cleaned)
+        if dedup is not None:
+            jobs = split_near_duplicates(jobs, dedup, index, duplicates)
+        jobs = skip_labeled(jobs, index)
+        # --force verilen mail'ler cache'ten değil API'den yeniden etiketlenir
+        force_ids = frozenset(args.force)
+        if args.mode == "async":
+            asyncio.run(label_async(jobs, writer, args, cache, force_ids))
+        elif args.mode == "batch":
+            label_batch(jobs, writer, args, cache, force_ids)
+        else:
+            label_sync(jobs, writer, cache, pack_size=max(args.pack, 1), force_ids=force_ids)
+
+    if dedup is not None:
+        # Representative'i değişen kümelerden eski etiketle kopyalanmış kayıtlar
+        # silinir; bu run'da kuyruktaysa yeni representative'den, değilse
+        # sonraki run'da tekrar kopyalanır / etiketlenir
+        stale = stale_copies(OUT_PATH, dedup)
+        if stale:
+            removed = index.remove(stale)
+            logger.info("Removed %d stale near-duplicate copies of %d mails", removed, len(stale))
+        duplicates = resolve_duplicates(duplicates, dedup)
+    if duplicates:
+        with OUT_PATH.open("a", encoding="utf-8") as out_f:
+            copied = copy_duplicate_labels(duplicates, RecordWriter(out_f, index), OUT_PATH)
+
+    index.close()
+    if dedup is not None:
+        logger.info("Near-duplicate index: %d mails, %d labels copied", len(dedup), copied)
+        dedup.close()
+    if cleaned is not None:
+        cleaned.close()
+    store.close()
+    close_client()
+    if cache is not None:
+        logger.info("LLM response cache: %s", cache.stats.summary())
+        cache.close()
+    logger.info("Labeled %d new mails (%d copied from near-duplicates)", writer.written, copied)
+    logger.info("OpenAI HTTP pool: %s", POOL_STATS.summary())
+    logger.info("Token usage: %s", USAGE_STATS.summary())
     logger.info("Labeled emails written to %s", OUT_PATH)
 
 if __name__ == "__main__":
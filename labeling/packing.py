@@ -0,0 +1,104 @@
+import os
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from .prompts import PROMPT_TEMPLATE, SYSTEM_PROMPT
+from .schema import EmailRequest
+
+logger = logging.getLogger(__name__)
+
+# Sadece kısa gövdeler paketlenir; uzun mailler tek başına gönderilir
+PACK_MAX_BODY_CHARS = int(os.getenv("LABEL_PACK_MAX_BODY_CHARS", "1500"))
+
+# Şema açıklaması tek mail prompt'uyla aynı, sadece sondaki "E-posta içeriği" kısmı değişiyor
+SCHEMA_PROMPT = PROMPT_TEMPLATE.split("E-posta içeriği:")[0]
+
+PACKED_PROMPT_TAIL = """
+--------------------
+Çoklu e-posta (çok önemli)
+--------------------
+
+Aşağıda BİRDEN FAZLA e-posta var. Her biri [[MAIL <id>]] ile başlıyor ve [[/MAIL]] ile bitiyor.
+
+- Her e-postayı AYRI değerlendir, bir e-postadaki bilgiyi başka bir e-postanın çıktısına taşıma.
+- Her e-posta için yukarıdaki şemaya uygun {"requests": [...]} objesini üret.
+- Çıktıyı SADECE şu formatta döndür, her id için tam olarak bir item olsun:
+
+{
+  "items": [
+    { "id": "<id>", "result": { "requests": [ ... ] } }
+  ]
+}
+
+E-postalar:
+{mails}
+"""
+
+
+def build_packed_messages(items: Sequence[Tuple[str, str]]) -> List[Dict[str, str]]:
+    """items: (id, temiz gövde) çiftleri"""
+    mails = "\n".join(f"[[MAIL {item_id}]]\n{body}\n[[/MAIL]]" for item_id, body in items)
+    prompt = SCHEMA_PROMPT + PACKED_PROMPT_TAIL.replace("{mails}", mails)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def split_packed_response(raw: str, item_ids: Sequence[str]) -> Dict[str, str]:
+    """
+    Packed cevabı id -> tek mail cevabı (JSON string) olarak böler.
+    Sadece parse edilen VE EmailRequest şemasına uyan item'lar döner;
+    eksik / bozuk olanlar çağıran tarafta tek mail isteğiyle tekrar denenir.
+    """
+    try:
+        parsed = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        logger.warning("Packed response is not valid JSON: %s", e)
+        return {}
+
+    items = parsed.get("items") if isinstance(parsed, dict) else None
+    if not isinstance(items, list):
+        logger.warning("Packed response has no 'items' list")
+        return {}
+
+    wanted = set(item_ids)
+    results: Dict[str, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = str(item.get("id"))
+        result = item.get("result")
+        if item_id not in wanted or item_id in results:
+            continue
+        try:
+            EmailRequest.model_validate(result)
+        except ValidationError as ve:
+            logger.warning("Packed item %s failed validation: %s", item_id, ve)
+            continue
+        results[item_id] = json.dumps(result, ensure_ascii=False)
+    return results
+
+
+def pack_jobs(jobs: Iterable[Any], pack_size: int, max_body_chars: int = PACK_MAX_BODY_CHARS) -> Iterator[List[Any]]:
+    """
+    Ardışık kısa job'ları en fazla pack_size'lık gruplara toplar; uzun gövdeli
+    job'lar tek elemanlı grup olarak geçer. Sıra korunur.
+    """
+    group: List[Any] = []
+    for job in jobs:
+        if len(job.body_text) > max_body_chars:
+            if group:
+                yield group
+                group = []
+            yield [job]
+            continue
+        group.append(job)
+        if len(group) >= pack_size:
+            yield group
+            group = []
+    if group:
+        yield group
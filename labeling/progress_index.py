@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def is_failed_record(record: Dict[str, Any]) -> bool:
+    """
+    OpenAI hatası / tükenen retry / batch hatası yüzünden etiketi olmayan kayıt.
+    Index'e girmez, bir sonraki run'da tekrar denenir. Şemaya uymayan ama
+    etiketi olan kayıtlar (review_needed) etiketlenmiş sayılır.
+    """
+    return record.get("label") is None
+
+
+class LabelIndex:
+    """
+    labeled_emails.jsonl için kalıcı (mail_id, temiz gövde hash'i) indeksi.
+
+    - Anahtarlar açılışta belleğe alınır, kontrol O(1).
+    - Etiketi olmayan hata kayıtları (bkz. is_failed_record) indekse girmez.
+    - Her kayıttan sonra çıktı dosyasının boyutu (offset) da saklanır. Run
+      çökerse bir sonraki açılışta sadece offset'ten sonraki satırlar taranır,
+      yarım kalmış son satır kesilir; böylece kaldığı yerden devam eder.
+    """
+
+    def __init__(self, path: Path, out_path: Path) -> None:
+        self.path = Path(path)
+        self.out_path = Path(out_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS labeled ("
+            " mail_id TEXT NOT NULL,"
+            " body_hash TEXT NOT NULL,"
+            " PRIMARY KEY (mail_id, body_hash))"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+        self._keys: Set[Tuple[str, str]] = set(
+            self._conn.execute("SELECT mail_id, body_hash FROM labeled")
+        )
+        self._sync_with_output()
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _get_offset(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'out_offset'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _set_offset(self, offset: int) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('out_offset', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(offset),),
+        )
+
+    def _clear(self) -> None:
+        self._conn.execute("DELETE FROM labeled")
+        self._keys.clear()
+
+    def _sync_with_output(self) -> None:
+        if not self.out_path.exists():
+            if self._keys:
+                logger.warning("Output %s is missing, clearing label index", self.out_path)
+            self._clear()
+            self._set_offset(0)
+            self._conn.commit()
+            return
+
+        size = self.out_path.stat().st_size
+        offset = self._get_offset()
+        if size < offset:
+            logger.warning("Output %s shrank since last run, rebuilding label index", self.out_path)
+            self._clear()
+            offset = 0
+
+        if size > offset:
+            recovered = 0
+            with self.out_path.open("rb+") as f:
+                f.seek(offset)
+                pos = offset
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        # Çökme sırasında yarım yazılmış satır: kes
+                        logger.warning("Truncating partial record at byte %d of %s", pos, self.out_path)
+                        f.truncate(pos)
+                        break
+                    pos += len(raw)
+                    try:
+                        rec = json.loads(raw)
+                    except json.JSONDecodeError:
+                        continue
+                    if is_failed_record(rec):
+                        continue
+                    key = (rec.get("mail_id") or "", body_hash(rec.get("text") or ""))
+                    if key not in self._keys:
+                        self._insert(key)
+                        recovered += 1
+            if recovered:
+                logger.info("Recovered %d labeled records from %s", recovered, self.out_path)
+            offset = pos
+
+        self._set_offset(offset)
+        self._conn.commit()
+
+    def _insert(self, key: Tuple[str, str]) -> None:
+        self._conn.execute("INSERT OR IGNORE INTO labeled (mail_id, body_hash) VALUES (?, ?)", key)
+        self._keys.add(key)
+
+    def add(self, mail_id: Optional[str], hash_: str, out_offset: int) -> None:
+        """Kayıt çıktı dosyasına yazılıp flush edildikten SONRA çağrılmalı."""
+        self._insert((mail_id or "", hash_))
+        self._set_offset(out_offset)
+        self._conn.commit()
+
+    def advance(self, out_offset: int) -> None:
+        """İndekslenmeyen (hata) kaydı yazıldıktan sonra sadece offset'i ilerletir."""
+        self._set_offset(out_offset)
+        self._conn.commit()
+
+    def remove(self, mail_ids: Iterable[str]) -> int:
+        """
+        Verilen mail'lerin kayıtlarını hem çıktı dosyasından hem indeksten siler
+        (--force ile yeniden etiketlemek için). Silinen satır sayısını döner.
+        """
+        ids = set(mail_ids)
+        removed = 0
+        if self.out_path.exists():
+            tmp_path = self.out_path.with_suffix(self.out_path.suffix + ".tmp")
+            with self.out_path.open("r", encoding="utf-8") as src, tmp_path.open("w", encoding="utf-8") as dst:
+                for line in src:
+                    try:
+                        mail_id = json.loads(line).get("mail_id")
+                    except json.JSONDecodeError:
+                        mail_id = None
+                    if mail_id in ids:
+                        removed += 1
+                        continue
+                    dst.write(line)
+            os.replace(tmp_path, self.out_path)
+
+        self._conn.executemany("DELETE FROM labeled WHERE mail_id = ?", [(i,) for i in ids])
+        self._keys = {k for k in self._keys if k[0] not in ids}
+        self._set_offset(self.out_path.stat().st_size if self.out_path.exists() else 0)
+        self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,218 @@
+from typing import Dict, List
+
+SYSTEM_PROMPT = "You are an assistant that extracts structured travel requests (flight, hotel, transfer) as JSON."
+
+PROMPT_TEMPLATE = """
+Aşağıda bir uçuş / otel / transfer talebi e-postası var.
+
+Bu e-postadan aşağıdaki JSON şemasına UYGUN bir çıktı üret.
+
+Genel şema:
+
+{
+  "requests": [
+    {
+      "type": "flight" | "hotel" | "transfer",
+      "flight": FlightRequest veya null,
+      "hotel": HotelRequest veya null,
+      "transfer": TransferRequest veya null
+    }
+  ]
+}
+
+Her request için:
+- type = "flight" ise: flight doldur, hotel ve transfer = null
+- type = "hotel" ise: hotel doldur, flight ve transfer = null
+- type = "transfer" ise: transfer doldur, flight ve hotel = null
+
+Aşağıda her tip için kullanılacak alanlar detaylı olarak verilmiştir.
+
+--------------------
+DateSpec (tüm tarihler için)
+--------------------
+JSON alan adı: DateSpec
+Yapı:
+
+{
+  "type": "exact" | "range" | "after" | "before" | "unspecified",
+  "exact": "YYYY-MM-DD" veya null,
+  "from": "YYYY-MM-DD" veya null,
+  "to": "YYYY-MM-DD" veya null,
+  "text": "kullanıcının serbest metni" veya null
+}
+
+Örnekler:
+- Kullanıcı net bir tarih veriyorsa: 5 Ocak 2026
+  → { "type": "exact", "exact": "2026-01-05", "from": null, "to": null, "text": null }
+
+- "5-7 Ocak arası" diyorsa:
+  → { "type": "range", "exact": null, "from": "2026-01-05", "to": "2026-01-07", "text": null }
+
+- "Ocak içinde bir gün" diyorsa:
+  → { "type": "unspecified", "exact": null, "from": null, "to": null, "text": "ocak içinde bir gün" }
+
+--------------------
+TimeSpec (tüm saatler için)
+--------------------
+JSON alan adı: TimeSpec
+Yapı:
+
+{
+  "type": "exact" | "range" | "after" | "before" | "unspecified",
+  "exact": "HH:MM" veya null,
+  "from": "HH:MM" veya null,
+  "to": "HH:MM" veya null,
+  "text": "kullanıcının serbest metni" veya null
+}
+
+Örnekler:
+- "Saat 15:30" diyorsa:
+  → { "type": "exact", "exact": "15:30", "from": null, "to": null, "text": null }
+
+- "Öğleden sonra" veya "akşam 5'ten sonra" diyorsa:
+  → { "type": "unspecified", "exact": null, "from": null, "to": null, "text": "öğleden sonra" }
+
+--------------------
+FlightRequest
+--------------------
+JSON alan adı: flight
+Yapı:
+
+{
+  "trip_type": "one_way" | "round_trip" | "multi_city",
+  "pnr": string veya null,
+  "airline_preference": string veya null,   // THY, Pegasus vb.
+  "cabin": "ECONOMY" | "BUSINESS" | "FIRST" | "PREMIUM_ECONOMY" veya null,
+  "legs": [ Leg, ... ],
+  "pax": {
+    "adult": int,
+    "child": int,
+    "infant": int
+  },
+  "baggage": {
+    "hand": int,
+    "hold": int
+  },
+  "currency": string veya null,     // TRY, EUR, USD...
+  "budget_total": number veya null,
+  "notes": string veya null,
+  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
+}
+
+Leg yapısı:
+
+{
+  "from": string veya null,    // Şehir veya havaalanı (örn: "IST", "SAW", "Istanbul")
+  "to": string veya null,      // Şehir veya havaalanı
+  "date": DateSpec,
+  "time": TimeSpec
+}
+
+Örnek tek yön uçuş:
+
+{
+  "type": "flight",
+  "flight": {
+    "trip_type": "one_way",
+    "pnr": null,
+    "airline_preference": "THY",
+    "cabin": "ECONOMY",
+    "legs": [
+      {
+        "from": "IST",
+        "to": "BER",
+        "date": { ... DateSpec ... },
+        "time": { ... TimeSpec ... }
+      }
+    ],
+    "pax": { "adult": 1, "child": 0, "infant": 0 },
+    "baggage": { "hand": 1, "hold": 0 },
+    "currency": "EUR",
+    "budget_total": null,
+    "notes": "mümkünse direkt uçuş",
+    "po_number": "DNZ12345"
+  },
+  "hotel": null,
+  "transfer": null
+}
+
+--------------------
+HotelRequest
+--------------------
+JSON alan adı: hotel
+Yapı:
+
+{
+  "city": string veya null,
+  "area": string veya null,            // semt/bölge
+  "date": {
+    "check_in": DateSpec,
+    "check_out": DateSpec
+  },
+  "nights": int veya null,
+  "rooms": int veya null,
+  "pax": {
+    "adult": int,
+    "child": int
+  },
+  "purpose": "business" | "leisure" | "mixed" veya null,
+  "theme": "city_center" | "sea_side" | "ski" | "conference" veya null,
+  "hotel_class": int veya null,        // 3, 4, 5
+  "budget_total": number veya null,
+  "currency": string veya null,
+  "notes": string veya null,
+  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
+}
+
+--------------------
+TransferRequest
+--------------------
+JSON alan adı: transfer
+Yapı:
+
+{
+  "direction": "arrival" | "departure" | "roundtrip" | "other" veya null,
+  "from": string veya null,
+  "to": string veya null,
+  "date": DateSpec,
+  "time": TimeSpec,
+  "pax": {
+    "adult": int,
+    "child": int,
+    "infant": int
+  },
+  "luggage_pieces": int veya null,
+  "notes": string veya null,
+  "po_number": müşterinin satın yada talep numarası varsa string yoksa null
+}
+
+--------------------
+Kurallar (çok önemli)
+--------------------
+
+1. JSON DIŞINDA hiçbir şey yazma. Açıklama, yorum, metin KULLANMA.
+2. Bilmediğin veya mailde açık yazmayan alanları UYDURMA → o alanı null yap.
+3. Listeler boş olabilir (örn: legs: []), ama alan ADLARI her zaman şemadaki gibi olmalıdır.
+4. "from" ve "to" alanları JSON içinde tam olarak "from" ve "to" olarak yazılmalıdır (from_ kullanma).
+5. Eğer mailde hem uçak hem otel hem de transfer isteniyorsa, "requests" listesinde birden fazla obje kullan:
+   - Bir flight request,
+   - Bir hotel request,
+   - Bir transfer request.
+6. Sadece aşağıdaki gibi açık kelimeler geçiyorsa transfer isteği oluştur:
+    "transfer", "şoförlü araç", "karşılama", "karşılanma", "şuttle", "shuttle", "servis", "özel araç", "pickup", "drop-off", "ground transfer"
+7. Eğer cümlede “uçak”, “uçuş”, “flight” kelimeleri geçiyor ve güzergah “şehir ↔ havaalanı” olsa bile, bunu uçuş isteği olarak yorumla, transfer oluşturma.
+8. Transfer isteği, açıkça karayolu / araçla ulaşım için olmalı. Sadece “uçak saatleri rica edebilir miyiz” deniyorsa, bu uçuş talebidir, transfer değildir.
+
+E-posta içeriği:
+---
+{body}
+---
+"""
+
+
+def build_messages(body_text: str) -> List[Dict[str, str]]:
+    prompt = PROMPT_TEMPLATE.replace("{body}", body_text)
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
@@ -0,0 +1,180 @@
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*parts: str) -> str:
+    """Prompt şablonları vb. için kısa, sabit bir hash."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def normalize_body(text: str) -> str:
+    """Sadece boşluk farkı olan gövdeler aynı anahtarı alsın."""
+    return " ".join(text.split())
+
+
+def is_json(value: Optional[str]) -> bool:
+    """Sadece parse edilebilen cevaplar cache'lenir; bozuk cevap tekrar denensin."""
+    if not value:
+        return False
+    try:
+        json.loads(value)
+    except ValueError:
+        return False
+    return True
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evicted: int = 0
+    stored: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} hit_rate={self.hit_rate:.1%} "
+            f"stored={self.stored} expired={self.expired} evicted={self.evicted}"
+        )
+
+
+class ResponseCache:
+    """
+    Disk üzerinde (SQLite) LLM cevap cache'i.
+
+    Anahtar = sha256(namespace, normalize edilmiş gövde). namespace model adı +
+    prompt şablonu hash'inden oluşur; prompt değişirse eski kayıtlar kendiliğinden
+    kullanılmaz olur ve LRU ile zamanla silinir. Aynı model için farklı bir
+    prompt'la (ör. packed istek) üretilen cevaplar get / put'a verilen prompt
+    hash'iyle ayrı anahtarlarda tutulur.
+
+    - ttl_seconds > 0 ise daha eski kayıtlar miss sayılıp silinir.
+    - Toplam boyut max_bytes'ı geçerse en uzun süredir okunmayanlar silinir.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        namespace: str,
+        ttl_seconds: float = 0,
+        max_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        self.path = Path(path)
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+        self._purge_expired()
+        row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._total_bytes = int(row[0])
+
+    def key_for(self, body_text: str, prompt: str = "") -> str:
+        if prompt:
+            return fingerprint(self.namespace, prompt, normalize_body(body_text))
+        return fingerprint(self.namespace, normalize_body(body_text))
+
+    def _purge_expired(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cur = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        self._conn.commit()
+        if cur.rowcount:
+            self.stats.expired += cur.rowcount
+            logger.info("Purged %d expired cache entries", cur.rowcount)
+
+    def get(self, body_text: str, prompt: str = "") -> Optional[str]:
+        key = self.key_for(body_text, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+
+            value, size, created_at = row
+            if self.ttl_seconds > 0 and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= size
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats.hits += 1
+            return value
+
+    def put(self, body_text: str, value: str, prompt: str = "") -> None:
+        key = self.key_for(body_text, prompt)
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self.stats.stored += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        # Her seferinde tek kayıt silmek yerine %90 seviyesine kadar in
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if self._total_bytes - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._total_bytes -= freed
+        self.stats.evicted += len(victims)
+        logger.debug("Evicted %d cache entries (%d bytes)", len(victims), freed)
+
+    def close(self) -> None:
+        self._conn.close()
@@ -2,7 +2,9 @@ import json
 from pathlib import Path
 
 import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+from inference.cache import INFER_CACHE_MB, CachedExtractor
+from inference.extractor import Seq2SeqExtractor
 
 
 # ==============================
@@ -19,50 +21,24 @@ MAX_OUTPUT_LENGTH = 256
 
 
 @st.cache_resource
-def load_model_and_tokenizer():
+def load_extractor() -> CachedExtractor:
     if isinstance(MODEL_DIR, Path) and not MODEL_DIR.exists():
         raise RuntimeError(f"Model klasörü bulunamadı: {MODEL_DIR}")
     elif isinstance(MODEL_DIR, str):
         st.info(f"Huggingface Hub'dan model indiriliyor: {MODEL_DIR} (ilk seferde biraz zaman alabilir)")
 
-    tokenizer = AutoTokenizer.from_pretrained(str(MODEL_DIR))
-    model = AutoModelForSeq2SeqLM.from_pretrained(str(MODEL_DIR))
-
-    # padding ayarı (gerekirse)
-    if tokenizer.pad_token is None:
-        tokenizer.pad_token = tokenizer.eos_token
-        model.config.pad_token_id = tokenizer.pad_token_id
-
-    return tokenizer, model
-
-
-def run_inference(mail_body: str) -> str:
-    tokenizer, model = load_model_and_tokenizer()
-
-    instruction = (
-        "Aşağıda bir seyahat talebi e-postasının gövdesi var. "
-        "Bu metinden sadece geçerli JSON formatında flight/hotel/transfer "
-        "taleplerini çıkar. JSON dışında hiçbir şey yazma."
+    # Prompt eğitimdeki formatla aynı, sabit önek bir kez tokenize ediliyor;
+    # aynı mail tekrar çözümlenirse sonuç LRU cache'ten geliyor
+    extractor = Seq2SeqExtractor(
+        model_dir=str(MODEL_DIR),
+        max_input_length=MAX_INPUT_LENGTH,
+        max_output_length=MAX_OUTPUT_LENGTH,
     )
+    return CachedExtractor(extractor, max_bytes=int(INFER_CACHE_MB * 1024 * 1024))
 
-    prompt = instruction + "\n\nE-posta gövdesi:\n" + mail_body.strip()
 
-    inputs = tokenizer(
-        [prompt],
-        return_tensors="pt",
-        truncation=True,
-        max_length=MAX_INPUT_LENGTH,
-    )
-
-    outputs = model.generate(
-        **inputs,
-        max_length=MAX_OUTPUT_LENGTH,
-        num_beams=4,
-        early_stopping=True,
-    )
-
-    text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    return text
+def run_inference(mail_body: str) -> str:
+    return load_extractor().extract([mail_body])[0].raw
 
 def try_parse_json(text: str):
     try:
@@ -140,5 +116,11 @@ if run_button:
         else:
             st.error("JSON parse edilemedi:")
             st.code(err)
+
+        cache = load_extractor().summary()
+        st.caption(
+            f"Sonuç cache'i: {cache['entries']} kayıt, {cache['mb']} / {cache['max_mb']} MB, "
+            f"hit rate {cache['hit_rate']:.0%} ({cache['hits']} hit / {cache['misses']} miss)"
+        )
 else:
     st.info("Sol taraftaki metni düzenleyip **📤 Çözümle** butonuna basabilirsin.")
@@ -0,0 +1,42 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Testler proje kökünden paket olarak import ediyor (labeling, inference, ...)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from email_ingestion import graph_client as graph_client_module  # noqa: E402
+from email_ingestion import transport as transport_module  # noqa: E402
+from email_ingestion.config import GraphConfig  # noqa: E402
+from email_ingestion.folder_cache import FolderCache  # noqa: E402
+from email_ingestion.graph_client import GraphEmailClient  # noqa: E402
+
+from fake_graph import FakeGraph  # noqa: E402
+
+# Model yükleyen elle çalıştırılan script, pytest testi değil
+collect_ignore = ["simple_test.py"]
+
+
+@pytest.fixture
+def fake_graph():
+    server = FakeGraph().start()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def graph_client(fake_graph, monkeypatch):
+    """Sahte Graph'a bağlı client (token ve Graph URL'leri lokal sunucuya yönlenir)."""
+    monkeypatch.setattr(graph_client_module, "GRAPH_BASE", fake_graph.base_url)
+    monkeypatch.setattr(transport_module, "TOKEN_URL_TEMPLATE", fake_graph.root + "/{tenant_id}/oauth2/v2.0/token")
+    cfg = GraphConfig(
+        tenant_id="tenant",
+        client_id="client",
+        client_secret="secret",
+        user_id="u",
+        mail_folder_display_name="TrainMails",
+    )
+    client = GraphEmailClient(cfg, folder_cache=FolderCache(None))
+    yield client
+    client.close()
@@ -0,0 +1,245 @@
+# test/fake_graph.py
+"""
+Testler (ve elle deneme) için lokal sahte Microsoft Graph endpoint'i.
+
+POST /{tenant}/oauth2/v2.0/token             -> "tok-N" access token
+GET  /v1.0/users/{u}/mailFolders[/inbox/childFolders]
+GET  /v1.0/users/{u}/mailFolders/{fid}/messages        ($top / $skip sayfalama)
+GET  /v1.0/users/{u}/mailFolders/{fid}/messages/delta  (since=<versiyon> deltaLink'i)
+POST /v1.0/$batch                            -> alt istekler /users/{u}/messages/{id}
+
+Mesajlar klasör id'si altında tutulur; her ekleme / silme versiyonu bir
+artırır, delta sorgusu since'ten sonraki değişiklikleri (silinenler
+{"id", "@removed"} olarak) döner. $select verilirse sadece o alanlar döner.
+fail_after_gets kadar başarılı mesaj GET'inden sonraki istek 500 döner
+(yarıda kalan sayfalama), batch_throttle kadar $batch alt isteği 429 alır.
+
+Elle kullanım:
+    python test/fake_graph.py --port 8002
+"""
+
+import re
+import json
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_FOLDERS_RE = re.compile(r"^/v1\.0/users/([^/]+)/mailFolders(/inbox/childFolders)?$")
+_MESSAGES_RE = re.compile(r"^/v1\.0/users/([^/]+)/mailFolders/([^/]+)/messages(/delta)?$")
+_BATCH_ITEM_RE = re.compile(r"^/users/([^/]+)/messages/([^?]+)(?:\?(.*))?$")
+
+
+def make_message(msg_id: str, subject: str = "Uçuş talebi", to: str = "booking@julesverne.com.tr",
+                 received: str = "2025-01-01T00:00:00Z", content: str = "<p>Merhaba</p>") -> Dict[str, Any]:
+    return {
+        "id": msg_id,
+        "internetMessageId": f"<{msg_id}@example.com>",
+        "subject": subject,
+        "bodyPreview": content[:20],
+        "body": {"contentType": "html", "content": content},
+        "from": {"emailAddress": {"address": "customer@example.com"}},
+        "toRecipients": [{"emailAddress": {"address": to}}],
+        "ccRecipients": [],
+        "receivedDateTime": received,
+    }
+
+
+def _select(msg: Dict[str, Any], select: Optional[str]) -> Dict[str, Any]:
+    if not select or "@removed" in msg:
+        return dict(msg)
+    fields = set(select.split(",")) | {"id"}
+    return {k: v for k, v in msg.items() if k in fields}
+
+
+class FakeGraph(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, page_size: int = 2) -> None:
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.page_size = page_size
+        # display name -> folder id; child=True ise Inbox altında
+        self.folders: List[Dict[str, Any]] = [{"id": "F-train", "displayName": "TrainMails", "child": True}]
+        # folder id -> mail id -> mesaj
+        self.messages: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # folder id -> (versiyon, mesaj veya @removed kaydı)
+        self.changes: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        self.version = 0
+        self.token_calls = 0
+        # Gelen isteklerin path'leri (query dahil) ve $batch istek büyüklükleri
+        self.requests: List[str] = []
+        self.batch_sizes: List[int] = []
+        self.fail_after_gets: Optional[int] = None
+        self.batch_throttle = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.root}/v1.0"
+
+    def start(self) -> "FakeGraph":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def add_message(self, msg: Dict[str, Any], folder_id: str = "F-train") -> None:
+        with self.lock:
+            self.version += 1
+            self.messages.setdefault(folder_id, {})[msg["id"]] = msg
+            self.changes.setdefault(folder_id, []).append((self.version, msg))
+
+    def remove_message(self, msg_id: str, folder_id: str = "F-train") -> None:
+        with self.lock:
+            self.version += 1
+            self.messages.get(folder_id, {}).pop(msg_id, None)
+            self.changes.setdefault(folder_id, []).append((self.version, {"id": msg_id, "@removed": {"reason": "deleted"}}))
+
+    def list_folders(self, children_only: bool) -> List[Dict[str, Any]]:
+        return [
+            {"id": f["id"], "displayName": f["displayName"]}
+            for f in self.folders if f.get("child") or not children_only
+        ]
+
+    def list_messages(self, folder_id: str, delta: bool, query: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if folder_id not in {f["id"] for f in self.folders}:
+                return None
+            if delta:
+                since = int(query.get("since", 0))
+                latest: Dict[str, Dict[str, Any]] = {}
+                for version, msg in self.changes.get(folder_id, []):
+                    if version > since:
+                        latest.pop(msg["id"], None)
+                        latest[msg["id"]] = msg
+                items = list(latest.values())
+            else:
+                items = sorted(self.messages.get(folder_id, {}).values(), key=lambda m: m["receivedDateTime"], reverse=True)
+            version = self.version
+
+        skip = int(query.get("$skip", 0))
+        # Sunucu tarafı sayfa sınırı ($top daha büyük olsa da)
+        top = min(int(query.get("$top", self.page_size)), self.page_size)
+        select = query.get("$select")
+        page = items[skip:skip + top]
+        result: Dict[str, Any] = {"value": [_select(msg, select) for msg in page]}
+        link_query = {k: v for k, v in query.items() if k not in ("$skip", "since")}
+        if skip + top < len(items):
+            next_query = {**link_query, "$skip": skip + top}
+            if delta:
+                next_query["since"] = query.get("since", 0)
+            result["@odata.nextLink"] = f"{self.base_url}/users/u/mailFolders/{folder_id}/messages" \
+                + ("/delta" if delta else "") + "?" + urlencode(next_query)
+        elif delta:
+            result["@odata.deltaLink"] = f"{self.base_url}/users/u/mailFolders/{folder_id}/messages/delta?" \
+                + urlencode({**link_query, "since": version})
+        return result
+
+    def batch(self, requests_: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self.lock:
+            self.batch_sizes.append(len(requests_))
+        responses = []
+        for item in requests_:
+            match = _BATCH_ITEM_RE.match(item["url"])
+            msg_id = unquote(match.group(2)) if match else ""
+            query = dict(parse_qsl(match.group(3) or "")) if match else {}
+            with self.lock:
+                throttled = self.batch_throttle > 0
+                if throttled:
+                    self.batch_throttle -= 1
+                msg = next((m[msg_id] for m in self.messages.values() if msg_id in m), None)
+            if throttled:
+                responses.append({"id": item["id"], "status": 429, "headers": {"Retry-After": "0"},
+                                  "body": {"error": {"code": "TooManyRequests"}}})
+            elif msg is None:
+                responses.append({"id": item["id"], "status": 404, "body": {"error": {"code": "ErrorItemNotFound"}}})
+            else:
+                responses.append({"id": item["id"], "status": 200, "body": _select(msg, query.get("$select"))})
+        # Graph alt cevapları sırasız dönebilir
+        return {"responses": list(reversed(responses))}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeGraph
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Any) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        self.server.requests.append(f"POST {self.path}")
+        if self.path.endswith("/oauth2/v2.0/token"):
+            with self.server.lock:
+                self.server.token_calls += 1
+                token = f"tok-{self.server.token_calls}"
+            self._send_json(200, {"access_token": token, "expires_in": 3599, "token_type": "Bearer"})
+        elif self.path == "/v1.0/$batch":
+            self._send_json(200, self.server.batch(json.loads(body)["requests"]))
+        else:
+            self._send_json(404, {"error": {"code": "NotFound", "path": self.path}})
+
+    def do_GET(self) -> None:
+        self.server.requests.append(f"GET {self.path}")
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        match = _FOLDERS_RE.match(url.path)
+        if match:
+            self._send_json(200, {"value": self.server.list_folders(bool(match.group(2)))})
+            return
+        match = _MESSAGES_RE.match(url.path)
+        if match:
+            with self.server.lock:
+                fail = self.server.fail_after_gets
+                if fail is not None:
+                    self.server.fail_after_gets = fail - 1
+            if fail == 0:
+                self._send_json(500, {"error": {"code": "InternalServerError"}})
+                return
+            result = self.server.list_messages(unquote(match.group(2)), bool(match.group(3)), query)
+            if result is None:
+                self._send_json(404, {"error": {"code": "ErrorItemNotFound"}})
+            else:
+                self._send_json(200, result)
+            return
+        self._send_json(404, {"error": {"code": "NotFound", "path": self.path}})
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Local fake Microsoft Graph endpoint")
+    parser.add_argument("--port", type=int, default=8002)
+    args = parser.parse_args(argv)
+    server = FakeGraph(port=args.port)
+    for i in range(5):
+        server.add_message(make_message(f"m{i}", received=f"2025-01-0{i + 1}T00:00:00Z"))
+    print(f"Fake Graph endpoint on {server.base_url} (token: {server.root}/<tenant>/oauth2/v2.0/token)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# test/fake_openai.py
+"""
+Testler (ve elle deneme) için lokal sahte OpenAI endpoint'i.
+
+POST /v1/chat/completions: cevap {"mail": "<mail-N>"} JSON'u; packed prompt'ta
+([[MAIL id]] blokları) her blok için {"requests": [], "mail": ...} içeren
+{"items": [...]}. Davranış mail gövdesindeki direktiflerle ayarlanır:
+    mail-3             -> istek anahtarı (deneme sayıları bununla tutulur)
+    sleep=0.2          -> cevaptan önce bekle (sn)
+    status=429x2       -> ilk 2 denemede HTTP 429 dön
+    retry-after=1      -> hata cevaplarına Retry-After header'ı ekle
+
+Batch API (files + batches): POST /v1/files, POST /v1/batches,
+GET /v1/batches/{id}, GET /v1/files/{id}/content. Her batch birkaç
+retrieve'da validating -> in_progress -> sonuç durumuna geçer; sonuç
+batch_outcomes kuyruğundan alınır (boşsa "completed"). Satırlar
+chat_completion ile cevaplanır, direktifler batch'te de geçerli.
+
+Elle kullanım:
+    python test/fake_openai.py --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=x python -m labeling.openai_label_batch --mode async
+"""
+
+import re
+import json
+import time
+import itertools
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+_KEY_RE = re.compile(r"mail-\d+")
+_SLEEP_RE = re.compile(r"sleep=([\d.]+)")
+_STATUS_RE = re.compile(r"status=(\d{3})x(\d+)")
+_RETRY_AFTER_RE = re.compile(r"retry-after=([\d.]+)")
+_PACKED_RE = re.compile(r"\[\[MAIL (\S+)\]\]\n(.*?)\n\[\[/MAIL\]\]", re.DOTALL)
+
+
+def _answer(content: str, key: str) -> str:
+    blocks = _PACKED_RE.findall(content)
+    if not blocks:
+        return json.dumps({"mail": key})
+    items = []
+    for item_id, body in blocks:
+        match = _KEY_RE.search(body)
+        items.append({"id": item_id, "result": {"requests": [], "mail": match.group(0) if match else "?"}})
+    return json.dumps({"items": items})
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        # istek anahtarı -> her denemenin geliş zamanı
+        self.attempts: Dict[str, List[float]] = {}
+        # Başarılı cevapların bitiş sırası
+        self.completed: List[str] = []
+        # Batch API
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        # Sıradaki batch'lerin sonu: completed / failed / expired / cancelled
+        self.batch_outcomes: List[str] = []
+        self._ids = itertools.count(1)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def chat_completion(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+        content = (payload.get("messages") or [{}])[-1].get("content") or ""
+        match = _KEY_RE.search(content)
+        key = match.group(0) if match else "?"
+        with self.lock:
+            attempts = self.attempts.setdefault(key, [])
+            attempts.append(time.monotonic())
+            attempt = len(attempts)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            sleep = _SLEEP_RE.search(content)
+            if sleep:
+                time.sleep(float(sleep.group(1)))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        status = _STATUS_RE.search(content)
+        if status and attempt <= int(status.group(2)):
+            headers = {}
+            retry_after = _RETRY_AFTER_RE.search(content)
+            if retry_after:
+                headers["retry-after"] = retry_after.group(1)
+            body = {"error": {"message": f"fake error for {key}", "type": "fake", "code": None}}
+            return int(status.group(1)), headers, body
+
+        with self.lock:
+            self.completed.append(key)
+        return 200, {}, {
+            "id": f"chatcmpl-{key}-{attempt}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": _answer(content, key)},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }
+
+    def create_file(self, data: bytes, filename: str = "file.jsonl", purpose: str = "batch") -> Dict[str, Any]:
+        file_id = f"file-{next(self._ids)}"
+        self.files[file_id] = data
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def create_batch(self, input_file_id: str, outcome: Optional[str] = None) -> Dict[str, Any]:
+        batch_id = f"batch-{next(self._ids)}"
+        if outcome is None:
+            outcome = self.batch_outcomes.pop(0) if self.batch_outcomes else "completed"
+        self.batches[batch_id] = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": input_file_id,
+            "completion_window": "24h",
+            "created_at": int(time.time()),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "errors": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "_outcome": outcome,
+        }
+        return self._public(self.batches[batch_id])
+
+    @staticmethod
+    def _public(batch: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    def retrieve_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch["status"] == "validating":
+            batch["status"] = "in_progress"
+        elif batch["status"] == "in_progress":
+            self._finish_batch(batch)
+        return self._public(batch)
+
+    def _finish_batch(self, batch: Dict[str, Any]) -> None:
+        outcome = batch["_outcome"]
+        batch["status"] = outcome
+        if outcome == "failed":
+            batch["errors"] = {"object": "list", "data": [{"code": "fake_failure", "message": "fake batch failure"}]}
+            return
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines() if line]
+        # expired / cancelled: sadece ilk yarısı işlenmiş
+        if outcome != "completed":
+            lines = lines[:len(lines) // 2]
+        output = []
+        for line in lines:
+            status, _, body = self.chat_completion(line["body"])
+            output.append(json.dumps({
+                "id": f"batch_req_{next(self._ids)}",
+                "custom_id": line["custom_id"],
+                "response": {"status_code": status, "request_id": "fake", "body": body},
+                "error": None,
+            }))
+        counts = batch["request_counts"]
+        counts["total"] = counts["completed"] = len(output)
+        if output:
+            batch["output_file_id"] = self.create_file(("\n".join(output) + "\n").encode("utf-8"))["id"]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeOpenAI
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _not_found(self) -> None:
+        self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"] and len(parts) == 3:
+            batch = self.server.retrieve_batch(parts[2])
+            if batch is None:
+                self._not_found()
+            else:
+                self._send_json(200, batch)
+        elif parts[:2] == ["v1", "files"] and len(parts) == 4 and parts[3] == "content":
+            data = self.server.files.get(parts[2])
+            if data is None:
+                self._not_found()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._not_found()
+
+    def do_POST(self) -> None:
+        body = self._read_body()
+        if self.path == "/v1/chat/completions":
+            status, headers, payload = self.server.chat_completion(json.loads(body or b"{}"))
+            self._send_json(status, payload, headers)
+        elif self.path == "/v1/files":
+            message = BytesParser(policy=default_policy).parsebytes(
+                b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + body
+            )
+            fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+            upload = fields["file"]
+            self._send_json(200, self.server.create_file(
+                upload.get_payload(decode=True),
+                filename=upload.get_filename() or "file.jsonl",
+                purpose=fields["purpose"].get_content().strip(),
+            ))
+        elif self.path == "/v1/batches":
+            payload = json.loads(body or b"{}")
+            if payload.get("input_file_id") not in self.server.files:
+                self._send_json(400, {"error": {"message": "unknown input_file_id"}})
+            else:
+                self._send_json(200, self.server.create_batch(payload["input_file_id"]))
+        else:
+            self._not_found()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Local fake OpenAI endpoint")
+    parser.add_argument("--port", type=int, default=8001)
+    args = parser.parse_args(argv)
+    server = FakeOpenAI(port=args.port)
+    print(f"Fake OpenAI endpoint on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
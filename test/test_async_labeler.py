@@ -0,0 +1,86 @@
+import json
+import asyncio
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+import pytest
+from openai import APIStatusError, AsyncOpenAI
+
+from labeling import async_labeler
+from labeling.async_labeler import label_jobs_async
+
+from fake_openai import FakeOpenAI
+
+
+@dataclass
+class Job:
+    idx: int
+    mail_id: str
+    subject: str
+    body_text: str
+
+
+@pytest.fixture
+def fake():
+    server = FakeOpenAI().start()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(async_labeler, "BACKOFF_BASE_SECONDS", 0.01)
+
+
+def make_jobs(bodies: List[str]) -> List[Job]:
+    return [Job(idx=i, mail_id=f"id-{i}", subject=f"subject {i}", body_text=body) for i, body in enumerate(bodies)]
+
+
+def label(fake: FakeOpenAI, jobs: List[Job], **kwargs: Any) -> List[Tuple[Any, Optional[str], Optional[BaseException]]]:
+    async def run():
+        client = AsyncOpenAI(api_key="test", base_url=fake.base_url, max_retries=0)
+        try:
+            return [item async for item in label_jobs_async(jobs, client, "gpt-test", rpm=0, tpm=0, **kwargs)]
+        finally:
+            await client.close()
+
+    return asyncio.run(run())
+
+
+def test_concurrency_is_bounded(fake):
+    jobs = make_jobs([f"mail-{i} sleep=0.1" for i in range(12)])
+    results = label(fake, jobs, concurrency=3)
+
+    assert [error for _, _, error in results] == [None] * 12
+    assert fake.max_in_flight == 3
+
+
+def test_retries_429_and_honours_retry_after(fake):
+    jobs = make_jobs(["mail-1 status=429x1 retry-after=1", "mail-2 status=503x2"])
+    results = label(fake, jobs, concurrency=2, max_retries=3)
+
+    assert [(json.loads(raw)["mail"], error) for _, raw, error in results] == [("mail-1", None), ("mail-2", None)]
+    first, second = fake.attempts["mail-1"]
+    assert second - first >= 0.95
+    assert len(fake.attempts["mail-2"]) == 3
+
+
+def test_gives_up_after_max_retries_and_does_not_retry_4xx(fake):
+    jobs = make_jobs(["mail-1 status=500x9", "mail-2 status=400x1"])
+    results = label(fake, jobs, concurrency=2, max_retries=2)
+
+    errors = [error for _, _, error in results]
+    assert all(isinstance(error, APIStatusError) for error in errors)
+    assert [error.status_code for error in errors] == [500, 400]
+    assert len(fake.attempts["mail-1"]) == 3
+    assert len(fake.attempts["mail-2"]) == 1
+
+
+def test_output_order_is_stable(fake):
+    # Öndeki mailler daha yavaş: cevaplar ters sırayla biter
+    jobs = make_jobs([f"mail-{i} sleep={0.3 - i * 0.03:.2f}" for i in range(8)])
+    results = label(fake, jobs, concurrency=8)
+
+    assert fake.completed != [f"mail-{i}" for i in range(8)]
+    assert [job.idx for job, _, _ in results] == list(range(8))
+    assert [json.loads(raw)["mail"] for _, raw, _ in results] == [f"mail-{i}" for i in range(8)]
@@ -0,0 +1,118 @@
+import json
+import argparse
+from dataclasses import dataclass
+from typing import List
+
+import pytest
+from openai import OpenAI
+
+from labeling import batch_backend, openai_label_batch
+from labeling.batch_backend import build_batch_lines, run_batch
+from labeling.openai_label_batch import LabelJob, RecordWriter, label_batch
+from labeling.progress_index import LabelIndex, body_hash
+from labeling.response_cache import ResponseCache
+
+from fake_openai import FakeOpenAI
+
+MODEL = "gpt-test"
+
+
+@dataclass
+class Job:
+    idx: int
+    mail_id: str
+    body_text: str
+    body_hash: str
+
+
+@pytest.fixture
+def fake(monkeypatch, tmp_path):
+    monkeypatch.setattr(batch_backend, "BATCH_STATE_PATH", tmp_path / "batch_state.json")
+    server = FakeOpenAI().start()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(fake):
+    client = OpenAI(api_key="test", base_url=fake.base_url, max_retries=0)
+    yield client
+    client.close()
+
+
+def make_jobs(bodies: List[str]) -> List[Job]:
+    return [Job(idx=i, mail_id=f"id-{i}", body_text=b, body_hash=body_hash(b)) for i, b in enumerate(bodies)]
+
+
+def run(jobs: List[Job], client: OpenAI):
+    return list(run_batch(jobs, client, MODEL, poll_seconds=0.01))
+
+
+def test_submit_poll_download(fake, client):
+    jobs = make_jobs(["mail-0", "mail-1 status=500x1", "mail-2"])
+    results = run(jobs, client)
+
+    assert [job.idx for job, _, _ in results] == [0, 1, 2]
+    assert json.loads(results[0][1]) == {"mail": "mail-0"}
+    assert results[1][1] is None and "HTTP 500" in str(results[1][2])
+    assert results[2][2] is None
+    assert not batch_backend.BATCH_STATE_PATH.exists()
+
+
+def test_failed_batch_does_not_block_later_runs(fake, client):
+    jobs = make_jobs(["mail-0", "mail-1"])
+    fake.batch_outcomes = ["failed"]
+
+    assert run(jobs, client) == []
+    assert not batch_backend.BATCH_STATE_PATH.exists()
+    assert [json.loads(raw)["mail"] for _, raw, _ in run(jobs, client)] == ["mail-0", "mail-1"]
+
+
+def test_dead_batch_in_saved_state_is_dropped_and_resubmitted(fake, client):
+    jobs = make_jobs(["mail-0", "mail-1"])
+    input_file = fake.create_file(build_batch_lines(jobs, MODEL))
+    dead = fake.create_batch(input_file["id"], outcome="cancelled")["id"]
+    batch_backend._save_state({"model": MODEL, "batch_ids": [dead], "submitted_at": 0})
+
+    results = run(jobs, client)
+
+    assert fake.batches[dead]["status"] == "cancelled"
+    assert [(json.loads(raw)["mail"], error) for _, raw, error in results] == [("mail-0", None), ("mail-1", None)]
+    assert not batch_backend.BATCH_STATE_PATH.exists()
+
+
+def test_expired_batch_keeps_partial_results(fake, client):
+    jobs = make_jobs([f"mail-{i}" for i in range(4)])
+    fake.batch_outcomes = ["expired"]
+
+    first = run(jobs, client)
+    assert [job.idx for job, _, _ in first] == [0, 1]
+    # İndekslenmeyen job'lar bir sonraki run'da tekrar gönderilir
+    second = run(jobs[2:], client)
+    assert [job.idx for job, _, _ in second] == [2, 3]
+
+
+def test_label_batch_merges_cache_hits_and_batch_results(fake, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(openai_label_batch, "get_client", lambda: client)
+    out_path = tmp_path / "labeled.jsonl"
+    jobs = [
+        LabelJob(idx=i, mail_id=f"id-{i}", subject="s", recv=None, body_text=b, body_hash=body_hash(b))
+        for i, b in enumerate(["mail-0", "mail-1 cached", "mail-2"])
+    ]
+    cache = ResponseCache(tmp_path / "cache.sqlite", namespace="test")
+    cache.put(jobs[1].body_text, '{"mail": "from-cache"}')
+
+    index = LabelIndex(tmp_path / "labeled.index.sqlite", out_path)
+    with out_path.open("a", encoding="utf-8") as out_f:
+        label_batch(jobs, RecordWriter(out_f, index), argparse.Namespace(batch_poll=0.01), cache)
+
+    records = [json.loads(line) for line in out_path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["mail_id"], r["label"]) for r in records] == [
+        ("id-1", {"mail": "from-cache"}),
+        ("id-0", {"mail": "mail-0"}),
+        ("id-2", {"mail": "mail-2"}),
+    ]
+    assert len(index) == 3
+    assert cache.get(jobs[0].body_text) == '{"mail": "mail-0"}'
+    index.close()
+    cache.close()
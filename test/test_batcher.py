@@ -0,0 +1,72 @@
+import threading
+from typing import List, Sequence
+
+import pytest
+
+from inference.batcher import MicroBatcher
+from inference.extractor import Extraction
+
+
+class FakeExtractor:
+    """İçinde "boom" geçen mail bulunan her batch'i düşüren sahte extractor."""
+
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+        self.length_threads: List[str] = []
+
+    def token_lengths(self, bodies: Sequence[str]) -> List[int]:
+        self.length_threads.append(threading.current_thread().name)
+        return [len(body.split()) for body in bodies]
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        self.batches.append(list(bodies))
+        if any("boom" in body for body in bodies):
+            raise RuntimeError("boom")
+        return [Extraction(raw=body) for body in bodies]
+
+
+@pytest.fixture
+def extractor():
+    return FakeExtractor()
+
+
+def test_failed_batch_only_fails_the_bad_mail(extractor):
+    batcher = MicroBatcher(extractor, max_batch=8, max_wait_ms=50, bucket_ratio=0)
+    futures = batcher.submit_many(["ok1", "boom", "ok2"])
+    batcher.close()
+
+    assert futures[0].result().raw == "ok1"
+    assert futures[2].result().raw == "ok2"
+    with pytest.raises(RuntimeError, match="boom"):
+        futures[1].result()
+    # Önce tek batch, sonra mail mail tekrar
+    assert sorted(map(sorted, extractor.batches)) == [["boom"], ["boom", "ok1", "ok2"], ["ok1"], ["ok2"]]
+    assert batcher.stats()["batches"] == 2
+
+
+def test_token_lengths_run_on_worker_thread(extractor):
+    batcher = MicroBatcher(extractor, max_batch=8, max_wait_ms=50, bucket_ratio=2.0)
+    results = batcher.extract(["a", "a b", "a b c d e f"])
+    batcher.close()
+
+    assert [result.raw for result in results] == ["a", "a b", "a b c d e f"]
+    assert set(extractor.length_threads) == {"micro-batcher"}
+    assert sorted(map(len, extractor.batches)) == [1, 2]
+
+
+class ShortExtractor(FakeExtractor):
+    """İçinde "short" geçen mail bulunan batch'te son sonucu düşürür."""
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        results = super().extract(bodies)
+        return results[:-1] if any("short" in body for body in bodies) else results
+
+
+def test_missing_results_fail_instead_of_hanging():
+    batcher = MicroBatcher(ShortExtractor(), max_batch=8, max_wait_ms=50, bucket_ratio=0)
+    futures = batcher.submit_many(["ok1", "short", "ok2"])
+    batcher.close()
+
+    assert [future.result(timeout=1).raw for future in (futures[0], futures[2])] == ["ok1", "ok2"]
+    with pytest.raises(RuntimeError, match="0 results for 1 mails"):
+        futures[1].result(timeout=1)
@@ -0,0 +1,107 @@
+import json
+
+import pytest
+import requests
+
+from email_ingestion import fetch_training_batch
+from email_ingestion.config import MailSource
+from email_ingestion.fetch_training_batch import FetchState, RawWriter, filter_headers, ingest_source
+from email_ingestion.raw_store import RawStore
+
+from fake_graph import make_message
+
+SOURCE = MailSource("u", "TrainMails")
+
+
+@pytest.fixture
+def state_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch_training_batch, "DELTA_STATE_PATH", tmp_path / "delta.json")
+    monkeypatch.setattr(fetch_training_batch, "CHECKPOINT_PATH", tmp_path / "checkpoint.json")
+    return tmp_path
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RawStore(tmp_path / "raw.sqlite")
+    yield store
+    store.close()
+
+
+def add_messages(fake_graph, *ids):
+    for i, msg_id in enumerate(ids):
+        fake_graph.add_message(make_message(msg_id, received=f"2025-01-{i + 1:02d}T00:00:00Z"))
+
+
+def test_delta_round_trip_saves_delta_link_and_counts_removed(graph_client, fake_graph, store, state_paths):
+    add_messages(fake_graph, "m1", "m2", "m3")
+    stats = ingest_source(graph_client, SOURCE, RawWriter(store), FetchState(restart=False), delta=True, max_count=500)
+    assert (stats.fetched, stats.new, stats.pages) == (3, 3, 2)
+    delta_link = json.loads((state_paths / "delta.json").read_text())[SOURCE.key]
+    assert "since=3" in delta_link
+    assert json.loads((state_paths / "checkpoint.json").read_text()) == {}
+
+    fake_graph.add_message(make_message("m4", received="2025-01-04T00:00:00Z"))
+    fake_graph.remove_message("m1")
+    fake_graph.requests.clear()
+    stats = ingest_source(graph_client, SOURCE, RawWriter(store), FetchState(restart=False), delta=True, max_count=500)
+
+    # İkinci round kaydedilen deltaLink'ten başlar, sadece değişiklikler gelir
+    assert "since=3" in fake_graph.requests[0]
+    assert (stats.fetched, stats.new, stats.removed, stats.updated) == (2, 1, 1, 0)
+    assert len(store) == 4
+    assert "since=5" in json.loads((state_paths / "delta.json").read_text())[SOURCE.key]
+
+
+def test_full_fetch_resumes_from_next_link_checkpoint(graph_client, fake_graph, store, state_paths):
+    add_messages(fake_graph, "m1", "m2", "m3", "m4", "m5")
+    fake_graph.fail_after_gets = 1
+    with pytest.raises(requests.HTTPError):
+        ingest_source(graph_client, SOURCE, RawWriter(store), FetchState(restart=False), delta=False, max_count=500)
+    checkpoint = json.loads((state_paths / "checkpoint.json").read_text())[SOURCE.key]
+    assert (checkpoint["mode"], checkpoint["fetched"]) == ("full", 2)
+    assert "%24skip=2" in checkpoint["next_link"]
+    assert len(store) == 2
+
+    fake_graph.requests.clear()
+    stats = ingest_source(graph_client, SOURCE, RawWriter(store), FetchState(restart=False), delta=False, max_count=500)
+    assert "%24skip=2" in fake_graph.requests[0]
+    assert (stats.fetched, stats.new, stats.skipped) == (3, 3, 0)
+    assert len(store) == 5
+    assert json.loads((state_paths / "checkpoint.json").read_text()) == {}
+
+
+def test_writer_skips_messages_already_fetched_from_another_mailbox(store):
+    writer = RawWriter(store)
+    msg = make_message("m1")
+    assert writer.write_page([msg], allow_updates=False)["new"] == 1
+    same_mail = {**make_message("other-id"), "internetMessageId": msg["internetMessageId"]}
+    counts = writer.write_page([msg, same_mail, {"id": "m9", "@removed": {}}], allow_updates=False)
+    assert (counts["skipped"], counts["duplicates"], counts["removed"], counts["new"]) == (1, 1, 1, 0)
+    # Delta'dan gelen değişmiş mesaj üzerine yazılır
+    assert writer.write_page([{**msg, "subject": "Yeni konu"}], allow_updates=True)["updated"] == 1
+    assert store.get_message("m1")["subject"] == "Yeni konu"
+    assert len(store) == 1
+
+
+def test_filter_headers_keeps_removed_items():
+    msgs = [
+        make_message("keep"),
+        make_message("reply", subject="RE: Uçuş talebi"),
+        make_message("elsewhere", to="someone@example.com"),
+        {"id": "gone", "@removed": {"reason": "deleted"}},
+    ]
+    assert [msg["id"] for msg in filter_headers(msgs)] == ["keep", "gone"]
+
+
+def test_selective_fetch_downloads_only_wanted_bodies(graph_client, fake_graph, store, state_paths):
+    add_messages(fake_graph, "m1", "m2", "m3")
+    fake_graph.add_message(make_message("m4", subject="FW: Uçuş talebi", received="2025-01-04T00:00:00Z"))
+    RawWriter(store).write_page([make_message("m3")], allow_updates=False)
+
+    stats = ingest_source(
+        graph_client, SOURCE, RawWriter(store), FetchState(restart=False), delta=False, max_count=500, selective=True,
+    )
+    # m4 konu filtresine takılır, m3 zaten store'da: sadece m1 ve m2'nin gövdesi iner
+    assert (stats.fetched, stats.filtered, stats.bodies, stats.new, stats.skipped) == (4, 1, 2, 2, 1)
+    assert sum(fake_graph.batch_sizes) == 2
+    assert store.get_body("m1")["content"] == "<p>Merhaba</p>"
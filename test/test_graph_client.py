@@ -0,0 +1,43 @@
+import pytest
+
+from email_ingestion import graph_client as graph_client_module
+
+from fake_graph import make_message
+
+
+@pytest.fixture
+def messages(fake_graph):
+    ids = [f"m/{i}" for i in range(45)]
+    for msg_id in ids:
+        fake_graph.add_message(make_message(msg_id, content=f"<p>{msg_id}</p>"))
+    return ids
+
+
+def test_bodies_are_fetched_in_batches_of_20(graph_client, fake_graph, messages):
+    bodies = graph_client.fetch_message_bodies(messages + messages[:3])
+    assert fake_graph.batch_sizes == [20, 20, 5]
+    assert set(bodies) == set(messages)
+    # Alt cevaplar ters sırayla dönse de id'ye göre eşleşir; id'deki "/" URL'de kaçırılır
+    assert bodies["m/7"]["body"]["content"] == "<p>m/7</p>"
+    assert set(bodies["m/7"]) == {"id", "body", "bodyPreview"}
+
+
+def test_throttled_items_are_retried(graph_client, fake_graph, messages):
+    fake_graph.batch_throttle = 3
+    bodies = graph_client.fetch_message_bodies(messages[:5])
+    assert fake_graph.batch_sizes == [5, 3]
+    assert set(bodies) == set(messages[:5])
+
+
+def test_missing_messages_are_skipped(graph_client, fake_graph, messages):
+    fake_graph.remove_message("m/1")
+    bodies = graph_client.fetch_message_bodies(["m/0", "m/1", "m/2"])
+    assert set(bodies) == {"m/0", "m/2"}
+
+
+def test_gives_up_when_still_throttled(graph_client, fake_graph, messages, monkeypatch):
+    monkeypatch.setattr(graph_client_module, "BATCH_MAX_RETRIES", 1)
+    fake_graph.batch_throttle = 10
+    with pytest.raises(RuntimeError, match="still throttled"):
+        graph_client.fetch_message_bodies(messages[:2])
+    assert fake_graph.batch_sizes == [2, 2]
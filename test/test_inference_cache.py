@@ -0,0 +1,110 @@
+import threading
+from typing import Any, Dict, List, Sequence, Union
+
+import pytest
+
+from inference.cache import CachedExtractor, _entry_size
+from inference.extractor import PROMPT_PREFIX, Extraction, Seq2SeqExtractor, build_prompt
+from labeling.response_cache import fingerprint, normalize_body
+
+
+class CountingExtractor:
+    name = "counting"
+
+    def __init__(self) -> None:
+        self.calls: List[List[str]] = []
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        self.calls.append(list(bodies))
+        return [Extraction(raw=f"out:{normalize_body(body)}") for body in bodies]
+
+
+def test_only_misses_reach_the_wrapped_extractor():
+    inner = CountingExtractor()
+    cache = CachedExtractor(inner)
+    first = cache.extract(["mail a", "mail b"])
+    # Sadece boşlukları farklı gövde aynı anahtar; aynı batch'teki tekrar modele bir kez gider
+    second = cache.extract(["mail  a\n", "mail c", "mail c", "  mail b"])
+
+    assert inner.calls == [["mail a", "mail b"], ["mail c"]]
+    assert [r.raw for r in second] == ["out:mail a", "out:mail c", "out:mail c", "out:mail b"]
+    assert second[0] is first[0]
+    summary = cache.summary()
+    assert (summary["hits"], summary["misses"], summary["entries"]) == (3, 3, 3)
+
+
+def test_least_recently_used_entry_is_evicted():
+    inner = CountingExtractor()
+    size = _entry_size(fingerprint(normalize_body("mail a")), Extraction(raw="out:mail a"))
+    cache = CachedExtractor(inner, max_bytes=2 * size)
+    cache.extract(["mail a", "mail b"])
+    cache.extract(["mail a"])  # a en son okunan
+    cache.extract(["mail c"])  # b atılır
+
+    assert len(cache) == 2
+    cache.extract(["mail a", "mail b"])
+    assert inner.calls[-1] == ["mail b"]
+    assert cache.summary()["evicted"] == 2
+
+
+def test_oversized_results_are_not_cached():
+    cache = CachedExtractor(CountingExtractor(), max_bytes=10)
+    cache.extract(["mail a"])
+    assert len(cache) == 0
+
+
+class WordTokenizer:
+    """
+    Boşlukla bölen sahte tokenizer. add_special_tokens ile sona EOS (T5 gibi)
+    ya da bos=True ise başa BOS ekler; truncation özel token'lara yer bırakır.
+    """
+
+    def __init__(self, bos: bool = False) -> None:
+        self.bos = bos
+        self.vocab: Dict[str, int] = {}
+
+    def _encode(self, text: str, add_special_tokens: bool, truncation: bool, max_length: int) -> List[int]:
+        ids = [self.vocab.setdefault(word, len(self.vocab) + 2) for word in text.split()]
+        if not add_special_tokens:
+            return ids[:max_length] if truncation and max_length else ids
+        if truncation and max_length:
+            ids = ids[:max_length - 1]
+        return [0] + ids if self.bos else ids + [1]
+
+    def __call__(self, text: Union[str, List[str]], add_special_tokens: bool = True,
+                 truncation: bool = False, max_length: int = 0) -> Dict[str, Any]:
+        if isinstance(text, list):
+            return {"input_ids": [self._encode(t, add_special_tokens, truncation, max_length) for t in text]}
+        return {"input_ids": self._encode(text, add_special_tokens, truncation, max_length)}
+
+
+def make_extractor(tokenizer: WordTokenizer, max_input_length: int) -> Seq2SeqExtractor:
+    # Model yüklemeden sadece tokenizasyon yolu
+    extractor = Seq2SeqExtractor.__new__(Seq2SeqExtractor)
+    extractor.tokenizer = tokenizer
+    extractor.model_dir = "fake"
+    extractor.max_input_length = max_input_length
+    extractor._lock = threading.Lock()
+    extractor.prefix_ids = extractor._tokenize_prefix()
+    return extractor
+
+
+@pytest.mark.parametrize("max_input_length", [64, len(PROMPT_PREFIX.split()) + 3])
+def test_pretokenized_prefix_matches_full_prompt(max_input_length):
+    tokenizer = WordTokenizer()
+    extractor = make_extractor(tokenizer, max_input_length)
+    assert extractor.prefix_ids == tokenizer(PROMPT_PREFIX, add_special_tokens=False)["input_ids"]
+
+    bodies = ["  Merhaba, 2 kişi Ankara - Roma  ", "x", " ".join(f"kelime{i}" for i in range(80))]
+    full = tokenizer([build_prompt(b) for b in bodies], truncation=True, max_length=max_input_length)["input_ids"]
+    assert extractor._input_ids(bodies) == full
+    assert extractor.token_lengths(bodies) == [len(ids) for ids in full]
+
+
+def test_prefix_unstable_tokenizer_falls_back_to_full_prompts():
+    tokenizer = WordTokenizer(bos=True)
+    extractor = make_extractor(tokenizer, 64)
+    assert extractor.prefix_ids is None
+
+    bodies = ["Merhaba, 2 kişi Ankara - Roma"]
+    assert extractor._input_ids(bodies) == tokenizer([build_prompt(bodies[0])], truncation=True, max_length=64)["input_ids"]
@@ -0,0 +1,98 @@
+import json
+import threading
+from http.client import HTTPConnection
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pytest
+
+from inference import server as server_module
+from inference.extractor import Extraction, parse_output
+from inference.server import InferenceServer
+
+
+class FakeExtractor:
+    """"boom" geçen mailde hata, "bad" geçende geçersiz JSON, diğerlerinde boş talep listesi."""
+
+    name = "fake"
+
+    def __init__(self) -> None:
+        self.calls: List[List[str]] = []
+
+    def extract(self, bodies: Sequence[str]) -> List[Extraction]:
+        self.calls.append(list(bodies))
+        if any("boom" in body for body in bodies):
+            raise RuntimeError("model exploded")
+        return [parse_output("not json" if "bad" in body else '{"requests": []}') for body in bodies]
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer(("127.0.0.1", 0), FakeExtractor(), max_wait_ms=1, cache_mb=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def call(server: InferenceServer, method: str, path: str, body: Any = None, raw: bytes = None) -> Tuple[int, Dict[str, Any]]:
+    conn = HTTPConnection(*server.server_address, timeout=5)
+    data = raw if raw is not None else (json.dumps(body).encode("utf-8") if body is not None else None)
+    conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+    resp = conn.getresponse()
+    payload = json.loads(resp.read())
+    conn.close()
+    return resp.status, payload
+
+
+def test_extract_single_and_batch(server):
+    status, payload = call(server, "POST", "/extract", {"text": "Merhaba, İstanbul - Ankara bileti"})
+    assert status == 200
+    assert payload["request"] == {"requests": []}
+    assert payload["error"] is None
+    assert set(payload) == {"request", "raw", "error", "latency_ms"}
+
+    status, payload = call(server, "POST", "/extract", {"texts": ["a", "bad mail"]})
+    assert status == 200
+    assert [r["request"] for r in payload["results"]] == [{"requests": []}, None]
+    assert payload["results"][1]["error"].startswith("invalid JSON")
+
+
+def test_health_and_metrics(server):
+    assert call(server, "GET", "/health") == (200, {"status": "ok"})
+    call(server, "POST", "/extract", {"texts": ["a", "b"]})
+    call(server, "POST", "/extract", {"text": "a"})
+
+    status, metrics = call(server, "GET", "/metrics")
+    assert status == 200
+    assert metrics["backend"] == "fake"
+    assert (metrics["requests"], metrics["mails"], metrics["errors"]) == (2, 3, 0)
+    assert metrics["batching"]["batches"] >= 1
+    # İkinci istekteki "a" cache'ten geldi
+    assert metrics["cache"]["hits"] == 1
+    assert call(server, "GET", "/nope")[0] == 404
+
+
+@pytest.mark.parametrize("raw, message", [
+    (b"{not json", "invalid JSON"),
+    (b"[1, 2]", "expected a JSON object"),
+    (b'{"texts": [1]}', "'texts' must be a list of strings"),
+    (b'{"body": "x"}', "expected 'text'"),
+])
+def test_bad_requests(server, raw, message):
+    status, payload = call(server, "POST", "/extract", raw=raw)
+    assert status == 400
+    assert message in payload["error"]
+
+
+def test_body_limit(server, monkeypatch):
+    monkeypatch.setattr(server_module, "MAX_REQUEST_BYTES", 16)
+    status, payload = call(server, "POST", "/extract", {"text": "bu gövde 16 bayttan uzun"})
+    assert status == 400
+    assert "larger than 16 bytes" in payload["error"]
+
+
+def test_extraction_failure_is_500(server):
+    status, payload = call(server, "POST", "/extract", {"text": "boom"})
+    assert (status, payload) == (500, {"error": "model exploded"})
+    assert call(server, "GET", "/metrics")[1]["errors"] == 1
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from labeling.near_dup import MinHasher, NearDupIndex, band_buckets, shingles, similarity
+from labeling.openai_label_batch import LabelJob, resolve_duplicates, stale_copies
+from labeling.progress_index import body_hash
+
+
+def text(word: str, n: int = 300, edit: str = "") -> str:
+    return " ".join(f"{word}{i}" for i in range(n)) + edit
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDupIndex(tmp_path / "near_dup.sqlite", threshold=0.9)
+    yield index
+    index.close()
+
+
+def assign(index: NearDupIndex, mail_id: str, body: str) -> str:
+    return index.assign(mail_id, body_hash(body), body)
+
+
+def test_shingles_and_signature_similarity():
+    assert shingles("Merhaba Dünya") == shingles("merhaba   dünya!")
+    hasher = MinHasher()
+    a, b = hasher.signature(shingles(text("w"))), hasher.signature(shingles(text("w", edit=" ek")))
+    assert similarity(a, b) >= 0.9
+    assert similarity(a, hasher.signature(shingles(text("x")))) < 0.1
+    assert len(band_buckets(a)) == 16
+    assert band_buckets(a) == band_buckets(hasher.signature(shingles(text("w"))))
+
+
+def test_near_identical_pair_shares_cluster(index):
+    assert assign(index, "a", text("w")) == "a"
+    assert assign(index, "b", text("w", edit=" tekrar gönderildi")) == "a"
+    assert index.stats() == {"mails": 2, "clusters": 1, "duplicates": 1}
+
+
+def test_distinct_bodies_get_separate_clusters(index):
+    assert assign(index, "a", text("w")) == "a"
+    assert assign(index, "b", text("x")) == "b"
+    assert index.stats()["clusters"] == 2
+
+
+def test_same_id_and_hash_is_not_rehashed(index, monkeypatch):
+    body = text("w")
+    assign(index, "a", body)
+    assign(index, "b", text("w", edit=" ek"))
+
+    def fail(_hashes):
+        raise AssertionError("signature recomputed")
+
+    monkeypatch.setattr(index.hasher, "signature", fail)
+    assert assign(index, "a", body) == "a"
+    assert assign(index, "b", text("w", edit=" ek")) == "a"
+
+
+def test_changed_representative_repoints_members(index):
+    assign(index, "a", text("w"))
+    assign(index, "b", text("w", edit=" birinci"))
+    assign(index, "c", text("w", edit=" ikinci"))
+    assign(index, "d", text("y"))
+    assert [index.cluster_of(m) for m in "abcd"] == ["a", "a", "a", "d"]
+
+    # a'nın gövdesi tamamen değişti: b ve c birbirine benziyor, ilk eklenen b representative
+    assert assign(index, "a", text("x")) == "a"
+    assert [index.cluster_of(m) for m in "bcd"] == ["b", "b", "d"]
+    # a tekrar eski gövdeye dönerse b'nin kümesine katılır
+    assert assign(index, "a", text("w")) == "b"
+
+
+def test_stale_copies_are_detected_and_requeued(index, tmp_path):
+    assign(index, "a", text("w"))
+    assign(index, "b", text("w", edit=" birinci"))
+    assign(index, "c", text("w", edit=" ikinci"))
+    out_path = tmp_path / "labeled.jsonl"
+    with out_path.open("w", encoding="utf-8") as f:
+        f.write(json.dumps({"mail_id": "a", "label": {"x": 1}}) + "\n")
+        f.write(json.dumps({"mail_id": "b", "label": {"x": 1}, "dedup_of": "a"}) + "\n")
+    assert stale_copies(out_path, index) == []
+
+    assign(index, "a", text("x"))
+    assert stale_copies(out_path, index) == ["b"]
+
+    jobs = [LabelJob(idx=i, mail_id=m, subject="s", recv=None, body_text="", body_hash="") for i, m in enumerate("bc")]
+    # b yeni kümenin representative'i (etiketlenmeli), c artık b'den kopyalanır
+    assert [(job.mail_id, rep) for job, rep in resolve_duplicates([(job, "a") for job in jobs], index)] == [("c", "b")]
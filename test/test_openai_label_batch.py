@@ -0,0 +1,146 @@
+import json
+from typing import List
+
+import pytest
+from openai import OpenAI
+
+from labeling import openai_label_batch
+from labeling.openai_client import UsageStats
+from labeling.openai_label_batch import (
+    LabelJob,
+    RecordWriter,
+    copy_duplicate_labels,
+    dedup_copies,
+    label_sync,
+    make_record,
+    parse_args,
+)
+from labeling.progress_index import LabelIndex, body_hash
+from labeling.response_cache import ResponseCache
+
+from fake_openai import FakeOpenAI
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    server = FakeOpenAI().start()
+    client = OpenAI(api_key="test", base_url=server.base_url, max_retries=0)
+    monkeypatch.setattr(openai_label_batch, "get_client", lambda: client)
+    yield server
+    client.close()
+    server.close()
+
+
+def make_job(idx: int, text: str) -> LabelJob:
+    return LabelJob(idx=idx, mail_id=f"id-{idx}", subject="s", recv=None, body_text=text, body_hash=body_hash(text))
+
+
+def read_records(path) -> List[dict]:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_force_skips_cached_answer_and_refreshes_it(fake, tmp_path):
+    out_path = tmp_path / "labeled.jsonl"
+    cache = ResponseCache(tmp_path / "cache.sqlite", namespace="test")
+    forced, cached = make_job(1, "mail-1 forced"), make_job(2, "mail-2 cached")
+    for job in (forced, cached):
+        cache.put(job.body_text, '{"mail": "stale"}')
+
+    index = LabelIndex(tmp_path / "labeled.index.sqlite", out_path)
+    with out_path.open("a", encoding="utf-8") as out_f:
+        label_sync([forced, cached], RecordWriter(out_f, index), cache, force_ids={"id-1"})
+    index.close()
+
+    assert [r["label"] for r in read_records(out_path)] == [{"mail": "mail-1"}, {"mail": "stale"}]
+    assert list(fake.attempts) == ["mail-1"]
+    assert cache.get(forced.body_text) == '{"mail": "mail-1"}'
+    cache.close()
+
+
+@pytest.fixture
+def usage(monkeypatch):
+    stats = UsageStats()
+    monkeypatch.setattr(openai_label_batch, "USAGE_STATS", stats)
+    return stats
+
+
+def label_packed_group(tmp_path, jobs: List[LabelJob], cache: ResponseCache) -> List[dict]:
+    out_path = tmp_path / "labeled.jsonl"
+    index = LabelIndex(tmp_path / "labeled.index.sqlite", out_path)
+    with out_path.open("a", encoding="utf-8") as out_f:
+        label_sync(jobs, RecordWriter(out_f, index), cache, pack_size=len(jobs))
+    index.close()
+    return read_records(out_path)
+
+
+def test_packed_results_are_cached(fake, usage, tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", namespace="test")
+    jobs = [make_job(1, "mail-1"), make_job(2, "mail-2")]
+
+    records = label_packed_group(tmp_path, jobs, cache)
+
+    assert [r["label"]["mail"] for r in records] == ["mail-1", "mail-2"]
+    assert (usage.requests, usage.mails) == (1, 2)
+    packed = [cache.get(job.body_text, openai_label_batch.PACKED_CACHE_PROMPT) for job in jobs]
+    assert [json.loads(raw)["mail"] for raw in packed] == ["mail-1", "mail-2"]
+    # Tek mail prompt'unun anahtarlarına yazılmaz: unpacked run bunları kullanmaz
+    assert [cache.get(job.body_text) for job in jobs] == [None, None]
+    cache.close()
+
+
+def test_packed_run_reuses_packed_answers_but_single_run_does_not(fake, usage, tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", namespace="test")
+    jobs = [make_job(1, "mail-1"), make_job(2, "mail-2")]
+    for job in jobs:
+        cache.put(job.body_text, '{"mail": "packed"}', openai_label_batch.PACKED_CACHE_PROMPT)
+
+    assert [r["label"]["mail"] for r in label_packed_group(tmp_path, jobs, cache)] == ["packed"] * 2
+    assert usage.requests == 0
+
+    out_path = tmp_path / "single.jsonl"
+    index = LabelIndex(tmp_path / "single.index.sqlite", out_path)
+    with out_path.open("a", encoding="utf-8") as out_f:
+        label_sync(jobs, RecordWriter(out_f, index), cache)
+    index.close()
+    assert [r["label"]["mail"] for r in read_records(out_path)] == ["mail-1", "mail-2"]
+    assert usage.requests == 2
+    cache.close()
+
+
+def test_failed_packed_request_counts_fallback_mails(fake, usage, tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", namespace="test")
+    # Packed isteğin anahtarı ilk mail: ilk denemesi 500, tek mail fallback'i başarılı
+    jobs = [make_job(1, "mail-1 status=500x1"), make_job(2, "mail-2")]
+
+    records = label_packed_group(tmp_path, jobs, cache)
+
+    assert [r["label"]["mail"] for r in records] == ["mail-1", "mail-2"]
+    assert (usage.requests, usage.mails) == (2, 2)
+    cache.close()
+
+
+def test_dedup_is_opt_in():
+    assert parse_args([]).dedup is False
+    assert parse_args(["--dedup"]).dedup is True
+
+
+def test_failed_representative_is_not_copied(tmp_path):
+    out_path = tmp_path / "labeled.jsonl"
+    index = LabelIndex(tmp_path / "labeled.index.sqlite", out_path)
+    rep, dup = make_job(1, "mail-1 rep"), make_job(2, "mail-1 rep.")
+    with out_path.open("a", encoding="utf-8") as out_f:
+        writer = RecordWriter(out_f, index)
+        writer.write(rep, make_record(rep, None, RuntimeError("HTTP 500")))
+        assert copy_duplicate_labels([(dup, "id-1")], writer, out_path) == 0
+
+        # Representative sonraki denemede etiketlenince kopya yazılır
+        writer.write(rep, make_record(rep, '{"requests": []}'))
+        assert copy_duplicate_labels([(dup, "id-1")], writer, out_path) == 1
+    assert ("id-2", dup.body_hash) in index
+    assert read_records(out_path)[-1]["dedup_of"] == "id-1"
+
+    # --force id-1: kopyası da silinecekler arasında
+    assert dedup_copies(out_path, ["id-1"]) == ["id-2"]
+    index.remove(["id-1", *dedup_copies(out_path, ["id-1"])])
+    assert read_records(out_path) == []
+    index.close()
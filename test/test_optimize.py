@@ -0,0 +1,76 @@
+import ast
+import json
+from pathlib import Path
+
+import pytest
+
+from inference import optimize
+from inference.optimize import field_agreement, field_f1, flatten
+
+TRAIN_SCRIPT = Path(__file__).resolve().parents[1] / "training" / "train_mt5_json_extractor.py"
+
+GOLD = {"requests": [{"type": "flight", "from": "IST", "to": "ESB", "pax": 2, "note": None}]}
+
+
+def test_flatten_skips_none_leaves():
+    assert sorted(flatten(GOLD)) == [
+        ("requests[0].from", "IST"),
+        ("requests[0].pax", 2),
+        ("requests[0].to", "ESB"),
+        ("requests[0].type", "flight"),
+    ]
+
+
+def test_field_metrics_on_hand_built_predictions():
+    # 4 altın alanın 3'ü doğru, 1 yanlış: ortak 3, birleşim 5
+    predicted = {"requests": [{"type": "flight", "from": "IST", "to": "ADB", "pax": 2}]}
+    assert field_agreement(predicted, GOLD) == pytest.approx(3 / 5)
+    assert field_f1(predicted, GOLD) == pytest.approx(2 * 3 / 8)
+
+    assert field_agreement(GOLD, GOLD) == field_f1(GOLD, GOLD) == 1.0
+    # Parse edilemeyen çıktı (None): hiç alan yok
+    assert field_agreement(None, GOLD) == field_f1(None, GOLD) == 0.0
+    assert field_agreement(None, None) == field_f1(None, None) == 1.0
+    assert field_agreement({"requests": []}, None) == 1.0
+    # Sıra farkı (ikinci talep önde) yol farkı demek
+    two = {"requests": [{"type": "hotel"}, {"type": "flight"}]}
+    swapped = {"requests": [{"type": "flight"}, {"type": "hotel"}]}
+    assert field_f1(two, swapped) == 0.0
+
+
+def _split_args(path: Path):
+    """Eğitim script'indeki train_test_split çağrısının test_size / seed değerleri."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    constants = {
+        node.targets[0].id: node.value.value
+        for node in tree.body
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name) and isinstance(node.value, ast.Constant)
+    }
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "train_test_split":
+            kwargs = {kw.arg: kw.value for kw in node.keywords}
+            resolve = lambda value: value.value if isinstance(value, ast.Constant) else constants[value.id]  # noqa: E731
+            return resolve(kwargs["test_size"]), resolve(kwargs["seed"])
+    raise AssertionError("train_test_split not found")
+
+
+def test_val_split_matches_training_script():
+    assert _split_args(TRAIN_SCRIPT) == (optimize.VAL_SIZE, optimize.SEED) == (0.15, 42)
+    assert optimize.DATA_PATH.name == "finetune_io_dataset.jsonl"
+
+
+def test_load_val_split_returns_training_validation_rows(tmp_path, monkeypatch):
+    datasets = pytest.importorskip("datasets")
+    data_path = tmp_path / "finetune.jsonl"
+    with data_path.open("w", encoding="utf-8") as f:
+        for i in range(40):
+            row = {"input": f"Talimat\n\nE-posta gövdesi:\nmail {i}", "output": json.dumps({"requests": [], "i": i})}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    monkeypatch.setattr(optimize, "DATA_PATH", data_path)
+
+    expected = datasets.load_dataset("json", data_files=str(data_path), split="train") \
+        .train_test_split(test_size=0.15, seed=42)["test"]
+    pairs = optimize.load_val_split()
+    assert pairs == [(row["input"].split("E-posta gövdesi:\n", 1)[1], row["output"]) for row in expected]
+    assert len(pairs) == 6
+    assert optimize.load_val_split(limit=2) == pairs[:2]
@@ -0,0 +1,28 @@
+from labeling.openai_label_batch import LabelJob, RecordWriter, make_record, skip_labeled
+from labeling.progress_index import LabelIndex, body_hash
+
+
+def make_job(idx: int, text: str) -> LabelJob:
+    return LabelJob(idx=idx, mail_id=f"id-{idx}", subject="s", recv=None, body_text=text, body_hash=body_hash(text))
+
+
+def test_error_records_are_retried_on_next_run(tmp_path):
+    out_path = tmp_path / "labeled.jsonl"
+    index_path = tmp_path / "labeled.index.sqlite"
+    ok, failed, invalid = make_job(1, "ok mail"), make_job(2, "failed mail"), make_job(3, "invalid mail")
+
+    index = LabelIndex(index_path, out_path)
+    with out_path.open("a", encoding="utf-8") as out_f:
+        writer = RecordWriter(out_f, index)
+        writer.write(ok, make_record(ok, '{"requests": []}'))
+        writer.write(failed, make_record(failed, None, RuntimeError("HTTP 500")))
+        # Şemaya uymayan ama etiketi olan kayıt: review_needed, tekrar denenmez
+        writer.write(invalid, make_record(invalid, '{"requests": "x"}'))
+    assert [job.mail_id for job in skip_labeled([ok, failed, invalid], index)] == ["id-2"]
+    index.close()
+
+    # Index dosyası olmadan çıktıdan yeniden kurulunca da aynı sonuç
+    index_path.unlink()
+    index = LabelIndex(index_path, out_path)
+    assert [job.mail_id for job in skip_labeled([ok, failed, invalid], index)] == ["id-2"]
+    index.close()
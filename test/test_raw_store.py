@@ -0,0 +1,49 @@
+import json
+
+from email_ingestion.fetch_training_batch import simplify_message
+from email_ingestion.raw_store import RawStore, body_sha, export_jsonl, import_jsonl
+
+from fake_graph import make_message
+
+
+def message(msg_id: str, received: str, content: str = "<p>Merhaba</p>"):
+    return simplify_message(make_message(msg_id, received=received, content=content))
+
+
+def test_jsonl_import_export_round_trip(tmp_path):
+    msgs = [message(f"m{i}", f"2025-01-0{i + 1}T00:00:00Z", content=f"<p>Gövde {i} ✈</p>") for i in range(3)]
+    src = tmp_path / "raw.jsonl"
+    src.write_text("".join(json.dumps(msg, ensure_ascii=False) + "\n" for msg in msgs) + "bozuk satır\n", encoding="utf-8")
+
+    store = RawStore(tmp_path / "raw.sqlite")
+    assert import_jsonl(store, src, batch_size=2) == 3
+    out = tmp_path / "export.jsonl"
+    assert export_jsonl(store, out) == 3
+    store.close()
+
+    assert [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()] == msgs
+
+
+def test_upsert_replaces_body_and_sha(tmp_path):
+    store = RawStore(tmp_path / "raw.sqlite")
+    store.upsert([message("m1", "2025-01-01T00:00:00Z", content="eski")])
+    store.upsert([message("m1", "2025-01-01T00:00:00Z", content="yeni")])
+
+    assert len(store) == 1
+    assert store.get_body("m1")["content"] == "yeni"
+    [header] = list(store.iter_headers())
+    assert header["bodySha"] == body_sha("yeni")
+    assert "body" not in header
+    store.close()
+
+
+def test_iter_headers_filters_by_received_date(tmp_path):
+    store = RawStore(tmp_path / "raw.sqlite")
+    store.upsert([
+        message("old", "2024-12-31T23:59:59Z"),
+        message("new", "2025-01-02T00:00:00Z"),
+        message("edge", "2025-01-01T00:00:00Z"),
+    ])
+    assert [h["id"] for h in store.iter_headers(since="2025-01-01T00:00:00Z", batch_size=1)] == ["new", "edge"]
+    assert [h["id"] for h in store.iter_headers()] == ["old", "new", "edge"]
+    store.close()
@@ -0,0 +1,104 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+import requests
+
+from email_ingestion import transport
+from email_ingestion.config import GraphConfig
+from email_ingestion.transport import EndpointStats, GraphTransport, endpoint_name
+
+URL = "https://graph.microsoft.com/v1.0/users/u/mailFolders/F1/messages"
+
+
+def make_response(status: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(body if body is not None else {}).encode("utf-8")
+    resp.headers.update(headers or {})
+    return resp
+
+
+class StubSession:
+    """requests.Session yerine: Graph cevapları sırayla kuyruktan, token'lar tok-N."""
+
+    def __init__(self, responses: List[requests.Response]) -> None:
+        self.responses = responses
+        self.calls: List[Tuple[str, str]] = []
+        self.token_calls = 0
+
+    def post(self, url: str, data: Any = None, timeout: float = 0) -> requests.Response:
+        self.token_calls += 1
+        return make_response(200, {"access_token": f"tok-{self.token_calls}", "expires_in": 3599})
+
+    def request(self, method: str, url: str, headers: Dict[str, str], **kwargs: Any) -> requests.Response:
+        self.calls.append((method, headers["Authorization"]))
+        return self.responses.pop(0)
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits: List[float] = []
+    monkeypatch.setattr(transport.time, "sleep", waits.append)
+    return waits
+
+
+def make_transport(responses: List[requests.Response]) -> Tuple[GraphTransport, StubSession]:
+    graph = GraphTransport(GraphConfig(tenant_id="t", client_id="c", client_secret="s"))
+    session = StubSession(responses)
+    graph.session = session
+    return graph, session
+
+
+def test_401_refreshes_token_once(sleeps):
+    graph, session = make_transport([make_response(401), make_response(200, {"value": []})])
+    assert graph.get_json(URL) == {"value": []}
+    assert session.calls == [("GET", "Bearer tok-1"), ("GET", "Bearer tok-2")]
+    stats = graph.metrics()["GET /users/{id}/mailFolders/{id}/messages"]
+    assert (stats.count, stats.errors, stats.retries) == (2, 1, 1)
+    assert sleeps == []
+
+
+def test_second_401_is_raised(sleeps):
+    graph, session = make_transport([make_response(401), make_response(401)])
+    with pytest.raises(requests.HTTPError):
+        graph.get_json(URL)
+    assert session.token_calls == 2
+
+
+def test_429_honours_retry_after(sleeps):
+    graph, session = make_transport([
+        make_response(429, headers={"Retry-After": "7"}),
+        make_response(429, headers={"Retry-After": "bad"}),
+        make_response(200, {"ok": True}),
+    ])
+    assert graph.get_json(URL) == {"ok": True}
+    assert sleeps == [7.0, transport.DEFAULT_RETRY_AFTER]
+    assert session.token_calls == 1
+
+
+@pytest.mark.parametrize("status", [503, 504])
+def test_5xx_throttling_is_retried_until_max(status, sleeps, monkeypatch):
+    monkeypatch.setattr(transport, "GRAPH_MAX_RETRIES", 2)
+    graph, session = make_transport([make_response(status, headers={"Retry-After": "1"}) for _ in range(3)])
+    resp = graph.request("GET", URL)
+    assert resp.status_code == status
+    assert len(session.calls) == 3
+    assert sleeps == [1.0, 1.0]
+
+
+def test_endpoint_stats_durations_are_bounded(monkeypatch):
+    monkeypatch.setattr(transport, "METRICS_WINDOW", 3)
+    stats = EndpointStats()
+    for duration in (5.0, 1.0, 2.0, 3.0):
+        stats.durations.append(duration)
+    assert list(stats.durations) == [1.0, 2.0, 3.0]
+    assert stats.percentile(0.5) == 2.0
+
+
+def test_endpoint_name_groups_ids():
+    assert endpoint_name("GET", URL + "?$top=50") == "GET /users/{id}/mailFolders/{id}/messages"
+    assert endpoint_name("POST", "https://graph.microsoft.com/v1.0/$batch") == "POST /$batch"